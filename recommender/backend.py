@@ -0,0 +1,407 @@
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Iterator
+import multiprocessing
+import os
+import threading
+import time
+
+from catalog import Catalog
+from neighbours import NeighbourTable
+from recommend import Recommender, Filter, Weight, FilterIndex, DeadlineExceededError, RequestCancelledError
+
+
+class WorkerPoolError(Exception):
+    pass
+
+
+class LocalBackend:
+    """
+    Runs recommendations in the calling thread.
+    """
+
+    def __init__(
+        self,
+        catalog: Catalog,
+        filter_index: FilterIndex,
+        early_termination: bool = False,
+        neighbours: NeighbourTable = None,
+        shards: int = 1
+    ) -> None:
+        self.catalog = catalog
+        self.filter_index = filter_index
+        self.early_termination = early_termination
+        self.neighbours = neighbours
+        self.shards = shards
+
+    def get_recommendations(
+        self,
+        tconsts: list[int],
+        filter_: Filter,
+        weight: Weight,
+        n: int,
+        timings: dict[str, float] = None,
+        deadline: float = None,
+        is_active: Callable[[], bool] = None
+    ) -> dict[int, list[str | int]]:
+        """
+        Args
+        ----
+        tconsts: list[int] - list of tconsts to get recommendations
+        filter_: Filter - filter of the recommended movies
+        weight: Weight - weight of every feature
+        n: int - number of recommendations to get
+        timings: dict[str, float] - if given, the seconds spent in every stage are added to it (see Recommender.timed)
+        deadline: float - time.monotonic() after which the request is given up
+        is_active: Callable[[], bool] - returns False once the caller went away
+
+        Returns
+        -------
+        dict[int, list[str | int]]: see Recommender.get_recommendations
+
+        Raises
+        ------
+        ValueError: if a tconst is not found or no recommendations found
+        DeadlineExceededError | RequestCancelledError: see Recommender.timed
+        """
+        recommender = Recommender(
+            self.catalog, filter_, weight, self.filter_index, self.early_termination, self.neighbours, self.shards,
+            deadline, is_active
+        )
+        try:
+            return recommender.get_recommendations(tconsts, n)
+        finally:
+            if timings is not None:
+                add_timings(timings, recommender.timings)
+
+    def get_recommendations_batch(
+        self,
+        filter_: Filter,
+        weight: Weight,
+        requests: list[tuple[list[int], int]],
+        timings: dict[str, float] = None,
+        deadline: float = None,
+        is_active: Callable[[], bool] = None
+    ) -> Iterator[tuple[int, dict[int, list[str | int]] | ValueError]]:
+        """
+        Args
+        ----
+        filter_: Filter - filter of the recommended movies, shared by all requests
+        weight: Weight - weight of every feature, shared by all requests
+        requests: list[tuple[list[int], int]] - tconsts and n of every request
+        timings: dict[str, float] - if given, the seconds spent in every stage of the whole batch are added to it
+        deadline: float - time.monotonic() after which the batch is given up
+        is_active: Callable[[], bool] - returns False once the caller went away
+
+        Yields
+        ------
+        tuple[int, dict[int, list[str | int]] | ValueError]: see Recommender.get_recommendations_batch
+
+        Raises
+        ------
+        DeadlineExceededError | RequestCancelledError: see Recommender.timed
+        """
+        recommender = Recommender(
+            self.catalog, filter_, weight, self.filter_index, neighbours=self.neighbours, shards=self.shards,
+            deadline=deadline, is_active=is_active
+        )
+        try:
+            yield from recommender.get_recommendations_batch(requests)
+        finally:
+            if timings is not None:
+                add_timings(timings, recommender.timings)
+
+    def stats(self) -> dict[str, int]:
+        """
+        Returns
+        -------
+        dict[str, int]: see FilterIndex.stats
+        """
+        return self.filter_index.stats()
+
+    def close(self) -> None:
+        pass
+
+
+def add_timings(timings: dict[str, float], other: dict[str, float]) -> None:
+    """
+    Args
+    ----
+    timings: dict[str, float] - seconds spent in every stage, updated in place
+    other: dict[str, float] - seconds to add
+    """
+    for stage, seconds in other.items():
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+# Backend of the worker processes, inherited from the parent process when they are forked.
+_local: LocalBackend = None
+
+
+def _init_worker(
+    catalog: Catalog,
+    filter_masks: int,
+    early_termination: bool,
+    neighbours: NeighbourTable,
+    shards: int
+) -> None:
+    global _local
+    _local = LocalBackend(catalog, FilterIndex(catalog, max_masks=filter_masks), early_termination, neighbours, shards)
+
+
+def _ping() -> int:
+    return len(_local.catalog)
+
+
+# Results of the worker calls come with the stage timings and the filter index stats of the worker.
+# Deadlines are time.monotonic() values, which on Linux share one clock across processes.
+def _get_recommendations(
+    tconsts: list[int],
+    filter_: Filter,
+    weight: Weight,
+    n: int,
+    deadline: float
+) -> tuple[dict[int, list[str | int]] | Exception, dict[str, float], tuple[int, dict[str, int]]]:
+    timings: dict[str, float] = {}
+    try:
+        result = _local.get_recommendations(tconsts, filter_, weight, n, timings, deadline)
+    except (ValueError, DeadlineExceededError) as e:
+        result = e
+    return result, timings, (os.getpid(), _local.stats())
+
+
+def _get_recommendations_batch(
+    filter_: Filter,
+    weight: Weight,
+    requests: list[tuple[list[int], int]],
+    deadline: float
+) -> tuple[list[tuple[int, dict[int, list[str | int]] | ValueError]], dict[str, float], tuple[int, dict[str, int]]]:
+    timings: dict[str, float] = {}
+    results = list(_local.get_recommendations_batch(filter_, weight, requests, timings, deadline))
+    return results, timings, (os.getpid(), _local.stats())
+
+
+class ProcessBackend(LocalBackend):
+    """
+    Runs recommendations in a pool of worker processes, so CPU-bound work is not serialized by the GIL.
+
+    Workers are forked once the catalog is loaded and before any gRPC server is started.
+    They share the catalog's memory with the parent process copy-on-write instead of
+    receiving a copy, only the arguments and results of every call are pickled.
+
+    Forking is not safe once the gRPC server runs its threads, so backends created after
+    that (see CatalogRefresher) spawn their workers instead. A spawned worker receives the
+    catalog pickled, which for a catalog memory-mapped from a snapshot is only its path.
+
+    Workers check the deadline of a request between its stages. Whether the caller went
+    away is only known in the parent process, which stops waiting for the call and cancels
+    it if no worker started it yet.
+
+    A worker that dies (killed for memory, a crash in native code) breaks the whole pool. The
+    pool is then replaced by one spawning its workers and the calls it lost are sent once more.
+    """
+
+    # Seconds between checks that the caller of a running call is still there.
+    poll_interval = 0.05
+
+    # Number of requests of a batch sent to a worker at once.
+    batch_chunk_size = 256
+
+    def __init__(
+        self,
+        catalog: Catalog,
+        filter_index: FilterIndex,
+        workers: int,
+        early_termination: bool = False,
+        fork: bool = True,
+        neighbours: NeighbourTable = None,
+        shards: int = 1
+    ) -> None:
+        global _local
+        super().__init__(catalog, filter_index, early_termination, neighbours, shards)
+        self.workers = workers
+
+        self._worker_stats: dict[int, dict[str, int]] = {}
+        self._stats_lock = threading.Lock()
+        # Held while a broken pool is replaced, see _replace_executor.
+        self._executor_lock = threading.Lock()
+        self._closed = False
+        if fork:
+            _local = LocalBackend(catalog, filter_index, early_termination, neighbours, shards)
+        self._executor = self._start_executor(fork)
+
+    def _start_executor(self, fork: bool) -> ProcessPoolExecutor:
+        if fork:
+            executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('fork')
+            )
+        else:
+            executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(
+                    self.catalog, self.filter_index.max_masks, self.early_termination, self.neighbours, self.shards
+                )
+            )
+        # The fork context starts all workers on the first submit, do it now while it is still safe to fork.
+        # A spawned worker is started by every submit finding no idle worker, so one ping per worker
+        # starts all of them, and has them load the catalog, before the backend is used.
+        for future in [executor.submit(_ping) for _ in range(1 if fork else self.workers)]:
+            future.result()
+        return executor
+
+    def _replace_executor(self, broken: ProcessPoolExecutor) -> None:
+        # Only the first caller to find the pool broken replaces it, the others use its replacement.
+        # The gRPC server threads are running by now, so the new workers are spawned.
+        with self._executor_lock:
+            if self._executor is broken and not self._closed:
+                broken.shutdown(wait=False, cancel_futures=True)
+                self._executor = self._start_executor(fork=False)
+
+    def get_recommendations(
+        self,
+        tconsts: list[int],
+        filter_: Filter,
+        weight: Weight,
+        n: int,
+        timings: dict[str, float] = None,
+        deadline: float = None,
+        is_active: Callable[[], bool] = None
+    ) -> dict[int, list[str | int]]:
+        self._check_caller(deadline, is_active)
+        for attempt in range(2):
+            executor = self._executor
+            try:
+                future = executor.submit(_get_recommendations, tconsts, filter_, weight, n, deadline)
+                try:
+                    self._wait({future}, deadline, is_active)
+                except (DeadlineExceededError, RequestCancelledError):
+                    future.cancel()
+                    raise
+                result, worker_timings, worker_stats = future.result()
+                break
+            except BrokenProcessPool as e:
+                if attempt > 0:
+                    raise WorkerPoolError("worker processes exited while computing the request") from e
+                self._replace_executor(executor)
+        self._set_worker_stats(worker_stats)
+        if timings is not None:
+            add_timings(timings, worker_timings)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def get_recommendations_batch(
+        self,
+        filter_: Filter,
+        weight: Weight,
+        requests: list[tuple[list[int], int]],
+        timings: dict[str, float] = None,
+        deadline: float = None,
+        is_active: Callable[[], bool] = None
+    ) -> Iterator[tuple[int, dict[int, list[str | int]] | ValueError]]:
+        self._check_caller(deadline, is_active)
+        # Offsets of the chunks whose results were not yielded yet.
+        remaining = list(range(0, len(requests), self.batch_chunk_size))
+        offsets: dict[Future, int] = {}
+        for attempt in range(2):
+            executor = self._executor
+            try:
+                offsets = {
+                    executor.submit(
+                        _get_recommendations_batch,
+                        filter_, weight, requests[offset:offset + self.batch_chunk_size], deadline
+                    ): offset
+                    for offset in remaining
+                }
+                pending = set(offsets)
+                while pending:
+                    done = self._wait(pending, deadline, is_active)
+                    pending -= done
+                    for future in done:
+                        results, worker_timings, worker_stats = future.result()
+                        remaining.remove(offsets[future])
+                        self._set_worker_stats(worker_stats)
+                        if timings is not None:
+                            add_timings(timings, worker_timings)
+                        for i, result in results:
+                            yield offsets[future] + i, result
+                return
+            except BrokenProcessPool as e:
+                if attempt > 0:
+                    raise WorkerPoolError("worker processes exited while computing the requests") from e
+                self._replace_executor(executor)
+            finally:
+                for future in offsets:
+                    future.cancel()
+
+    def stats(self) -> dict[str, int]:
+        """
+        Returns
+        -------
+        dict[str, int]: see FilterIndex.stats, summed over the workers as of their last call
+        """
+        with self._stats_lock:
+            worker_stats = list(self._worker_stats.values())
+        return {key: sum(stats[key] for stats in worker_stats) for key in ('masks', 'hits', 'misses')}
+
+    def _wait(self, futures: set[Future], deadline: float, is_active: Callable[[], bool]) -> set[Future]:
+        # Waits for one of the calls to finish, until the deadline or until the caller went away.
+        while True:
+            timeout = None
+            if deadline is not None:
+                timeout = max(deadline - time.monotonic(), 0.0)
+            if is_active is not None:
+                timeout = self.poll_interval if timeout is None else min(timeout, self.poll_interval)
+            done, _ = wait(futures, timeout=timeout, return_when=FIRST_COMPLETED)
+            if len(done) > 0:
+                return done
+            self._check_caller(deadline, is_active)
+
+    def _check_caller(self, deadline: float, is_active: Callable[[], bool]) -> None:
+        if deadline is not None and time.monotonic() > deadline:
+            raise DeadlineExceededError("deadline exceeded waiting for a worker")
+        if is_active is not None and not is_active():
+            raise RequestCancelledError("request cancelled waiting for a worker")
+
+    def _set_worker_stats(self, worker_stats: tuple[int, dict[str, int]]) -> None:
+        pid, stats = worker_stats
+        with self._stats_lock:
+            self._worker_stats[pid] = stats
+
+    def close(self) -> None:
+        with self._executor_lock:
+            self._closed = True
+        self._executor.shutdown(cancel_futures=True)
+
+
+def new_backend(
+    catalog: Catalog,
+    workers: int,
+    filter_masks: int = 128,
+    early_termination: bool = False,
+    fork: bool = True,
+    neighbours: NeighbourTable = None,
+    shards: int = 1
+) -> LocalBackend:
+    """
+    Args
+    ----
+    catalog: Catalog - catalog to recommend from
+    workers: int - number of worker processes, 0 to compute in the gRPC server threads
+    filter_masks: int - number of filter masks memoized (by every worker process)
+    early_termination: bool - read rankings only as deep as needed (see Recommender.get_threshold_responses)
+    fork: bool - fork the worker processes, False to spawn them once other threads are running
+    neighbours: NeighbourTable - precomputed recommendations of default requests, if any
+    shards: int - number of threads every request is ranked with (see Recommender.rank_rows)
+
+    Returns
+    -------
+    LocalBackend: LocalBackend or ProcessBackend
+    """
+    filter_index = FilterIndex(catalog, max_masks=filter_masks)
+    if workers > 0:
+        return ProcessBackend(catalog, filter_index, workers, early_termination, fork, neighbours, shards)
+    return LocalBackend(catalog, filter_index, early_termination, neighbours, shards)
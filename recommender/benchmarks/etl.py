@@ -0,0 +1,152 @@
+"""
+Measures what the `imdb_changes` triggers cost the ETL.
+
+Usage: python benchmarks/etl.py [--titles N] [--page-size N] [--rows-per-statement N]
+
+Replays the statements of the Go ETL (see server/pkg/storage/postgresql/repository/imdb.go)
+against an empty `imdb` table in the POSTGRES_* database: an upsert of the basics of every
+title, then an update of the principals and one of the ratings, every phase in a single
+transaction, and finally the basics again as a rerun of the ETL on unchanged data. Both the
+former statement per title and the current statement per `--rows-per-statement` titles are
+run, each with and without the triggers of the imdb_changes migration, and the time of every
+phase and the rows logged to `imdb_changes` are printed.
+
+The tables `imdb` and `imdb_changes` are dropped and created again.
+"""
+from sys import path
+import os
+path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import argparse
+import time
+import psycopg2
+from psycopg2.extras import execute_batch
+
+from config import get_postgres_dsn
+from generate import generate
+
+MIGRATIONS = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', '..', 'server', 'pkg', 'storage', 'postgresql', 'migrations'
+)
+# Statement per title, the triggers run once per title.
+TITLE_PHASES = {
+    'basics': (
+        """
+            INSERT INTO imdb (tconst, year, genres) VALUES (%s, %s, %s)
+            ON CONFLICT (tconst) DO UPDATE SET year = EXCLUDED.year, genres = EXCLUDED.genres
+        """,
+        lambda row: (row['tconst'], row['year'], row['genres'])
+    ),
+    'principals': (
+        'UPDATE imdb SET nconsts = %s WHERE tconst = %s',
+        lambda row: (row['nconsts'], row['tconst'])
+    ),
+    'ratings': (
+        'UPDATE imdb SET rating = %s, votes = %s WHERE tconst = %s',
+        lambda row: (row['rating'], row['votes'], row['tconst'])
+    ),
+}
+# Statement per rows of many titles, as sent by the ETL.
+BATCH_PHASES = {
+    'basics': (
+        """
+            INSERT INTO imdb (tconst, year, genres)
+            SELECT * FROM unnest(%s::text[], %s::int2[], %s::text[])
+            ON CONFLICT (tconst) DO UPDATE SET year = EXCLUDED.year, genres = EXCLUDED.genres
+        """,
+        lambda rows: ([row['tconst'] for row in rows], [row['year'] for row in rows], [row['genres'] for row in rows])
+    ),
+    'principals': (
+        """
+            UPDATE imdb SET nconsts = principals.nconsts
+            FROM unnest(%s::text[], %s::text[]) AS principals (tconst, nconsts)
+            WHERE imdb.tconst = principals.tconst
+        """,
+        lambda rows: ([row['tconst'] for row in rows], [row['nconsts'] for row in rows])
+    ),
+    'ratings': (
+        """
+            UPDATE imdb SET rating = ratings.rating, votes = ratings.votes
+            FROM unnest(%s::text[], %s::float8[], %s::int8[]) AS ratings (tconst, rating, votes)
+            WHERE imdb.tconst = ratings.tconst
+        """,
+        lambda rows: ([row['tconst'] for row in rows], [row['rating'] for row in rows], [row['votes'] for row in rows])
+    ),
+}
+
+
+def run_migration(cursor, name: str) -> None:
+    with open(os.path.join(MIGRATIONS, name)) as f:
+        cursor.execute(f.read())
+
+
+def run(conn, rows: list[dict], triggers: bool, page_size: int, rows_per_statement: int | None) -> dict[str, float]:
+    """
+    Args
+    ----
+    conn: psycopg2 connection object
+    rows: list[dict] - rows of the `imdb` table (see generate)
+    triggers: bool - create the triggers of the imdb_changes migration
+    page_size: int - statements sent to the server at once
+    rows_per_statement: int | None - titles written by one statement, None for a statement per title
+
+    Returns
+    -------
+    dict[str, float]: seconds spent in every phase, and the rows logged to `imdb_changes` (changes)
+    """
+    with conn.cursor() as cursor:
+        run_migration(cursor, '000002_imdb_changes.down.sql')
+        cursor.execute('DROP TABLE IF EXISTS imdb')
+        run_migration(cursor, '000001_imdb_table.up.sql')
+        if triggers:
+            run_migration(cursor, '000002_imdb_changes.up.sql')
+    conn.commit()
+
+    results: dict[str, float] = {}
+    for phase in (*TITLE_PHASES, 'basics again'):
+        if rows_per_statement is None:
+            query, get_args = TITLE_PHASES[phase.split()[0]]
+            args = [get_args(row) for row in rows]
+        else:
+            query, get_args = BATCH_PHASES[phase.split()[0]]
+            args = [get_args(rows[i:i + rows_per_statement]) for i in range(0, len(rows), rows_per_statement)]
+        start = time.perf_counter()
+        with conn.cursor() as cursor:
+            execute_batch(cursor, query, args, page_size=page_size)
+        conn.commit()
+        results[phase] = time.perf_counter() - start
+
+    if triggers:
+        with conn.cursor() as cursor:
+            cursor.execute('SELECT count(*) FROM imdb_changes')
+            results['changes'] = cursor.fetchone()[0]
+        conn.commit()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Benchmark the ETL with and without the imdb_changes triggers.')
+    parser.add_argument('--titles', type=int, default=100_000)
+    parser.add_argument('--page-size', type=int, default=1000)
+    parser.add_argument('--rows-per-statement', type=int, default=10_000)
+    args = parser.parse_args()
+
+    rows = generate(args.titles).to_dicts()
+    print(f"{args.titles} titles, {args.page_size} statements per round trip")
+    print(
+        f"{'statement':<10} {'triggers':<9} {'basics s':>9} {'principals s':>13} {'ratings s':>10}"
+        f" {'basics again s':>15} {'changes':>9}"
+    )
+    with psycopg2.connect(get_postgres_dsn()) as conn:
+        for rows_per_statement in (None, args.rows_per_statement):
+            for triggers in (False, True):
+                results = run(conn, rows, triggers, args.page_size, rows_per_statement)
+                print(
+                    f"{'per title' if rows_per_statement is None else f'{rows_per_statement} rows':<10}"
+                    f" {'yes' if triggers else 'no':<9} {results['basics']:>9.2f} {results['principals']:>13.2f}"
+                    f" {results['ratings']:>10.2f} {results['basics again']:>15.2f} {results.get('changes', 0):>9}"
+                )
+
+
+if __name__ == '__main__':
+    main()
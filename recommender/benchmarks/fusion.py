@@ -0,0 +1,75 @@
+"""
+Compares rank fusion with score fusion (see Weight.fusion).
+
+Usage: python benchmarks/fusion.py [snapshot path] [requests per case]
+
+The catalog is memory-mapped from the snapshot (SNAPSHOT_PATH by default, see snapshot.py)
+or loaded from Postgres if there is none. For every case it prints the median latency of
+both modes and how close the recommendations of score fusion are to those of rank fusion:
+the share of them in the rank fusion top n and in its top 10n.
+"""
+from sys import argv, path
+import os
+path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import random
+import time
+import numpy as np
+import psycopg2
+
+from catalog import Catalog
+from config import get_postgres_dsn, get_snapshot_path
+from recommend import Recommender, Weight
+from snapshot import load_snapshot
+
+CASES = [
+    (1, 10, Weight()),
+    (1, 100, Weight()),
+    (1, 10, Weight(year=0, rating=0, genres=0, nconsts=100)),
+    (1, 10, Weight(year=150, rating=0, genres=50, nconsts=100)),
+    (3, 10, Weight()),
+    (3, 10, Weight(year=0, rating=0, genres=100, nconsts=0)),
+    (5, 10, Weight()),
+]
+
+
+def main() -> None:
+    root = argv[1] if len(argv) > 1 else get_snapshot_path()
+    count = int(argv[2]) if len(argv) > 2 else 20
+
+    catalog = load_snapshot(root) if root is not None else None
+    if catalog is None:
+        with psycopg2.connect(get_postgres_dsn()) as conn:
+            catalog = Catalog.from_sql(conn)
+    candidates = np.flatnonzero(catalog.has_genres_and_nconsts)
+    print(f"{len(catalog)} titles, {len(candidates)} with genres and nconsts")
+
+    random.seed(0)
+    print(f"{'seeds':>5} {'n':>4} {'weight':<20} {'rank ms':>8} {'score ms':>8} {'in top n':>8} {'in 10n':>8}")
+    for seeds, n, weight in CASES:
+        score_weight = Weight(weight.year, weight.rating, weight.genres, weight.nconsts, fusion='score')
+        rank_times, score_times, overlaps, deep_overlaps = [], [], [], []
+        for _ in range(count):
+            tconsts = [int(catalog.tconst[row]) for row in random.sample(list(candidates), seeds)]
+
+            start = time.perf_counter()
+            expected = Recommender(catalog, weight=weight).get_recommendations(tconsts, n)
+            rank_times.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            got = Recommender(catalog, weight=score_weight).get_recommendations(tconsts, n)
+            score_times.append(time.perf_counter() - start)
+
+            deep = Recommender(catalog, weight=weight).get_recommendations(tconsts, 10 * n)
+            overlaps.append(len(got.keys() & expected.keys()) / len(got))
+            deep_overlaps.append(len(got.keys() & deep.keys()) / len(got))
+
+        weights = f"{weight.year}/{weight.rating}/{weight.genres}/{weight.nconsts}"
+        print(
+            f"{seeds:>5} {n:>4} {weights:<20} {np.median(rank_times) * 1000:>8.1f} {np.median(score_times) * 1000:>8.1f}"
+            f" {np.mean(overlaps):>8.0%} {np.mean(deep_overlaps):>8.0%}"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+"""
+Generates a synthetic `imdb` table shaped like the one the ETL loads.
+
+Usage: python benchmarks/generate.py <titles> [--seed N] [--missing SHARE] [--postgres] [--snapshot PATH]
+
+Votes follow a Zipf-like power law, release years grow towards the present, every title
+has up to three genres drawn by their IMDb frequency and up to ten principals drawn from a
+population of people with Zipfian popularity. With --missing, that share of the titles has
+no release year (year 0) and another one has no ratings (rating 0.0 and 0 votes), the
+defaults the ETL leaves them with. The same seed always gives the same table.
+"""
+from sys import path
+import os
+path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import argparse
+import io
+import numpy as np
+import polars as pl
+
+# IMDb genres and their approximate share of titles.
+GENRES = {
+    'drama': 0.33, 'comedy': 0.21, 'documentary': 0.14, 'short': 0.10, 'romance': 0.07,
+    'action': 0.07, 'thriller': 0.06, 'crime': 0.06, 'horror': 0.05, 'adventure': 0.04,
+    'family': 0.04, 'music': 0.03, 'animation': 0.03, 'mystery': 0.03, 'fantasy': 0.03,
+    'biography': 0.025, 'history': 0.02, 'sci-fi': 0.02, 'musical': 0.01, 'war': 0.01,
+    'adult': 0.01, 'sport': 0.01, 'western': 0.008, 'reality-tv': 0.005, 'film-noir': 0.002,
+    'news': 0.002, 'talk-show': 0.001, 'game-show': 0.001
+}
+
+
+def generate(titles: int, seed: int = 0, missing: float = 0.0) -> pl.DataFrame:
+    """
+    Args
+    ----
+    titles: int - number of rows
+    seed: int - seed of the random generator
+    missing: float - share of the titles without a year, and of those without ratings
+
+    Returns
+    -------
+    DataFrame: rows in the format of the `imdb` table, see Catalog.from_df
+    """
+    rng = np.random.default_rng(seed)
+
+    ids = np.sort(rng.choice(np.arange(1, titles * 12), titles, replace=False))
+    years = np.arange(1894, 2026)
+    year_weights = np.exp((years - years[-1]) / 25)
+    year = rng.choice(years, titles, p=year_weights / year_weights.sum()).astype(np.int16)
+    rating = np.round(np.clip(rng.normal(6.4, 1.2, titles), 1, 10), 1).astype(np.float32)
+    votes = np.minimum(np.floor(5 * (rng.pareto(0.9, titles) + 1)), 3_000_000).astype(np.uint32)
+
+    # Weighted sampling without replacement: the top keys of log(weight) + Gumbel noise.
+    names = np.array(list(GENRES))
+    keys = np.log(list(GENRES.values())) + rng.gumbel(size=(titles, len(names)))
+    genre_counts = rng.choice(4, titles, p=[0.05, 0.45, 0.3, 0.2])
+    chosen = np.argsort(-keys, axis=1)[:, :3]
+    genres = pl.DataFrame({
+        'row': np.repeat(np.arange(titles), 3),
+        'genre': names[chosen.ravel()]
+    }).filter((np.arange(3) < genre_counts[:, None]).ravel())
+
+    people = max(1, int(titles * 1.5))
+    popularity = 1 / np.arange(1, people + 1) ** 0.8
+    cast_counts = np.where(rng.random(titles) < 0.03, 0, rng.integers(1, 11, titles))
+    cast = pl.DataFrame({
+        'row': np.repeat(np.arange(titles), cast_counts),
+        'person': rng.choice(people, cast_counts.sum(), p=popularity / popularity.sum())
+    })
+
+    def join(df: pl.DataFrame, column: pl.Expr) -> pl.Series:
+        joined = df.unique().sort(df.columns).group_by('row', maintain_order=True).agg(column.str.join(','))
+        return (
+            pl.DataFrame({'row': np.arange(titles)})
+            .join(joined, on='row', how='left')
+            .sort('row')
+            .to_series(1)
+            .fill_null('')
+        )
+
+    genres = join(genres, pl.col('genre'))
+    nconsts = join(cast, pl.format('nm{}', pl.col('person').cast(pl.String).str.zfill(7)))
+
+    if missing > 0:
+        year[rng.random(titles) < missing] = 0
+        unrated = rng.random(titles) < missing
+        rating[unrated], votes[unrated] = 0.0, 0
+
+    return pl.DataFrame({
+        'tconst': 'tt' + pl.Series(ids).cast(pl.String).str.zfill(7),
+        'year': year,
+        'genres': genres,
+        'nconsts': nconsts,
+        'rating': rating,
+        'votes': votes
+    })
+
+
+def load_postgres(df: pl.DataFrame, conn) -> None:
+    """
+    Replaces all rows of the `imdb` table with df, creating the table if needed.
+
+    Args
+    ----
+    df: DataFrame - rows to load (see generate)
+    conn: psycopg2 connection object
+    """
+    columns = ('tconst', 'year', 'genres', 'nconsts', 'rating', 'votes')
+    buffer = io.StringIO()
+    df.select(columns).write_csv(buffer, include_header=False)
+    buffer.seek(0)
+
+    with conn.cursor() as cursor:
+        cursor.execute(
+            """
+                CREATE TABLE IF NOT EXISTS imdb (
+                    tconst VARCHAR(12) PRIMARY KEY NOT NULL,
+                    year SMALLINT NOT NULL DEFAULT 0,
+                    genres TEXT NOT NULL DEFAULT '',
+                    nconsts TEXT NOT NULL DEFAULT '',
+                    rating REAL NOT NULL DEFAULT 0.0,
+                    votes INTEGER NOT NULL DEFAULT 0
+                )
+            """
+        )
+        cursor.execute('TRUNCATE imdb')
+        cursor.copy_expert(f"COPY imdb ({', '.join(columns)}) FROM STDIN (FORMAT csv)", buffer)
+    conn.commit()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Generate a synthetic imdb table.')
+    parser.add_argument('titles', type=int)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--missing', type=float, default=0.0, help='share of titles without a year or ratings')
+    parser.add_argument('--postgres', action='store_true', help='replace the rows of imdb in POSTGRES_* database')
+    parser.add_argument('--snapshot', help='export a catalog snapshot to this directory (see snapshot.py)')
+    args = parser.parse_args()
+
+    df = generate(args.titles, args.seed, args.missing)
+    print(f"Generated {len(df)} titles")
+    if args.postgres:
+        import psycopg2
+        from config import get_postgres_dsn
+
+        with psycopg2.connect(get_postgres_dsn()) as conn:
+            load_postgres(df, conn)
+        print("Loaded into Postgres")
+    if args.snapshot:
+        from catalog import Catalog
+        from snapshot import export_snapshot
+
+        print(f"Snapshot exported: {export_snapshot(Catalog.from_df(df), args.snapshot)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,217 @@
+"""
+Benchmarks the recommendation backend on a synthetic catalog (see generate.py).
+
+Usage: python benchmarks/harness.py [--titles N] [--postgres] [--workers N] [--requests N] ...
+
+The catalog is built in-process from the generated rows, or, with --postgres, the rows are
+loaded into the POSTGRES_* database and read back with Catalog.from_sql like the server
+does. Requests go straight to the backend, so they measure the computation and not gRPC.
+
+Every case is a sweep over one dimension: the number of seeds, every combination of
+weighted features, the share of titles passing the filter and the number of concurrent
+callers. For every case it prints the median and 99th percentile latency and the
+throughput, and at the end the peak RSS of the process and of its worker processes.
+"""
+from sys import path
+import os
+path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from concurrent.futures import ThreadPoolExecutor
+from itertools import combinations
+import argparse
+import json
+import random
+import resource
+import time
+import numpy as np
+
+from backend import LocalBackend, new_backend
+from catalog import Catalog
+from generate import generate, load_postgres
+from recommend import Filter, Weight
+
+FEATURES = ('year', 'rating', 'genres', 'nconsts')
+SEEDS = (1, 3, 5, 10)
+# Share of the titles passing the filter.
+SELECTIVITIES = (1.0, 0.5, 0.1, 0.01)
+
+
+def get_weights() -> list[Weight]:
+    """
+    Returns
+    -------
+    list[Weight]: every non-empty combination of features with equal weights
+    """
+    return [
+        Weight(**{feature: 100 if feature in features else 0 for feature in FEATURES})
+        for count in range(1, len(FEATURES) + 1)
+        for features in combinations(FEATURES, count)
+    ]
+
+
+def get_filter(catalog: Catalog, selectivity: float) -> Filter:
+    """
+    Args
+    ----
+    catalog: Catalog - catalog to filter
+    selectivity: float - share of the titles that should pass the filter
+
+    Returns
+    -------
+    Filter: filter on the minimum number of votes
+    """
+    if selectivity >= 1:
+        return Filter()
+    return Filter(min_votes=int(np.quantile(catalog.votes, 1 - selectivity)))
+
+
+def run_case(
+    backend: LocalBackend,
+    catalog: Catalog,
+    seeds: int,
+    filter_: Filter,
+    weight: Weight,
+    requests: int,
+    concurrency: int,
+    n: int
+) -> dict:
+    """
+    Args
+    ----
+    backend: LocalBackend - backend to benchmark
+    catalog: Catalog - catalog of the backend
+    seeds: int - number of tconsts of every request
+    filter_: Filter - filter of every request
+    weight: Weight - weight of every request
+    requests: int - number of requests of every caller
+    concurrency: int - number of concurrent callers
+    n: int - number of recommendations of every request
+
+    Returns
+    -------
+    dict: latency percentiles in milliseconds, throughput in requests per second and number of failed requests
+    """
+    candidates = np.flatnonzero(catalog.has_genres_and_nconsts)
+    rng = random.Random(seeds * 1000 + requests)
+    tconsts = [
+        [int(catalog.tconst[candidates[i]]) for i in rng.sample(range(len(candidates)), seeds)]
+        for _ in range(requests * concurrency + 1)
+    ]
+
+    def call(request: list[int]) -> tuple[float, bool]:
+        start = time.perf_counter()
+        try:
+            backend.get_recommendations(request, filter_, weight, n)
+        except ValueError:
+            return time.perf_counter() - start, True
+        return time.perf_counter() - start, False
+
+    # The first request builds the filter mask, which is memoized for the rest.
+    call(tconsts.pop())
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies, failed = map(np.array, zip(*executor.map(call, tconsts)))
+    elapsed = time.perf_counter() - start
+
+    return {
+        'p50_ms': float(np.percentile(latencies, 50) * 1000),
+        'p99_ms': float(np.percentile(latencies, 99) * 1000),
+        'throughput': len(tconsts) / elapsed,
+        'errors': int(failed.sum())
+    }
+
+
+def get_peak_rss() -> tuple[int, int]:
+    """
+    Returns
+    -------
+    tuple[int, int]: peak RSS in bytes of this process and of its largest finished worker process
+    """
+    return (
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * 1024
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Benchmark the recommendation backend.')
+    parser.add_argument('--titles', type=int, default=100_000)
+    parser.add_argument('--seed', type=int, default=0, help='seed of the generator')
+    parser.add_argument('--postgres', action='store_true', help='load the catalog through the POSTGRES_* database')
+    parser.add_argument('--workers', type=int, default=0, help='number of worker processes (see new_backend)')
+    parser.add_argument('--early-termination', action='store_true')
+    parser.add_argument('--shards', type=int, default=1, help='threads every request is ranked with (see rank_rows)')
+    parser.add_argument('--requests', type=int, default=20, help='number of requests of every caller per case')
+    parser.add_argument('--concurrency', default='1,4,16', help='comma separated numbers of concurrent callers')
+    parser.add_argument('--n', type=int, default=10, help='number of recommendations per request')
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    df = generate(args.titles, args.seed)
+    print(f"Generated {len(df)} titles in {time.perf_counter() - start:.1f}s")
+
+    start = time.perf_counter()
+    if args.postgres:
+        import psycopg2
+        from config import get_postgres_dsn
+
+        with psycopg2.connect(get_postgres_dsn()) as conn:
+            load_postgres(df, conn)
+            print(f"Loaded into Postgres in {time.perf_counter() - start:.1f}s")
+            start = time.perf_counter()
+            catalog = Catalog.from_sql(conn)
+    else:
+        catalog = Catalog.from_df(df)
+    del df
+    print(f"Catalog built in {time.perf_counter() - start:.1f}s, {catalog.memory_usage()['total'] / 2**20:.0f} MiB")
+
+    backend = new_backend(catalog, args.workers, early_termination=args.early_termination, shards=args.shards)
+    default_filter, default_weight = Filter(), Weight()
+    cases = [('seeds', f'{seeds}', seeds, default_filter, default_weight, 1) for seeds in SEEDS]
+    cases += [
+        ('weight', f'{seeds}x ' + '/'.join(f'{getattr(weight, f)}' for f in FEATURES), seeds, default_filter, weight, 1)
+        for seeds in (1, 3)
+        for weight in get_weights()
+    ]
+    cases += [
+        ('filter', f'{seeds}x {selectivity:.0%}', seeds, get_filter(catalog, selectivity), default_weight, 1)
+        for seeds in (1, 3)
+        for selectivity in SELECTIVITIES
+    ]
+    cases += [
+        ('concurrency', f'{concurrency}', 1, default_filter, default_weight, concurrency)
+        for concurrency in map(int, args.concurrency.split(','))
+    ]
+
+    results = []
+    print(f"{'sweep':<12} {'case':<20} {'p50 ms':>8} {'p99 ms':>8} {'req/s':>8} {'errors':>6}")
+    try:
+        for sweep, name, seeds, filter_, weight, concurrency in cases:
+            result = run_case(backend, catalog, seeds, filter_, weight, args.requests, concurrency, args.n)
+            results.append({'sweep': sweep, 'case': name, **result})
+            print(
+                f"{sweep:<12} {name:<20} {result['p50_ms']:>8.1f} {result['p99_ms']:>8.1f}"
+                f" {result['throughput']:>8.1f} {result['errors']:>6}"
+            )
+    finally:
+        backend.close()
+
+    rss, children_rss = get_peak_rss()
+    print(f"Peak RSS: {rss / 2**20:.0f} MiB, workers: {children_rss / 2**20:.0f} MiB")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                'titles': args.titles,
+                'workers': args.workers,
+                'early_termination': args.early_termination,
+                'shards': args.shards,
+                'results': results,
+                'peak_rss': rss,
+                'peak_workers_rss': children_rss
+            }, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
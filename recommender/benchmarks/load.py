@@ -0,0 +1,99 @@
+"""
+Benchmarks reading the `imdb` table with pl.read_database against read_copy (see db.py).
+
+Usage: python benchmarks/load.py [--titles N] [--repeat N] [--no-generate]
+
+Loads a synthetic table (see generate.py) into the POSTGRES_* database, then reads it
+back with every method in a fresh process, so the peak RSS of one does not hide the
+other's. For every method it prints the best and median time of the reads and the peak
+RSS of the process above what it used before reading.
+"""
+from sys import path
+import os
+path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+import numpy as np
+import polars as pl
+import psycopg2
+
+from catalog import Catalog
+from config import get_postgres_dsn
+from db import read_copy
+from generate import generate, load_postgres
+
+QUERY = f"SELECT {', '.join(Catalog.columns)} FROM imdb"
+METHODS = {
+    'read_database': lambda conn: pl.read_database(QUERY, conn, schema_overrides=Catalog.schema),
+    'read_copy': lambda conn: read_copy(conn, QUERY, Catalog.schema)
+}
+
+
+def run_method(method: str, repeat: int) -> dict:
+    """
+    Args
+    ----
+    method: str - key of METHODS
+    repeat: int - number of reads
+
+    Returns
+    -------
+    dict: seconds of every read, rows read and peak RSS in bytes before and after reading
+    """
+    with psycopg2.connect(get_postgres_dsn()) as conn:
+        base_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        seconds = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            df = METHODS[method](conn)
+            seconds.append(time.perf_counter() - start)
+            conn.rollback()
+            del df
+        rows = len(METHODS[method](conn))
+    return {
+        'seconds': seconds,
+        'rows': rows,
+        'base_rss': base_rss,
+        'peak_rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Benchmark reading the imdb table.')
+    parser.add_argument('--titles', type=int, default=1_000_000)
+    parser.add_argument('--seed', type=int, default=0, help='seed of the generator')
+    parser.add_argument('--repeat', type=int, default=3, help='number of reads per method')
+    parser.add_argument('--no-generate', action='store_true', help='read the rows already in imdb')
+    parser.add_argument('--method', choices=METHODS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.method:
+        print(json.dumps(run_method(args.method, args.repeat)))
+        return
+
+    if not args.no_generate:
+        start = time.perf_counter()
+        with psycopg2.connect(get_postgres_dsn()) as conn:
+            load_postgres(generate(args.titles, args.seed), conn)
+        print(f"Loaded {args.titles} titles into Postgres in {time.perf_counter() - start:.1f}s")
+
+    print(f"{'method':<14} {'rows':>9} {'best s':>8} {'median s':>9} {'peak MiB':>9} {'added MiB':>10}")
+    for method in METHODS:
+        output = subprocess.run(
+            [sys.executable, __file__, '--method', method, '--repeat', str(args.repeat)],
+            check=True, capture_output=True, text=True
+        ).stdout
+        result = json.loads(output.splitlines()[-1])
+        print(
+            f"{method:<14} {result['rows']:>9} {min(result['seconds']):>8.2f} {np.median(result['seconds']):>9.2f}"
+            f" {result['peak_rss'] / 2**20:>9.0f} {(result['peak_rss'] - result['base_rss']) / 2**20:>10.0f}"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Compares the full ranking with early termination (Recommender.get_threshold_responses).
+
+Usage: python benchmarks/threshold.py [snapshot path] [requests per case]
+
+The catalog is memory-mapped from the snapshot (SNAPSHOT_PATH by default, see snapshot.py)
+or loaded from Postgres if there is none. For every case it prints the median latency of
+both modes, the share of requests that stopped early and the median fraction of every
+ranking that was read.
+"""
+from sys import argv, path
+import os
+path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import random
+import time
+import numpy as np
+import psycopg2
+
+from catalog import Catalog
+from config import get_postgres_dsn, get_snapshot_path
+from recommend import Recommender, Weight
+from snapshot import load_snapshot
+
+CASES = [
+    (1, Weight()),
+    (1, Weight(year=0, rating=0, genres=0, nconsts=100)),
+    (1, Weight(year=150, rating=0, genres=50, nconsts=100)),
+    (3, Weight()),
+    (3, Weight(year=0, rating=0, genres=100, nconsts=0)),
+    (5, Weight()),
+]
+
+
+def main() -> None:
+    root = argv[1] if len(argv) > 1 else get_snapshot_path()
+    count = int(argv[2]) if len(argv) > 2 else 20
+
+    catalog = load_snapshot(root) if root is not None else None
+    if catalog is None:
+        with psycopg2.connect(get_postgres_dsn()) as conn:
+            catalog = Catalog.from_sql(conn)
+    candidates = np.flatnonzero(catalog.has_genres_and_nconsts)
+    print(f"{len(catalog)} titles, {len(candidates)} with genres and nconsts")
+
+    random.seed(0)
+    print(f"{'seeds':>5} {'weight':<28} {'full ms':>8} {'early ms':>8} {'stopped':>8} {'read':>8}")
+    for seeds, weight in CASES:
+        full_times, early_times, fractions = [], [], []
+        for _ in range(count):
+            tconsts = [int(catalog.tconst[row]) for row in random.sample(list(candidates), seeds)]
+
+            start = time.perf_counter()
+            expected = Recommender(catalog, weight=weight).get_recommendations(tconsts, 5)
+            full_times.append(time.perf_counter() - start)
+
+            recommender = Recommender(catalog, weight=weight, early_termination=True)
+            start = time.perf_counter()
+            got = recommender.get_recommendations(tconsts, 5)
+            early_times.append(time.perf_counter() - start)
+
+            if got != expected:
+                raise AssertionError(f"results of {tconsts} differ")
+            fractions.append(recommender.depth / len(recommender.get_filtered_rows(tconsts)))
+
+        weights = f"{weight.year}/{weight.rating}/{weight.genres}/{weight.nconsts}"
+        print(
+            f"{seeds:>5} {weights:<28} {np.median(full_times) * 1000:>8.1f} {np.median(early_times) * 1000:>8.1f}"
+            f" {np.mean(np.array(fractions) < 1):>8.0%} {np.median(fractions):>8.2%}"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,216 @@
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+import sys
+import threading
+import time
+
+
+def get_size(value: Any) -> int:
+    """
+    Args
+    ----
+    value: Any - str, number or nested dict/list/tuple of them
+
+    Returns
+    -------
+    int: approximate memory used by value in bytes
+    """
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(get_size(k) + get_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(get_size(v) for v in value)
+    return size
+
+
+class ResultCache:
+    """
+    Thread-safe LRU cache of recommendation results with a TTL and a memory budget.
+
+    Every entry belongs to a catalog version. Looking up a result for a version other than
+    the current one drops all entries, so a data reload never serves stale results.
+    """
+
+    def __init__(self, max_bytes: int, ttl: float) -> None:
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.version: Hashable = None
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries: OrderedDict[Hashable, tuple[float, int, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, version: Hashable) -> Any:
+        """
+        Args
+        ----
+        key: Hashable - normalized request
+        version: Hashable - version of the catalog the result is needed for
+
+        Returns
+        -------
+        Any: cached result, None if not cached or expired
+        """
+        with self._lock:
+            self._set_version(version)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, size, value = entry
+            if expires_at < time.monotonic():
+                self._remove(key, size)
+                self.evictions += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, version: Hashable, value: Any) -> None:
+        """
+        Args
+        ----
+        key: Hashable - normalized request
+        version: Hashable - version of the catalog the result was computed from
+        value: Any - result to cache, must not be modified afterwards
+        """
+        size = get_size(key) + get_size(value)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            # A result computed from a catalog that was replaced in the meantime is not cached.
+            if self.version != version:
+                return
+
+            old = self._entries.get(key)
+            if old is not None:
+                self._remove(key, old[1])
+
+            self._entries[key] = (time.monotonic() + self.ttl, size, value)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                old_key, (_, old_size, _) = next(iter(self._entries.items()))
+                self._remove(old_key, old_size)
+                self.evictions += 1
+
+    def stats(self) -> dict[str, int]:
+        """
+        Returns
+        -------
+        dict[str, int]: entries, bytes, hits, misses, evictions and invalidations counters
+        """
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self.bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations
+            }
+
+    def _set_version(self, version: Hashable) -> None:
+        if self.version == version:
+            return
+        if len(self._entries) > 0:
+            self.invalidations += 1
+        self._entries.clear()
+        self.bytes = 0
+        self.version = version
+
+    def _remove(self, key: Hashable, size: int) -> None:
+        del self._entries[key]
+        self.bytes -= size
+
+
+class _Flight:
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: BaseException = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key: the first call computes the result and
+    every call arriving before it finished waits for it and shares it, or its exception.
+
+    Unlike ResultCache nothing is kept once the call finished, so it also deduplicates
+    results too large to cache. A waiting call gives up at its own deadline, and computes the
+    result itself if the first call failed with an error of its own (e.g. its caller went away).
+    """
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.coalesced = 0
+        self._flights: dict[Hashable, _Flight] = {}
+        self._lock = threading.Lock()
+
+    def do(
+        self,
+        key: Hashable,
+        fn: Callable[[], Any],
+        deadline: float = None,
+        retry: tuple[type[BaseException], ...] = ()
+    ) -> Any:
+        """
+        Args
+        ----
+        key: Hashable - normalized request, including the catalog version
+        fn: Callable[[], Any] - computes the result, called only if no call with key is running
+        deadline: float - time.monotonic() until which to wait for a running call
+        retry: tuple[type[BaseException], ...] - errors of a running call that are not shared
+
+        Returns
+        -------
+        Any: result of fn, possibly computed by another thread
+
+        Raises
+        ------
+        TimeoutError: if the running call did not finish before the deadline
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.calls += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            timeout = None if deadline is None else min(max(deadline - time.monotonic(), 0.0), threading.TIMEOUT_MAX)
+            if not flight.done.wait(timeout):
+                raise TimeoutError("deadline exceeded waiting for an identical request")
+            if isinstance(flight.error, retry):
+                return self.do(key, fn, deadline, retry)
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = fn()
+            return flight.value
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def stats(self) -> dict[str, int]:
+        """
+        Returns
+        -------
+        dict[str, int]: calls computed, calls coalesced into them and calls in flight
+        """
+        with self._lock:
+            return {'calls': self.calls, 'coalesced': self.coalesced, 'in_flight': len(self._flights)}
@@ -0,0 +1,737 @@
+from typing import Any
+import json
+import os
+import numpy as np
+import polars as pl
+from scipy.sparse import csc_matrix, csr_matrix
+from db import read_copy
+
+
+def parse_tconst(tconst: str) -> int:
+    """
+    Args
+    ----
+    tconst: str - tconst in IMDb format (tt0000001)
+
+    Returns
+    -------
+    int: numeric part of tconst
+
+    Raises
+    ------
+    ValueError: if tconst is not in IMDb format, so it can not be in the catalog
+    """
+    if tconst.startswith('tt') and tconst[2:].isdecimal():
+        id_ = int(tconst[2:])
+        if id_ < 2**32 and format_tconst(id_) == tconst:
+            return id_
+    raise ValueError(f"tconst '{tconst}' not found")
+
+
+def format_tconst(tconst: int) -> str:
+    """
+    Args
+    ----
+    tconst: int - numeric part of tconst (see parse_tconst)
+
+    Returns
+    -------
+    str: tconst in IMDb format
+    """
+    return f'tt{tconst:07d}'
+
+
+class CountMatrix:
+    """
+    Token counts of a list column, built once over the whole catalog.
+
+    Rows of `matrix` follow catalog row order, its columns are the ids in `vocabulary`
+    (ascending) and `norms` holds the L2 norm of every row.
+    `postings` is the same matrix in column order, an inverted index from every token to the
+    rows containing it, so the rows similar to a reference row are found from the posting
+    lists of its tokens without looking at any other row.
+    """
+
+    # Posting lists longer than 1/dense_ratio of the rows are summed up in a dense array instead of sorted.
+    dense_ratio = 8
+
+    def __init__(self, matrix: csr_matrix, postings: csc_matrix, norms: np.ndarray, vocabulary: np.ndarray) -> None:
+        self.matrix = matrix
+        self.postings = postings
+        self.norms = norms
+        self.vocabulary = vocabulary
+
+    @classmethod
+    def from_ids(cls, ids: pl.Series) -> 'CountMatrix':
+        """
+        Args
+        ----
+        ids: pl.Series - list of integer ids of every catalog row
+
+        Returns
+        -------
+        CountMatrix: counts of the ids of every row
+        """
+        values = ids.explode().drop_nulls().to_numpy()
+        return cls.from_entries(
+            np.repeat(np.arange(len(ids)), ids.list.len().to_numpy()),
+            values, np.ones(len(values), dtype=np.float32), len(ids)
+        )
+
+    @classmethod
+    def from_entries(cls, rows: np.ndarray, ids: np.ndarray, counts: np.ndarray, n_rows: int) -> 'CountMatrix':
+        """
+        Args
+        ----
+        rows: np.ndarray - catalog row of every entry
+        ids: np.ndarray - id of every entry
+        counts: np.ndarray (float32) - count of every entry, entries of the same row and id are summed
+        n_rows: int - number of catalog rows
+
+        Returns
+        -------
+        CountMatrix: counts of the ids of every row
+        """
+        vocabulary, columns = np.unique(ids, return_inverse=True)
+        matrix = csr_matrix((counts, (rows, columns)), shape=(n_rows, len(vocabulary)))
+        matrix.sum_duplicates()
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1), dtype=np.float64).ravel())
+        return cls(matrix, matrix.tocsc(), norms, vocabulary.astype(np.uint32))
+
+    def get_entries(self, rows: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Args
+        ----
+        rows: np.ndarray - catalog rows (ascending)
+
+        Returns
+        -------
+        tuple[np.ndarray, np.ndarray, np.ndarray]: position in `rows` of the row of every entry of `rows`,
+        and the id and count of the entry (see from_entries)
+        """
+        lengths = np.diff(self.matrix.indptr)
+        entries = np.repeat(np.isin(np.arange(len(lengths)), rows), lengths)
+        return (
+            np.repeat(np.arange(len(rows)), lengths[rows]),
+            self.vocabulary[self.matrix.indices[entries]],
+            self.matrix.data[entries]
+        )
+
+    def save(self, path: str, name: str) -> None:
+        """
+        Args
+        ----
+        path: str - directory to write the `<name>_*.npy` files to
+        name: str - prefix of the file names
+        """
+        np.save(os.path.join(path, f'{name}_data.npy'), self.matrix.data)
+        np.save(os.path.join(path, f'{name}_indices.npy'), self.matrix.indices)
+        np.save(os.path.join(path, f'{name}_indptr.npy'), self.matrix.indptr)
+        np.save(os.path.join(path, f'{name}_postings_data.npy'), self.postings.data)
+        np.save(os.path.join(path, f'{name}_postings_indices.npy'), self.postings.indices)
+        np.save(os.path.join(path, f'{name}_postings_indptr.npy'), self.postings.indptr)
+        np.save(os.path.join(path, f'{name}_norms.npy'), self.norms)
+        np.save(os.path.join(path, f'{name}_vocabulary.npy'), self.vocabulary)
+
+    @classmethod
+    def load(cls, path: str, name: str, shape: tuple[int, int]) -> 'CountMatrix':
+        """
+        Args
+        ----
+        path: str - directory the files were saved to (see save)
+        name: str - prefix of the file names
+        shape: tuple[int, int] - shape of the matrix
+
+        Returns
+        -------
+        CountMatrix: matrix backed by read-only memory maps of the files
+        """
+        load = lambda suffix: np.load(os.path.join(path, f'{name}_{suffix}.npy'), mmap_mode='r')
+        matrix = csr_matrix((load('data'), load('indices'), load('indptr')), shape=shape, copy=False)
+        postings = csc_matrix(
+            (load('postings_data'), load('postings_indices'), load('postings_indptr')), shape=shape, copy=False
+        )
+        return cls(matrix, postings, load('norms'), load('vocabulary'))
+
+    def get_similar(self, reference_row: int) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Args
+        ----
+        reference_row: int - catalog row to compare with
+
+        Returns
+        -------
+        tuple[np.ndarray, np.ndarray]: catalog rows sharing at least one token with `reference_row` (ascending)
+        and their cosine similarity with it (float32), every other row has a similarity of 0
+        """
+        start, end = self.matrix.indptr[reference_row], self.matrix.indptr[reference_row + 1]
+        tokens, counts = self.matrix.indices[start:end], self.matrix.data[start:end]
+        if len(tokens) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        rows, dots = [], []
+        for token, count in zip(tokens, counts):
+            start, end = self.postings.indptr[token], self.postings.indptr[token + 1]
+            rows.append(self.postings.indices[start:end])
+            dots.append(self.postings.data[start:end] * count)
+        rows, dots = np.concatenate(rows), np.concatenate(dots)
+        # Counts are small integers, so the dot products are exact in any summation order.
+        if len(rows) * self.dense_ratio > len(self.norms):
+            dots = np.bincount(rows, weights=dots, minlength=len(self.norms))
+            similar = np.flatnonzero(dots)
+            dots = dots[similar]
+        else:
+            similar, inverse = np.unique(rows, return_inverse=True)
+            dots = np.bincount(inverse, weights=dots)
+        return similar, (dots / (self.norms[reference_row] * self.norms[similar])).astype(np.float32)
+
+    def cosine_similarity(self, rows: np.ndarray, reference_rows: np.ndarray) -> np.ndarray:
+        """
+        Args
+        ----
+        rows: np.ndarray - catalog rows to calculate cosine similarities for
+        reference_rows: np.ndarray - catalog rows to compare with
+
+        Returns
+        -------
+        np.ndarray (float32): cosine similarity of every row in `rows` (columns) with every row
+        in `reference_rows` (rows), 0 for rows without tokens
+        """
+        columns = np.full(len(self.norms), -1, dtype=np.int64)
+        columns[rows] = np.arange(len(rows))
+
+        sims = np.zeros((len(reference_rows), len(rows)), dtype=np.float32)
+        for i, reference_row in enumerate(reference_rows):
+            similar, similarities = self.get_similar(reference_row)
+            similar_columns = columns[similar]
+            keep = similar_columns >= 0
+            sims[i, similar_columns[keep]] = similarities[keep]
+        return sims
+
+
+def get_nconst_ids(nconsts: pl.Series) -> pl.Series:
+    """
+    Args
+    ----
+    nconsts: pl.Series - comma separated nconsts of every catalog row
+
+    Returns
+    -------
+    pl.Series: list of the numeric parts (uint32) of the nconsts of every row
+    """
+    return nconsts.str.extract_all(r'\d+').list.eval(pl.element().cast(pl.UInt32))
+
+
+def get_genre_tokens(genres: pl.Series) -> pl.Series:
+    """
+    Args
+    ----
+    genres: pl.Series - comma separated genres of every catalog row
+
+    Returns
+    -------
+    pl.Series: list of the lowercase genres of every row
+    """
+    return genres.str.to_lowercase().str.extract_all(r"[\w'-]+")
+
+
+def get_genre_masks(genres: pl.Series, vocabulary: np.ndarray = None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Args
+    ----
+    genres: pl.Series - comma separated genres of every catalog row
+    vocabulary: np.ndarray - distinct genres (ascending) including every genre of `genres`,
+    the distinct genres of `genres` if None
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray]: bitmask of the genres of every row (uint32), bit i standing for
+    the genre i of the vocabulary, and the vocabulary
+
+    Raises
+    ------
+    ValueError: if there are more than 32 distinct genres
+    """
+    tokens = get_genre_tokens(genres)
+    values = tokens.explode().drop_nulls().to_numpy()
+    rows = np.repeat(np.arange(len(genres)), tokens.list.len().to_numpy())
+    if vocabulary is None:
+        vocabulary, bits = np.unique(values, return_inverse=True)
+    else:
+        bits = np.searchsorted(vocabulary, values)
+    if len(vocabulary) > 32:
+        raise ValueError(f"at most 32 distinct genres are supported, got {len(vocabulary)}")
+
+    masks = np.zeros(len(genres), dtype=np.uint32)
+    np.bitwise_or.at(masks, rows, np.left_shift(np.uint32(1), bits.astype(np.uint32)))
+    return masks, vocabulary
+
+
+def remap_genre_masks(masks: np.ndarray, vocabulary: np.ndarray, new_vocabulary: np.ndarray) -> np.ndarray:
+    """
+    Args
+    ----
+    masks: np.ndarray (uint32) - genre bitmasks over `vocabulary` (see get_genre_masks)
+    vocabulary: np.ndarray - distinct genres (ascending) of `masks`
+    new_vocabulary: np.ndarray - distinct genres (ascending) to remap to, genres missing from it are dropped
+
+    Returns
+    -------
+    np.ndarray (uint32): the same genres as bitmasks over `new_vocabulary`
+    """
+    if np.array_equal(vocabulary, new_vocabulary):
+        return masks
+    new_masks = np.zeros(len(masks), dtype=np.uint32)
+    for bit, position in enumerate(np.searchsorted(new_vocabulary, vocabulary)):
+        if position < len(new_vocabulary) and new_vocabulary[position] == vocabulary[bit]:
+            new_masks |= ((masks >> np.uint32(bit)) & np.uint32(1)) << np.uint32(position)
+    return new_masks
+
+
+class ValueBuckets:
+    """
+    Catalog rows grouped by the distinct values of a column.
+
+    `values` holds the distinct values in ascending order and `codes` the position of the
+    value of every row in `values`, so a row's distance from any reference value can be
+    looked up from a table with one entry per distinct value.
+    """
+
+    def __init__(self, values: np.ndarray, codes: np.ndarray) -> None:
+        self.values = values
+        self.codes = codes
+
+    @classmethod
+    def from_column(cls, column: np.ndarray) -> 'ValueBuckets':
+        """
+        Args
+        ----
+        column: np.ndarray - value of every catalog row
+
+        Returns
+        -------
+        ValueBuckets: buckets of the distinct values of column
+        """
+        values, codes = np.unique(column, return_inverse=True)
+        # Keys of up to 16 bits are ranked with a linear time radix sort (see get_ranks).
+        return cls(values, codes.astype(np.uint16 if len(values) <= 2**16 else np.uint32))
+
+    def save(self, path: str, name: str) -> None:
+        """
+        Args
+        ----
+        path: str - directory to write the `<name>_*.npy` files to
+        name: str - prefix of the file names
+        """
+        np.save(os.path.join(path, f'{name}_values.npy'), self.values)
+        np.save(os.path.join(path, f'{name}_codes.npy'), self.codes)
+
+    @classmethod
+    def load(cls, path: str, name: str) -> 'ValueBuckets':
+        """
+        Args
+        ----
+        path: str - directory the files were saved to (see save)
+        name: str - prefix of the file names
+
+        Returns
+        -------
+        ValueBuckets: buckets backed by read-only memory maps of the files
+        """
+        load = lambda suffix: np.load(os.path.join(path, f'{name}_{suffix}.npy'), mmap_mode='r')
+        return cls(load('values'), load('codes'))
+
+    def get_distance_ranks(self, distances: np.ndarray) -> np.ndarray:
+        """
+        Args
+        ----
+        distances: np.ndarray - distance of every distinct value (columns) from every reference value (rows)
+
+        Returns
+        -------
+        np.ndarray: dense rank of the distance of every distinct value from every reference value,
+        equal distances share a rank. Has the dtype of `codes`.
+        """
+        order = np.argsort(distances, axis=1, kind='stable')
+        sorted_distances = np.take_along_axis(distances, order, axis=1)
+        changes = np.ones(distances.shape, dtype=bool)
+        changes[:, 1:] = sorted_distances[:, 1:] != sorted_distances[:, :-1]
+
+        ranks = np.empty(distances.shape, dtype=self.codes.dtype)
+        np.put_along_axis(ranks, order, (np.cumsum(changes, axis=1) - 1).astype(self.codes.dtype), axis=1)
+        return ranks
+
+
+class Catalog:
+    """
+    Read-only, in-memory columnar snapshot of the `imdb` table.
+
+    The snapshot is loaded once and shared by every request, so the recommendation
+    pipeline never has to go back to Postgres on the hot path. Row ids are positions
+    in tconst order and are shared by every column and matrix. tconsts and nconsts are
+    kept as the uint32 numeric part of their ids (see parse_tconst).
+    """
+
+    columns = ('tconst', 'year', 'genres', 'nconsts', 'rating', 'votes')
+    schema = {
+        'tconst': pl.String,
+        'year': pl.Int16,
+        'genres': pl.String,
+        'nconsts': pl.String,
+        'rating': pl.Float32,
+        'votes': pl.UInt32
+    }
+    # Version of the files written by save, bumped whenever their layout changes.
+    format_version = 6
+
+    def __init__(
+        self,
+        tconst: np.ndarray,
+        year: np.ndarray,
+        rating: np.ndarray,
+        votes: np.ndarray,
+        has_genres_and_nconsts: np.ndarray,
+        by_votes: np.ndarray,
+        year_buckets: ValueBuckets,
+        rating_buckets: ValueBuckets,
+        genres: np.ndarray,
+        genre_vocabulary: np.ndarray,
+        nconsts: CountMatrix,
+        row_hashes: np.ndarray,
+        version: str,
+        xmin: int = None
+    ) -> None:
+        self.tconst = tconst
+        self.year = year
+        self.rating = rating
+        self.votes = votes
+        self.has_genres_and_nconsts = has_genres_and_nconsts
+        # Rows ordered by number of votes (descending) and then by row.
+        self.by_votes = by_votes
+        self.year_buckets = year_buckets
+        self.rating_buckets = rating_buckets
+        # Bitmask of the genres of every row (see get_genre_masks).
+        self.genres = genres
+        self.genre_vocabulary = genre_vocabulary
+        self.nconsts = nconsts
+        # Hash of every source row, the version is their sum so it can be updated row by row.
+        self.row_hashes = row_hashes
+        # Identifies the data the snapshot was built from, changes whenever any row changes.
+        self.version = version
+        # Oldest transaction whose changes to `imdb` may be missing from the catalog, None if
+        # changes are not tracked (see CatalogRefresher).
+        self.xmin = xmin
+        # Directory the catalog was memory-mapped from (see load).
+        self.path: str = None
+
+    def __reduce_ex__(self, protocol: int) -> tuple:
+        # A memory-mapped catalog is sent to other processes as its path, so they map the same files.
+        if self.path is not None:
+            return Catalog.load, (self.path,)
+        return super().__reduce_ex__(protocol)
+
+    @classmethod
+    def from_df(cls, df: pl.DataFrame, xmin: int = None) -> 'Catalog':
+        """
+        Args
+        ----
+        df: DataFrame
+        | tconst (str) | year (int16) | genres (str)   | nconsts (str)       | rating (float32) | votes (uint32) |
+        | ---          | ---          | ---            | ---                 | ---              | ---            |
+        | tt0000001    | 1894         | drama,romance  | nm0000001,nm0000002 | 5.7              | 123            |
+        | ...          | ...          | ...            | ...                 | ...              | ...            |
+        xmin: int - see Catalog.xmin
+
+        Returns
+        -------
+        Catalog: snapshot of the rows of df ordered by tconst
+        """
+        df = cls.get_rows(df)
+        genres, genre_vocabulary = get_genre_masks(df['genres'])
+        return cls.from_columns(
+            tconst=df['id'].to_numpy(),
+            year=df['year'].to_numpy(),
+            rating=df['rating'].to_numpy(),
+            votes=df['votes'].to_numpy(),
+            has_genres_and_nconsts=((df['genres'] != '') & (df['nconsts'] != '')).to_numpy(),
+            genres=genres,
+            genre_vocabulary=genre_vocabulary,
+            nconsts=CountMatrix.from_ids(get_nconst_ids(df['nconsts'])),
+            row_hashes=df['hash'].to_numpy(),
+            xmin=xmin
+        )
+
+    @classmethod
+    def get_rows(cls, df: pl.DataFrame) -> pl.DataFrame:
+        """
+        Args
+        ----
+        df: DataFrame - rows in the format of the `imdb` table, see from_df
+
+        Returns
+        -------
+        DataFrame: the columns of df cast to `schema`, with the numeric tconst (id) and the hash of
+        every row (hash), ordered by id
+
+        Raises
+        ------
+        ValueError: if a tconst is not in IMDb format
+        """
+        df = df.select(cls.columns).cast(cls.schema)
+        tconst = df['tconst'].str.strip_prefix('tt').cast(pl.UInt32)
+        if not (tconst.cast(pl.String).str.zfill(7) == df['tconst'].str.strip_prefix('tt')).all():
+            raise ValueError("tconsts should be in IMDb format (tt0000001)")
+        return df.with_columns(id=tconst, hash=df.hash_rows()).sort('id')
+
+    @classmethod
+    def from_columns(
+        cls,
+        tconst: np.ndarray,
+        year: np.ndarray,
+        rating: np.ndarray,
+        votes: np.ndarray,
+        has_genres_and_nconsts: np.ndarray,
+        genres: np.ndarray,
+        genre_vocabulary: np.ndarray,
+        nconsts: CountMatrix,
+        row_hashes: np.ndarray,
+        xmin: int = None
+    ) -> 'Catalog':
+        """
+        Builds the indexes derived from the columns (rows ordered by tconst).
+
+        Returns
+        -------
+        Catalog: catalog of the columns
+        """
+        return cls(
+            tconst=tconst,
+            year=year,
+            rating=rating,
+            votes=votes,
+            has_genres_and_nconsts=has_genres_and_nconsts,
+            by_votes=np.argsort(-votes.astype(np.int64), kind='stable').astype(np.uint32),
+            year_buckets=ValueBuckets.from_column(year),
+            rating_buckets=ValueBuckets.from_column(rating),
+            genres=genres,
+            genre_vocabulary=genre_vocabulary,
+            nconsts=nconsts,
+            row_hashes=row_hashes,
+            version=f"{int(row_hashes.sum(dtype=np.uint64)):016x}",
+            xmin=xmin
+        )
+
+    def apply_changes(self, df: pl.DataFrame, tconsts: np.ndarray, xmin: int = None) -> 'Catalog':
+        """
+        Builds the catalog of the rows of this one with some rows inserted, replaced or deleted,
+        without parsing the rows that did not change again. The result is the same as from_df
+        of all rows.
+
+        Args
+        ----
+        df: DataFrame - current rows of the changed tconsts in the format of the `imdb` table, see from_df
+        tconsts: np.ndarray - numeric changed tconsts, the ones missing from df are deleted
+        xmin: int - see Catalog.xmin
+
+        Returns
+        -------
+        Catalog: the updated catalog
+        """
+        df = self.get_rows(df)
+        keep = np.flatnonzero(~np.isin(self.tconst, np.concatenate([tconsts, df['id'].to_numpy()])))
+        tconst = np.concatenate([self.tconst[keep], df['id'].to_numpy()])
+        order = np.argsort(tconst, kind='stable')
+        positions = np.empty(len(order), dtype=np.int64)
+        positions[order] = np.arange(len(order))
+        merge = lambda old, new: np.concatenate([old[keep], new])[order]
+
+        tokens = get_genre_tokens(df['genres']).explode().drop_nulls().to_numpy()
+        vocabulary = np.unique(np.concatenate([self.genre_vocabulary, tokens]))
+        genres = np.concatenate([
+            remap_genre_masks(self.genres[keep], self.genre_vocabulary, vocabulary),
+            get_genre_masks(df['genres'], vocabulary)[0]
+        ])[order]
+        # Genres only the replaced rows had are dropped.
+        used = np.bitwise_or.reduce(genres) if len(genres) > 0 else np.uint32(0)
+        genre_vocabulary = vocabulary[[bool(used >> np.uint32(bit) & 1) for bit in range(len(vocabulary))]]
+        genres = remap_genre_masks(genres, vocabulary, genre_vocabulary)
+
+        rows, ids, counts = self.nconsts.get_entries(keep)
+        nconst_ids = get_nconst_ids(df['nconsts'])
+        new_ids = nconst_ids.explode().drop_nulls().to_numpy()
+        nconsts = CountMatrix.from_entries(
+            positions[np.concatenate([rows, len(keep) + np.repeat(np.arange(len(df)), nconst_ids.list.len().to_numpy())])],
+            np.concatenate([ids, new_ids]),
+            np.concatenate([counts, np.ones(len(new_ids), dtype=np.float32)]),
+            len(order)
+        )
+
+        return self.from_columns(
+            tconst=tconst[order],
+            year=merge(self.year, df['year'].to_numpy()),
+            rating=merge(self.rating, df['rating'].to_numpy()),
+            votes=merge(self.votes, df['votes'].to_numpy()),
+            has_genres_and_nconsts=merge(
+                self.has_genres_and_nconsts, ((df['genres'] != '') & (df['nconsts'] != '')).to_numpy()
+            ),
+            genres=genres,
+            genre_vocabulary=genre_vocabulary,
+            nconsts=nconsts,
+            row_hashes=merge(self.row_hashes, df['hash'].to_numpy()),
+            xmin=xmin
+        )
+
+    @classmethod
+    def from_sql(cls, conn) -> 'Catalog':
+        """
+        Args
+        ----
+        conn: psycopg2 connection object
+
+        Returns
+        -------
+        Catalog: snapshot of the whole `imdb` table ordered by tconst
+        """
+        with conn.cursor() as cursor:
+            # The rows and xmin have to come from the same database snapshot.
+            cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+            cursor.execute(
+                """
+                    SELECT
+                        to_regclass('imdb_changes') IS NOT NULL,
+                        pg_snapshot_xmin(pg_current_snapshot())::TEXT::BIGINT
+                """
+            )
+            tracked, xmin = cursor.fetchone()
+
+        return cls.from_df(
+            read_copy(conn, f"SELECT {', '.join(cls.columns)} FROM imdb", cls.schema),
+            xmin=xmin if tracked else None
+        )
+
+    def save(self, path: str) -> None:
+        """
+        Writes the catalog as `.npy` files and a `manifest.json` to a new directory.
+
+        Args
+        ----
+        path: str - directory to create
+        """
+        os.makedirs(path)
+        for name in ('tconst', 'year', 'rating', 'votes', 'has_genres_and_nconsts', 'by_votes', 'genres', 'row_hashes'):
+            np.save(os.path.join(path, f'{name}.npy'), getattr(self, name))
+        self.year_buckets.save(path, 'year_buckets')
+        self.rating_buckets.save(path, 'rating_buckets')
+        self.nconsts.save(path, 'nconsts')
+
+        with open(os.path.join(path, 'manifest.json'), 'w') as f:
+            json.dump(
+                {
+                    'format_version': self.format_version,
+                    'version': self.version,
+                    'xmin': self.xmin,
+                    'rows': len(self),
+                    'genres': list(self.genre_vocabulary),
+                    'nconsts_columns': self.nconsts.matrix.shape[1]
+                }, f
+            )
+
+    @classmethod
+    def load(cls, path: str) -> 'Catalog':
+        """
+        Memory-maps a catalog written by save. Pages are read lazily and shared through
+        the page cache by every process that maps the same files.
+
+        Args
+        ----
+        path: str - directory the catalog was saved to
+
+        Returns
+        -------
+        Catalog: catalog backed by read-only memory maps
+
+        Raises
+        ------
+        ValueError: if the files were written in another format version
+        """
+        with open(os.path.join(path, 'manifest.json')) as f:
+            manifest = json.load(f)
+        if manifest['format_version'] != cls.format_version:
+            raise ValueError(
+                f"catalog format version {manifest['format_version']} is not supported, expected {cls.format_version}"
+            )
+
+        load = lambda name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r')
+        catalog = cls(
+            tconst=load('tconst'),
+            year=load('year'),
+            rating=load('rating'),
+            votes=load('votes'),
+            has_genres_and_nconsts=load('has_genres_and_nconsts'),
+            by_votes=load('by_votes'),
+            year_buckets=ValueBuckets.load(path, 'year_buckets'),
+            rating_buckets=ValueBuckets.load(path, 'rating_buckets'),
+            genres=load('genres'),
+            genre_vocabulary=np.array(manifest['genres'], dtype=object),
+            nconsts=CountMatrix.load(path, 'nconsts', (manifest['rows'], manifest['nconsts_columns'])),
+            row_hashes=load('row_hashes'),
+            version=manifest['version'],
+            xmin=manifest['xmin']
+        )
+        catalog.path = path
+        return catalog
+
+    def __len__(self) -> int:
+        return len(self.tconst)
+
+    def memory_usage(self) -> dict[str, int]:
+        """
+        Returns
+        -------
+        dict[str, int]: bytes held by every column, bucket index and matrix (including its norms and
+        postings), and their total
+        """
+        usage = {}
+        for name in ('tconst', 'year', 'rating', 'votes', 'has_genres_and_nconsts', 'by_votes', 'genres', 'row_hashes'):
+            usage[name] = getattr(self, name).nbytes
+        for name in ('year_buckets', 'rating_buckets'):
+            buckets: ValueBuckets = getattr(self, name)
+            usage[name] = buckets.values.nbytes + buckets.codes.nbytes
+        usage['nconsts'] = self.nconsts.norms.nbytes + self.nconsts.vocabulary.nbytes + sum(
+            matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes
+            for matrix in (self.nconsts.matrix, self.nconsts.postings)
+        )
+        usage['total'] = sum(usage.values())
+        return usage
+
+    def get_row_by_tconst(self, tconst: int) -> dict[str, Any]:
+        """
+        Args
+        ----
+        tconst: int - tconst to get row from catalog (see parse_tconst)
+
+        Returns
+        -------
+        dict: row from catalog
+        {
+            'row': int,
+            'tconst': int,
+            'year': int,
+            'rating': float,
+            'votes': int
+        }
+
+        Raises
+        ------
+        ValueError: if tconst is not found in catalog
+        """
+        row = int(np.searchsorted(self.tconst, tconst))
+        if row == len(self) or self.tconst[row] != tconst:
+            raise ValueError(f"tconst '{format_tconst(tconst)}' not found")
+        return {
+            'row': row,
+            'tconst': tconst,
+            'year': int(self.year[row]),
+            'rating': float(self.rating[row]),
+            'votes': int(self.votes[row])
+        }
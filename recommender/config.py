@@ -36,3 +36,110 @@ def get_grpc_port():
     except ValueError:
         raise ValueError('GRPC_PORT is not an integer')
     return port
+
+def _get_int(name: str, default: int) -> int:
+    value = os.getenv(name, None)
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f'{name} is not an integer')
+
+def _get_float(name: str, default: float) -> float:
+    value = os.getenv(name, None)
+    if value is None:
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        raise ValueError(f'{name} is not a number')
+
+def get_grpc_workers():
+    workers = _get_int('GRPC_WORKERS', 100)
+    if workers < 1:
+        raise ValueError('GRPC_WORKERS should be greater than or equal to 1')
+    return workers
+
+def get_max_concurrent_rpcs():
+    max_rpcs = _get_int('MAX_CONCURRENT_RPCS', 200)
+    if max_rpcs < 0:
+        raise ValueError('MAX_CONCURRENT_RPCS should be greater than or equal to 0')
+    return max_rpcs
+
+def get_cache_max_bytes():
+    max_bytes = _get_int('CACHE_MAX_BYTES', 64 * 1024 * 1024)
+    if max_bytes < 0:
+        raise ValueError('CACHE_MAX_BYTES should be greater than or equal to 0')
+    return max_bytes
+
+def get_cache_ttl():
+    ttl = _get_float('CACHE_TTL', 300.0)
+    if ttl < 0:
+        raise ValueError('CACHE_TTL should be greater than or equal to 0')
+    return ttl
+
+def get_postgres_pool_size():
+    min_size = _get_int('POSTGRES_POOL_MIN_SIZE', 1)
+    max_size = _get_int('POSTGRES_POOL_MAX_SIZE', 4)
+    if min_size < 0:
+        raise ValueError('POSTGRES_POOL_MIN_SIZE should be greater than or equal to 0')
+    if max_size < 1:
+        raise ValueError('POSTGRES_POOL_MAX_SIZE should be greater than or equal to 1')
+    if min_size > max_size:
+        raise ValueError('POSTGRES_POOL_MIN_SIZE should be less than or equal to POSTGRES_POOL_MAX_SIZE')
+    return min_size, max_size
+
+def get_postgres_pool_timeout():
+    timeout = _get_float('POSTGRES_POOL_TIMEOUT', 30.0)
+    if timeout < 0:
+        raise ValueError('POSTGRES_POOL_TIMEOUT should be greater than or equal to 0')
+    return timeout
+
+def get_workers():
+    workers = _get_int('WORKERS', 0)
+    if workers < 0:
+        raise ValueError('WORKERS should be greater than or equal to 0')
+    return workers
+
+def get_filter_masks():
+    masks = _get_int('FILTER_MASKS', 128)
+    if masks < 0:
+        raise ValueError('FILTER_MASKS should be greater than or equal to 0')
+    return masks
+
+def get_early_termination():
+    value = os.getenv('EARLY_TERMINATION', 'false').lower()
+    if value not in ('true', 'false'):
+        raise ValueError('EARLY_TERMINATION should be true or false')
+    return value == 'true'
+
+def get_scoring_shards():
+    shards = _get_int('SCORING_SHARDS', 1)
+    if shards < 1:
+        raise ValueError('SCORING_SHARDS should be greater than or equal to 1')
+    return shards
+
+def get_snapshot_path():
+    return os.getenv('SNAPSHOT_PATH', None)
+
+def get_neighbours_path():
+    return os.getenv('NEIGHBOURS_PATH', None)
+
+def get_metrics_port():
+    port = _get_int('METRICS_PORT', 0)
+    if port < 0:
+        raise ValueError('METRICS_PORT should be greater than or equal to 0')
+    return port
+
+def get_refresh_interval():
+    interval = _get_float('REFRESH_INTERVAL', 60.0)
+    if interval < 0:
+        raise ValueError('REFRESH_INTERVAL should be greater than or equal to 0')
+    return interval
+
+def get_refresh_delay():
+    delay = _get_float('REFRESH_DELAY', 5.0)
+    if delay < 0:
+        raise ValueError('REFRESH_DELAY should be greater than or equal to 0')
+    return delay
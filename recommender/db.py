@@ -0,0 +1,345 @@
+from contextlib import contextmanager
+from typing import Iterator
+import io
+import struct
+import threading
+import time
+
+import numpy as np
+import polars as pl
+import psycopg2
+from psycopg2.pool import ThreadedConnectionPool
+
+
+class PoolTimeoutError(Exception):
+    pass
+
+
+class ConnectionPool:
+    """
+    Bounded, thread-safe pool of psycopg2 connections.
+
+    Callers wait up to `timeout` seconds for a free connection instead of failing when
+    the pool is exhausted. Every checked out connection is health checked first and
+    replaced if the server closed it.
+    """
+
+    def __init__(self, dsn: str, min_size: int, max_size: int, timeout: float) -> None:
+        if min_size < 0:
+            raise ValueError("min_size should be greater than or equal to 0")
+        if max_size < 1:
+            raise ValueError("max_size should be greater than or equal to 1")
+        if min_size > max_size:
+            raise ValueError("min_size should be less than or equal to max_size")
+
+        self.max_size = max_size
+        self.timeout = timeout
+        self._pool = ThreadedConnectionPool(min_size, max_size, dsn=dsn)
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        self.in_use = 0
+        self.checkouts = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.timeouts = 0
+        self.replaced = 0
+
+    @contextmanager
+    def connection(self) -> Iterator['psycopg2.extensions.connection']:
+        """
+        Yields
+        ------
+        psycopg2 connection object, returned to the pool (and rolled back if needed) on exit
+
+        Raises
+        ------
+        PoolTimeoutError: if no connection becomes free within the pool timeout
+        """
+        start = time.perf_counter()
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.waits += 1
+            if not self._slots.acquire(timeout=self.timeout):
+                with self._lock:
+                    self.timeouts += 1
+                raise PoolTimeoutError(f"no connection available within {self.timeout}s")
+        waited = time.perf_counter() - start
+
+        with self._lock:
+            self.in_use += 1
+            self.checkouts += 1
+            self.wait_seconds += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+
+        try:
+            conn = self._checkout()
+            try:
+                yield conn
+            finally:
+                self._pool.putconn(conn, close=bool(conn.closed))
+        finally:
+            with self._lock:
+                self.in_use -= 1
+            self._slots.release()
+
+    def _checkout(self) -> 'psycopg2.extensions.connection':
+        conn = self._pool.getconn()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            conn.rollback()
+            return conn
+        except psycopg2.Error:
+            self._pool.putconn(conn, close=True)
+            with self._lock:
+                self.replaced += 1
+            return self._pool.getconn()
+
+    def stats(self) -> dict[str, float]:
+        """
+        Returns
+        -------
+        dict[str, float]: pool size, connections in use, saturation (in use / max size)
+        and checkout, wait and timeout counters
+        """
+        with self._lock:
+            return {
+                'max_size': self.max_size,
+                'in_use': self.in_use,
+                'saturation': self.in_use / self.max_size,
+                'checkouts': self.checkouts,
+                'waits': self.waits,
+                'wait_seconds': self.wait_seconds,
+                'max_wait_seconds': self.max_wait_seconds,
+                'timeouts': self.timeouts,
+                'replaced': self.replaced
+            }
+
+    def close(self) -> None:
+        self._pool.closeall()
+
+
+# Wire format of the values of a binary COPY by the dtype they are read as, None for text.
+# Postgres has no unsigned integers, UInt32 columns are read from INTEGER.
+COPY_FORMATS = {
+    pl.Boolean: '?',
+    pl.Int16: '>i2',
+    pl.Int32: '>i4',
+    pl.UInt32: '>i4',
+    pl.Int64: '>i8',
+    pl.Float32: '>f4',
+    pl.Float64: '>f8',
+    pl.String: None
+}
+
+
+def get_string_series(name: str, values: np.ndarray, offsets: np.ndarray, validity: np.ndarray = None) -> pl.Series:
+    """
+    Builds a String column straight from its Arrow buffers with the constructor of the polars
+    dataframe interchange protocol. It is not public API, so if this polars version lacks it or
+    rejects the buffers, the values are decoded one by one instead.
+
+    Args
+    ----
+    name: str - name of the column
+    values: np.ndarray (uint8) - UTF-8 bytes of all values, one after another
+    offsets: np.ndarray (int64) - start of every value in `values`, then the end of the last one
+    validity: np.ndarray (bool) - False for NULL values, None if there are none
+
+    Returns
+    -------
+    pl.Series: the values
+    """
+    from_buffers = getattr(pl.Series, '_from_buffers', None)
+    if from_buffers is not None:
+        try:
+            return from_buffers(
+                pl.String, [pl.Series(values), pl.Series(offsets)], None if validity is None else pl.Series(validity)
+            ).alias(name)
+        except (TypeError, ValueError, pl.exceptions.PolarsError):
+            pass
+
+    data = values.tobytes()
+    strings = [data[start:end].decode() for start, end in zip(offsets[:-1].tolist(), offsets[1:].tolist())]
+    if validity is not None:
+        strings = [string if valid else None for string, valid in zip(strings, validity.tolist())]
+    return pl.Series(name, strings, dtype=pl.String)
+
+
+class BinaryCopyDecoder(io.RawIOBase):
+    """
+    Decodes the output of `COPY ... TO STDOUT (FORMAT binary)` into polars columns.
+
+    Written to in batches through an io.BufferedWriter (see read_copy), as cursor.copy_expert
+    writes every row on its own. The complete rows of every batch are decoded at once, the
+    values with NumPy gathers straight into column buffers, so no Python object is created
+    per value and only one batch of raw rows is held at a time.
+
+    Fixed-width columns must not be NULL, text columns may.
+    """
+
+    signature = b'PGCOPY\n\xff\r\n\x00'
+
+    def __init__(self, schema: dict[str, pl.DataType]) -> None:
+        for name, dtype in schema.items():
+            if dtype not in COPY_FORMATS:
+                raise ValueError(f"column {name} has unsupported dtype {dtype}")
+
+        self.schema = schema
+        self.formats = [COPY_FORMATS[dtype] for dtype in schema.values()]
+        self.widths = [None if format_ is None else np.dtype(format_).itemsize for format_ in self.formats]
+        self.batches: list[pl.DataFrame] = []
+        self._buffer = bytearray()
+        self._started = False
+        self._finished = False
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: bytes) -> int:
+        self._buffer += data
+        self._decode()
+        return len(data)
+
+    def result(self) -> pl.DataFrame:
+        """
+        Returns
+        -------
+        DataFrame: every row decoded
+
+        Raises
+        ------
+        ValueError: if the data ended before the trailer of the COPY
+        """
+        if not self._finished:
+            raise ValueError("binary COPY data ended unexpectedly")
+        if len(self.batches) == 0:
+            return pl.DataFrame(schema=self.schema)
+        return pl.concat(self.batches)
+
+    def _decode(self) -> None:
+        buffer = self._buffer
+        pos = 0
+        if not self._started:
+            if len(buffer) < 19:
+                return
+            if buffer[:11] != self.signature:
+                raise ValueError("not a binary COPY")
+            extension, = struct.unpack_from('>i', buffer, 15)
+            pos = 19 + extension
+            self._started = True
+
+        starts, pos = self._split_rows(pos)
+        if len(buffer) - pos >= 2:
+            fields, = struct.unpack_from('>h', buffer, pos)
+            if fields == -1:
+                self._finished = True
+                pos += 2
+            elif fields != len(self.widths):
+                raise ValueError(f"expected {len(self.widths)} columns, got {fields}")
+        if len(starts) > 0:
+            self.batches.append(self._decode_rows(starts))
+        del buffer[:pos]
+
+    def _split_rows(self, pos: int) -> tuple[np.ndarray, int]:
+        # Rows are found without walking them one by one: every position holding the field count
+        # is taken for the start of a row and its end computed from the lengths of its fields, then
+        # the rows are the candidates chained from pos, found by pointer doubling.
+        data = np.frombuffer(self._buffer, dtype=np.uint8)[pos:]
+        high, low = struct.pack('>h', len(self.widths))
+        starts = np.flatnonzero((data[:-1] == high) & (data[1:] == low))
+        if len(starts) == 0 or starts[0] != 0:
+            return np.empty(0, dtype=np.int64), pos
+
+        ends, complete = starts + 2, np.ones(len(starts), dtype=np.bool_)
+        for _ in self.widths:
+            complete &= ends + 4 <= len(data)
+            headers = np.minimum(ends, len(data) - 4)
+            lengths = data[headers[:, None] + np.arange(4)].view('>i4').ravel()
+            ends = ends + 4 + np.maximum(lengths, 0)
+        complete &= ends <= len(data)
+
+        # Index of the candidate starting where every candidate ends, len(starts) if none does.
+        following = np.searchsorted(starts, ends)
+        following[~complete] = len(starts)
+        chained = following < len(starts)
+        chained[chained] = starts[following[chained]] == ends[chained]
+        following[~chained] = len(starts)
+        following = np.append(following, len(starts))
+
+        reached = np.zeros(len(starts) + 1, dtype=np.bool_)
+        reached[0] = True
+        # Every round adds the candidates 2^k rows after those reached and doubles the jumps.
+        rows = np.zeros(1, dtype=np.int64)
+        while True:
+            jumped = following[rows]
+            jumped = jumped[~reached[jumped]]
+            if len(jumped) == 0:
+                break
+            reached[jumped] = True
+            rows = np.concatenate((rows, jumped))
+            following = following[following]
+
+        rows = np.flatnonzero(reached[:-1] & complete)
+        if len(rows) == 0:
+            return np.empty(0, dtype=np.int64), pos
+        return pos + starts[rows], pos + int(ends[rows[-1]])
+
+    def _decode_rows(self, starts: np.ndarray) -> pl.DataFrame:
+        data = np.frombuffer(self._buffer, dtype=np.uint8)
+
+        def read(offsets: np.ndarray, format_: str) -> np.ndarray:
+            dtype = np.dtype(format_)
+            values = data[offsets[:, None] + np.arange(dtype.itemsize)].view(dtype).ravel()
+            return values.astype(dtype.newbyteorder('='))
+
+        columns, offsets = {}, starts + 2
+        for (name, dtype), format_, width in zip(self.schema.items(), self.formats, self.widths):
+            lengths = read(offsets, '>i4')
+            offsets = offsets + 4
+            if width is not None:
+                if (lengths != width).any():
+                    raise ValueError(f"column {name} has NULL values")
+                columns[name] = pl.Series(name, read(offsets, format_)).cast(dtype)
+                offsets = offsets + width
+            else:
+                sizes = np.maximum(lengths, 0)
+                # The batch alternates between bytes outside and inside values, by run lengths.
+                ends = offsets + sizes
+                runs = np.empty(2 * len(starts) + 1, dtype=np.int64)
+                runs[0], runs[-1] = offsets[0], len(data) - ends[-1]
+                runs[2:-1:2] = offsets[1:] - ends[:-1]
+                runs[1::2] = sizes
+                values = data[np.repeat(np.arange(len(runs)) % 2 == 1, runs)]
+                columns[name] = get_string_series(
+                    name, values, np.concatenate(([0], np.cumsum(sizes))), lengths >= 0 if (lengths < 0).any() else None
+                )
+                offsets = offsets + sizes
+        return pl.DataFrame(columns)
+
+
+def read_copy(conn, query: str, schema: dict[str, pl.DataType], vars=None, batch_bytes: int = 2**24) -> pl.DataFrame:
+    """
+    Reads the result of a query with a binary COPY, see BinaryCopyDecoder.
+
+    Args
+    ----
+    conn: psycopg2 connection object
+    query: str - SELECT query, its columns in the order and of the Postgres types matching schema
+    schema: dict[str, pl.DataType] - names and dtypes of the columns, see COPY_FORMATS
+    vars: parameters of the query, as for cursor.execute
+    batch_bytes: int - bytes of raw rows decoded at once
+
+    Returns
+    -------
+    DataFrame: rows of the query
+    """
+    decoder = BinaryCopyDecoder(schema)
+    file = io.BufferedWriter(decoder, buffer_size=batch_bytes)
+    with conn.cursor() as cursor:
+        if vars is not None:
+            query = cursor.mogrify(query, vars).decode()
+        cursor.copy_expert(f'COPY ({query}) TO STDOUT (FORMAT binary)', file)
+    file.flush()
+    return decoder.result()
@@ -2,12 +2,23 @@ from sys import path
 path.append('./proto')
 
 from concurrent import futures
-from time import sleep
+from time import sleep, perf_counter, monotonic
 import threading
-from recommend import Recommender, Weight, Filter
-from config import get_postgres_dsn, get_grpc_port
-
-import psycopg2
+from recommend import Weight, Filter, DeadlineExceededError, RequestCancelledError
+from catalog import Catalog, parse_tconst, format_tconst
+from cache import ResultCache, SingleFlight
+from backend import LocalBackend, WorkerPoolError, new_backend
+from db import ConnectionPool
+from snapshot import export_snapshot, load_snapshot, prune_snapshots
+from refresh import CatalogRefresher
+from neighbours import load_neighbours
+from metrics import Metrics, format_timings, serve_metrics
+from config import (
+    get_postgres_dsn, get_grpc_port, get_cache_max_bytes, get_cache_ttl,
+    get_postgres_pool_size, get_postgres_pool_timeout, get_workers, get_snapshot_path,
+    get_filter_masks, get_early_termination, get_metrics_port, get_refresh_interval, get_refresh_delay,
+    get_neighbours_path, get_scoring_shards, get_grpc_workers, get_max_concurrent_rpcs
+)
 
 from proto import recommender_pb2, recommender_pb2_grpc
 import grpc
@@ -18,25 +29,119 @@ from grpc_health.v1 import health_pb2_grpc
 
 postgres_dsn = get_postgres_dsn()
 
+# Request metadata key asking for the stage timings of the request in the trailing metadata.
+TIMINGS_KEY = 'x-timings'
+
+_STATUS_CODES = {code.value[0]: code for code in grpc.StatusCode}
+
+# Seconds a replaced backend keeps serving the requests that started before the switch.
+BACKEND_GRACE_PERIOD = 60.0
+
+def _get_filter(request_filter: recommender_pb2.Filter) -> Filter:
+    return Filter(
+        min_votes=request_filter.min_votes if request_filter.HasField('min_votes_oneof') else None,
+        max_votes=request_filter.max_votes if request_filter.HasField('max_votes_oneof') else None,
+        min_year=request_filter.min_year if request_filter.HasField('min_year_oneof') else None,
+        max_year=request_filter.max_year if request_filter.HasField('max_year_oneof') else None,
+        min_rating=request_filter.min_rating if request_filter.HasField('min_rating_oneof') else None,
+        max_rating=request_filter.max_rating if request_filter.HasField('max_rating_oneof') else None
+    )
+
+_FUSIONS = {recommender_pb2.FUSION_RANK: 'rank', recommender_pb2.FUSION_SCORE: 'score'}
+
+def _get_weight(request_weight: recommender_pb2.Weight) -> Weight:
+    if request_weight.fusion not in _FUSIONS:
+        raise ValueError(f'Unknown fusion {request_weight.fusion}')
+    return Weight(
+        year=request_weight.year,
+        rating=request_weight.rating,
+        genres=request_weight.genres,
+        nconsts=request_weight.nconsts,
+        fusion=_FUSIONS[request_weight.fusion]
+    )
+
+def _get_tconsts(request_tconsts) -> list[int]:
+    return [parse_tconst(tconst) for tconst in request_tconsts]
+
+def _get_cache_key(tconsts: list[int], filter_: Filter, weight: Weight, n: int) -> tuple:
+    # Results do not depend on the order of the tconsts, but a repeated tconst counts twice.
+    return (tuple(sorted(tconsts)), filter_, weight, n)
+
+def _get_response(data: dict[int, list[str | int]]) -> recommender_pb2.Response:
+    movies = []
+    for k, v in data.items():
+        movies.append(
+            recommender_pb2.RecommendedMovie(
+                tconst=format_tconst(k),
+                weights=[format_tconst(w) if isinstance(w, int) else w for w in v]
+            )
+        )
+
+    return recommender_pb2.Response(movies=movies)
+
+def _wants_timings(context) -> bool:
+    return any(key == TIMINGS_KEY for key, _ in context.invocation_metadata())
+
+def _get_deadline(context) -> float | None:
+    # The deadline of the client as a time.monotonic() value, None if it set none. Without a deadline grpc
+    # reports the time remaining until the largest timestamp it has, too large to wait for.
+    remaining = context.time_remaining()
+    if remaining is None or remaining > threading.TIMEOUT_MAX:
+        return None
+    return monotonic() + remaining
+
+def _get_error_code(e: Exception) -> grpc.StatusCode:
+    # Status code of an unexpected error, or of a request given up (see Recommender.timed and SingleFlight).
+    if isinstance(e, RequestCancelledError):
+        return grpc.StatusCode.CANCELLED
+    if isinstance(e, (DeadlineExceededError, TimeoutError)):
+        return grpc.StatusCode.DEADLINE_EXCEEDED
+    if isinstance(e, WorkerPoolError):
+        return grpc.StatusCode.UNAVAILABLE
+    return grpc.StatusCode.INTERNAL
+
 class RecommenderServicer(recommender_pb2_grpc.RecommenderServicer):
+    def __init__(self, backend: LocalBackend, cache: ResultCache, metrics: Metrics = None) -> None:
+        self.backend = backend
+        self.cache = cache
+        self.metrics = metrics if metrics is not None else Metrics()
+        # Identical requests arriving while one is computed share its result.
+        self.flights = SingleFlight()
+
+    def set_backend(self, backend: LocalBackend) -> LocalBackend:
+        """
+        Switches to another backend, requests already running keep using the old one.
+
+        Args
+        ----
+        backend: LocalBackend - backend to use from now on
+
+        Returns
+        -------
+        LocalBackend: the replaced backend
+        """
+        old, self.backend = self.backend, backend
+        return old
+
     def GetRecommendations(self, request: recommender_pb2.Request, context):
+        timings: dict[str, float] = {}
+        with self.metrics.track('GetRecommendations'):
+            response = self._get_recommendations(request, context, timings)
+
+        self.metrics.observe_stages(timings)
+        code = context.code()
+        if code is not None and code != grpc.StatusCode.OK:
+            self.metrics.count_error('GetRecommendations', code.name)
+        if _wants_timings(context):
+            context.set_trailing_metadata(((TIMINGS_KEY, format_timings(timings)),))
+        return response
+
+    def _get_recommendations(self, request: recommender_pb2.Request, context, timings: dict[str, float]):
+        start = perf_counter()
+        deadline = _get_deadline(context)
         try:
-            recommender = Recommender(
-                filter_=Filter(
-                    min_votes=request.filter.min_votes if request.filter.HasField('min_votes_oneof') else None,
-                    max_votes=request.filter.max_votes if request.filter.HasField('max_votes_oneof') else None,
-                    min_year=request.filter.min_year if request.filter.HasField('min_year_oneof') else None,
-                    max_year=request.filter.max_year if request.filter.HasField('max_year_oneof') else None,
-                    min_rating=request.filter.min_rating if request.filter.HasField('min_rating_oneof') else None,
-                    max_rating=request.filter.max_rating if request.filter.HasField('max_rating_oneof') else None
-                ),
-                weight=Weight(
-                    year=request.weight.year,
-                    rating=request.weight.rating,
-                    genres=request.weight.genres,
-                    nconsts=request.weight.nconsts
-                )
-            )
+            filter_ = _get_filter(request.filter)
+            weight = _get_weight(request.weight)
         except ValueError as e:
             context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
             context.set_details(str(e))
@@ -46,28 +151,118 @@ class RecommenderServicer(recommender_pb2_grpc.RecommenderServicer):
             context.set_details(str(e))
             return recommender_pb2.Response()
 
-        with psycopg2.connect(dsn=postgres_dsn) as conn:
+        try:
+            tconsts = _get_tconsts(request.tconsts)
+        except ValueError as e:
+            context.set_code(grpc.StatusCode.NOT_FOUND)
+            context.set_details(str(e))
+            return recommender_pb2.Response()
+        timings['parse'] = perf_counter() - start
+
+        start = perf_counter()
+        backend = self.backend
+        version = backend.catalog.version
+        cache_key = _get_cache_key(tconsts, filter_, weight, request.n)
+        data = self.cache.get(cache_key, version)
+        timings['cache'] = perf_counter() - start
+        if data is None:
+            def compute() -> dict[int, list[str | int]]:
+                data = backend.get_recommendations(
+                    tconsts, filter_, weight, request.n, timings, deadline, context.is_active
+                )
+                self.cache.put(cache_key, version, data)
+                return data
+
+            # For a coalesced request the backend stage is the wait for the shared result. A request
+            # given up by its own caller is computed again by the requests that waited for it.
+            start = perf_counter()
             try:
-                data = recommender.get_recommendations(conn, request.tconsts, request.n)
+                data = self.flights.do(
+                    (version, cache_key), compute, deadline, retry=(DeadlineExceededError, RequestCancelledError)
+                )
             except ValueError as e:
                 context.set_code(grpc.StatusCode.NOT_FOUND)
                 context.set_details(str(e))
                 return recommender_pb2.Response()
             except Exception as e:
-                context.set_code(grpc.StatusCode.INTERNAL)
+                context.set_code(_get_error_code(e))
                 context.set_details(str(e))
                 return recommender_pb2.Response()
+            finally:
+                timings['backend'] = perf_counter() - start
+
+        start = perf_counter()
+        response = _get_response(data)
+        timings['response'] = perf_counter() - start
+        return response
+
+    def GetRecommendationsBatch(self, request: recommender_pb2.BatchRequest, context):
+        timings: dict[str, float] = {}
+        try:
+            with self.metrics.track('GetRecommendationsBatch'):
+                for response in self._get_recommendations_batch(request, context, timings):
+                    if response.code != grpc.StatusCode.OK.value[0]:
+                        self.metrics.count_error('GetRecommendationsBatch', _STATUS_CODES[response.code].name)
+                    yield response
+        finally:
+            # Also when the stream is closed early, e.g. by a cancelled call or an error.
+            self.metrics.observe_stages(timings)
+            if _wants_timings(context):
+                context.set_trailing_metadata(((TIMINGS_KEY, format_timings(timings)),))
+
+    def _get_recommendations_batch(self, request: recommender_pb2.BatchRequest, context, timings: dict[str, float]):
+        deadline = _get_deadline(context)
+        backend = self.backend
+        version = backend.catalog.version
 
-            movies = []
-            for k, v in data.items():
-                movies.append(
-                    recommender_pb2.RecommendedMovie(
-                        tconst=k,
-                        weights=v
-                    )
+        # Requests sharing a filter and weight are computed together.
+        groups: dict[tuple[Filter, Weight], list[tuple[int, list[int], int]]] = {}
+        for i, item in enumerate(request.requests):
+            try:
+                filter_ = _get_filter(item.filter)
+                weight = _get_weight(item.weight)
+            except ValueError as e:
+                yield recommender_pb2.BatchResponse(
+                    index=i, code=grpc.StatusCode.INVALID_ARGUMENT.value[0], details=str(e)
                 )
+                continue
 
-        return recommender_pb2.Response(movies=movies)
+            try:
+                tconsts = _get_tconsts(item.tconsts)
+            except ValueError as e:
+                yield recommender_pb2.BatchResponse(
+                    index=i, code=grpc.StatusCode.NOT_FOUND.value[0], details=str(e)
+                )
+                continue
+
+            data = self.cache.get(_get_cache_key(tconsts, filter_, weight, item.n), version)
+            if data is not None:
+                yield recommender_pb2.BatchResponse(index=i, response=_get_response(data))
+                continue
+            groups.setdefault((filter_, weight), []).append((i, tconsts, item.n))
+
+        for (filter_, weight), items in groups.items():
+            done: set[int] = set()
+            try:
+                for j, result in backend.get_recommendations_batch(
+                    filter_, weight, [(tconsts, n) for _, tconsts, n in items], timings, deadline, context.is_active
+                ):
+                    i, tconsts, n = items[j]
+                    done.add(j)
+                    if isinstance(result, ValueError):
+                        yield recommender_pb2.BatchResponse(
+                            index=i, code=grpc.StatusCode.NOT_FOUND.value[0], details=str(result)
+                        )
+                        continue
+
+                    self.cache.put(_get_cache_key(tconsts, filter_, weight, n), version, result)
+                    yield recommender_pb2.BatchResponse(index=i, response=_get_response(result))
+            except Exception as e:
+                for j, (i, _, _) in enumerate(items):
+                    if j not in done:
+                        yield recommender_pb2.BatchResponse(
+                            index=i, code=_get_error_code(e).value[0], details=str(e)
+                        )
 
 def _toggle_health(health_servicer: health.HealthServicer, service: str):
     next_status = health_pb2.HealthCheckResponse.SERVING
@@ -95,8 +290,49 @@ def _configure_health_server(server: grpc.Server):
     toggle_health_status_thread.start()
 
 def serve():
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=100))
-    recommender_pb2_grpc.add_RecommenderServicer_to_server(RecommenderServicer(), server)
+    min_size, max_size = get_postgres_pool_size()
+    pool = ConnectionPool(postgres_dsn, min_size, max_size, timeout=get_postgres_pool_timeout())
+    snapshot_path = get_snapshot_path()
+    catalog = load_snapshot(snapshot_path) if snapshot_path is not None else None
+    if catalog is None:
+        with pool.connection() as conn:
+            catalog = Catalog.from_sql(conn)
+        if snapshot_path is not None:
+            # Reopen the exported snapshot so worker processes share its pages instead of private copies.
+            catalog = Catalog.load(export_snapshot(catalog, snapshot_path))
+    print(f"Catalog loaded: {len(catalog)} titles (version {catalog.version}, {catalog.memory_usage()['total']} bytes)")
+    neighbours_path = get_neighbours_path()
+    neighbours = load_neighbours(neighbours_path, catalog) if neighbours_path is not None else None
+    if neighbours is not None:
+        print(f"Neighbours loaded: {len(neighbours.seeds)} seeds (k={neighbours.k})")
+    elif neighbours_path is not None:
+        print(f"No neighbours of catalog version {catalog.version}, default requests are ranked")
+
+    # Worker processes have to be forked before the gRPC server starts its threads.
+    backend = new_backend(
+        catalog, workers=get_workers(), filter_masks=get_filter_masks(), early_termination=get_early_termination(),
+        neighbours=neighbours, shards=get_scoring_shards()
+    )
+
+    # Calls beyond max_concurrent_rpcs, running or queued for a thread, fail fast with RESOURCE_EXHAUSTED.
+    max_concurrent_rpcs = get_max_concurrent_rpcs()
+    server = grpc.server(
+        futures.ThreadPoolExecutor(max_workers=get_grpc_workers()),
+        maximum_concurrent_rpcs=max_concurrent_rpcs if max_concurrent_rpcs > 0 else None
+    )
+    cache = ResultCache(max_bytes=get_cache_max_bytes(), ttl=get_cache_ttl())
+    metrics = Metrics()
+    servicer = RecommenderServicer(backend, cache, metrics)
+    metrics.add_collector('cache', cache.stats, counters=('hits', 'misses', 'evictions', 'invalidations'))
+    metrics.add_collector('coalescing', servicer.flights.stats, counters=('calls', 'coalesced'))
+    metrics.add_collector(
+        'pool', pool.stats, counters=('checkouts', 'waits', 'wait_seconds', 'timeouts', 'replaced')
+    )
+    metrics.add_collector('filter_index', lambda: servicer.backend.stats(), counters=('hits', 'misses'))
+    metrics_port = get_metrics_port()
+    if metrics_port > 0:
+        serve_metrics(metrics, metrics_port)
+    recommender_pb2_grpc.add_RecommenderServicer_to_server(servicer, server)
     SERVICE_NAMES = (
         recommender_pb2.DESCRIPTOR.services_by_name["Recommender"].full_name,
         reflection.SERVICE_NAME,
@@ -105,6 +341,34 @@ def serve():
     server.add_insecure_port(f'[::]:{get_grpc_port()}')
     _configure_health_server(server)
     server.start()
+
+    refresh_interval = get_refresh_interval()
+    if catalog.xmin is None:
+        print("Catalog refresh disabled: changes of imdb are not tracked (imdb_changes migration missing)")
+    elif refresh_interval > 0:
+        def on_refresh(new_catalog: Catalog) -> Catalog:
+            if snapshot_path is not None:
+                new_catalog = Catalog.load(export_snapshot(new_catalog, snapshot_path))
+            # A neighbour table is only valid for the catalog version it was built from.
+            new_neighbours = load_neighbours(neighbours_path, new_catalog) if neighbours_path is not None else None
+            # The server runs its threads now, so worker processes are spawned instead of forked.
+            old_backend = servicer.set_backend(new_backend(
+                new_catalog, workers=get_workers(), filter_masks=get_filter_masks(),
+                early_termination=get_early_termination(), fork=False, neighbours=new_neighbours,
+                shards=get_scoring_shards()
+            ))
+            threading.Timer(BACKEND_GRACE_PERIOD, old_backend.close).start()
+            if snapshot_path is not None:
+                prune_snapshots(snapshot_path)
+            print(f"Catalog refreshed: {len(new_catalog)} titles (version {new_catalog.version})")
+            return new_catalog
+
+        refresher = CatalogRefresher(
+            postgres_dsn, pool, catalog, on_refresh, delay=get_refresh_delay(), interval=refresh_interval
+        )
+        metrics.add_collector('refresh', refresher.stats, counters=('refreshes', 'full_reloads', 'failures'))
+        refresher.start()
+
     server.wait_for_termination()
 
 if __name__ == '__main__':
@@ -0,0 +1,220 @@
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Iterator
+import threading
+import time
+
+
+class Histogram:
+    """
+    Cumulative histogram in the Prometheus format, not thread-safe.
+    """
+
+    def __init__(self, buckets: tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name: str, labels: str) -> list[str]:
+        """
+        Args
+        ----
+        name: str - metric name
+        labels: str - rendered labels without braces, e.g. 'stage="filter"'
+
+        Returns
+        -------
+        list[str]: bucket, sum and count samples
+        """
+        lines, total = [], 0
+        for bound, count in zip((*self.buckets, '+Inf'), self.counts):
+            total += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {total}')
+        lines.append(f'{name}_sum{{{labels}}} {self.sum}')
+        lines.append(f'{name}_count{{{labels}}} {self.count}')
+        return lines
+
+
+class Metrics:
+    """
+    Thread-safe registry of request metrics, rendered in the Prometheus text format.
+
+    Holds the latency of every RPC method and of every stage of a request (see
+    Recommender.timings), the number of requests in flight and of failed requests, and
+    the stats of the components registered with add_collector.
+    """
+
+    # Upper bounds of the latency buckets in seconds.
+    buckets = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._rpc_seconds: dict[str, Histogram] = {}
+        self._stage_seconds: dict[str, Histogram] = {}
+        self._requests: dict[str, int] = {}
+        self._in_flight: dict[str, int] = {}
+        self._errors: dict[tuple[str, str], int] = {}
+        self._collectors: list[tuple[str, Callable[[], dict[str, int | float]], tuple[str, ...]]] = []
+
+    @contextmanager
+    def track(self, method: str) -> Iterator[None]:
+        """
+        Counts the calls of method in flight and times them.
+
+        Args
+        ----
+        method: str - RPC method name
+        """
+        with self._lock:
+            self._requests[method] = self._requests.get(method, 0) + 1
+            self._in_flight[method] = self._in_flight.get(method, 0) + 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._in_flight[method] -= 1
+                self._get_histogram(self._rpc_seconds, method).observe(elapsed)
+
+    def observe_stages(self, timings: dict[str, float]) -> None:
+        """
+        Args
+        ----
+        timings: dict[str, float] - seconds spent in every stage of one request
+        """
+        with self._lock:
+            for stage, seconds in timings.items():
+                self._get_histogram(self._stage_seconds, stage).observe(seconds)
+
+    def count_error(self, method: str, code: str) -> None:
+        """
+        Args
+        ----
+        method: str - RPC method name
+        code: str - name of the status code the request failed with
+        """
+        with self._lock:
+            self._errors[(method, code)] = self._errors.get((method, code), 0) + 1
+
+    def add_collector(
+        self,
+        name: str,
+        stats: Callable[[], dict[str, int | float]],
+        counters: tuple[str, ...] = ()
+    ) -> None:
+        """
+        Args
+        ----
+        name: str - component name, every stat is exported as the gauge `recommender_<name>_<stat>`
+        stats: Callable[[], dict[str, int | float]] - returns the current stats of the component
+        counters: tuple[str, ...] - stats that only grow, exported as the counter `recommender_<name>_<stat>_total`
+        """
+        self._collectors.append((name, stats, counters))
+
+    def render(self) -> str:
+        """
+        Returns
+        -------
+        str: all metrics in the Prometheus text exposition format
+        """
+        lines = []
+        with self._lock:
+            lines += [
+                '# HELP recommender_rpc_seconds Latency of RPC calls.',
+                '# TYPE recommender_rpc_seconds histogram'
+            ]
+            for method, histogram in self._rpc_seconds.items():
+                lines += histogram.render('recommender_rpc_seconds', f'method="{method}"')
+            lines += [
+                '# HELP recommender_stage_seconds Time spent in every stage of a request.',
+                '# TYPE recommender_stage_seconds histogram'
+            ]
+            for stage, histogram in self._stage_seconds.items():
+                lines += histogram.render('recommender_stage_seconds', f'stage="{stage}"')
+            lines += [
+                '# HELP recommender_rpc_requests_total RPC calls received.',
+                '# TYPE recommender_rpc_requests_total counter'
+            ]
+            lines += [f'recommender_rpc_requests_total{{method="{m}"}} {v}' for m, v in self._requests.items()]
+            lines += [
+                '# HELP recommender_rpc_in_flight RPC calls being handled.',
+                '# TYPE recommender_rpc_in_flight gauge'
+            ]
+            lines += [f'recommender_rpc_in_flight{{method="{m}"}} {v}' for m, v in self._in_flight.items()]
+            lines += [
+                '# HELP recommender_rpc_errors_total Requests that failed, by status code.',
+                '# TYPE recommender_rpc_errors_total counter'
+            ]
+            lines += [
+                f'recommender_rpc_errors_total{{method="{m}",code="{c}"}} {v}' for (m, c), v in self._errors.items()
+            ]
+
+        for name, stats, counters in self._collectors:
+            for stat, value in stats().items():
+                if stat in counters:
+                    lines.append(f'# TYPE recommender_{name}_{stat}_total counter')
+                    lines.append(f'recommender_{name}_{stat}_total {value}')
+                else:
+                    lines.append(f'# TYPE recommender_{name}_{stat} gauge')
+                    lines.append(f'recommender_{name}_{stat} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def _get_histogram(self, histograms: dict[str, Histogram], key: str) -> Histogram:
+        histogram = histograms.get(key)
+        if histogram is None:
+            histogram = histograms[key] = Histogram(self.buckets)
+        return histogram
+
+
+def format_timings(timings: dict[str, float]) -> str:
+    """
+    Args
+    ----
+    timings: dict[str, float] - seconds spent in every stage of a request
+
+    Returns
+    -------
+    str: stages and their milliseconds, e.g. 'parse=0.012,backend=4.210'
+    """
+    return ','.join(f'{stage}={seconds * 1000:.3f}' for stage, seconds in timings.items())
+
+
+def serve_metrics(metrics: Metrics, port: int) -> ThreadingHTTPServer:
+    """
+    Serves metrics on `/metrics` on every interface from a daemon thread.
+
+    Args
+    ----
+    metrics: Metrics - metrics to serve
+    port: int - port to listen on
+
+    Returns
+    -------
+    ThreadingHTTPServer: the running server
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            if self.path != '/metrics':
+                self.send_error(404)
+                return
+            body = metrics.render().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args) -> None:
+            pass
+
+    server = ThreadingHTTPServer(('', port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
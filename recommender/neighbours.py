@@ -0,0 +1,247 @@
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+
+from catalog import Catalog
+from recommend import Recommender, exclude_ranks, get_top_n
+
+
+class NeighbourTable:
+    """
+    Top-k recommendations of every seed title for the default Weight and an empty Filter,
+    computed offline (see build) so Recommender can answer default requests without
+    ranking (see Recommender.get_neighbour_responses).
+
+    Row i of the arrays holds the k best rows for the seed catalog row `seeds[i]`, in the
+    order get_recommendations returns them, with the sum of their feature ranks and the
+    order of their features by rank. A table is only valid for the catalog version it was
+    built from.
+    """
+
+    # Features ranked with the default weight, in Recommender.features order.
+    features = ('year', 'rating', 'genres', 'nconsts')
+    # Version of the rankings written by save, bumped whenever they change (tables without one are 1).
+    format_version = 2
+
+    def __init__(
+        self,
+        seeds: np.ndarray,
+        neighbours: np.ndarray,
+        rank_sums: np.ndarray,
+        feature_orders: np.ndarray,
+        version: str
+    ) -> None:
+        # Catalog rows of the seeds (ascending).
+        self.seeds = seeds
+        # Catalog rows of the k best recommendations of every seed (len(seeds) x k).
+        self.neighbours = neighbours
+        # Sum of the feature ranks of every recommendation, see Recommender.set_average.
+        self.rank_sums = rank_sums
+        # Features of every recommendation ordered by rank, two bits per feature (first in the high bits).
+        self.feature_orders = feature_orders
+        self.version = version
+        # Directory the table was memory-mapped from (see load).
+        self.path: str = None
+
+    def __reduce_ex__(self, protocol: int) -> tuple:
+        # A memory-mapped table is sent to other processes as its path, like Catalog.
+        if self.path is not None:
+            return NeighbourTable.load, (self.path,)
+        return super().__reduce_ex__(protocol)
+
+    @property
+    def k(self) -> int:
+        return self.neighbours.shape[1]
+
+    @classmethod
+    def build(cls, catalog: Catalog, k: int = 100, seeds: np.ndarray = None, chunk_size: int = 16) -> 'NeighbourTable':
+        """
+        Ranks every row against every seed like get_recommendations with the default weight and filter.
+
+        Args
+        ----
+        catalog: Catalog - catalog to recommend from
+        k: int - number of recommendations kept per seed
+        seeds: np.ndarray - catalog rows of the seeds, every row if None
+        chunk_size: int - number of seeds ranked in one pass
+
+        Returns
+        -------
+        NeighbourTable: recommendations of every seed
+        """
+        seeds = np.unique(seeds) if seeds is not None else np.arange(len(catalog))
+        recommender = Recommender(catalog)
+        rows = recommender.get_filtered_rows([])
+        by_votes = recommender.get_by_votes(rows)
+        k = max(0, min(k, len(rows) - 1))
+
+        neighbours = np.empty((len(seeds), k), dtype=np.uint32)
+        rank_sums = np.empty((len(seeds), k), dtype=np.uint32)
+        feature_orders = np.empty((len(seeds), k), dtype=np.uint8)
+        for start in range(0, len(seeds), chunk_size):
+            chunk = seeds[start:start + chunk_size]
+            ranks = recommender.get_feature_ranks(
+                rows, [{'row': int(seed)} for seed in chunk], list(cls.features), by_votes
+            )
+            for j, seed in enumerate(chunk):
+                seed_ranks = {f: r[j:j + 1] for f, r in ranks.items()}
+                seed_rows = rows
+                excluded = np.flatnonzero(rows == seed)
+                if len(excluded) > 0:
+                    seed_rows = np.delete(rows, excluded)
+                    seed_ranks = {f: exclude_ranks(r, excluded) for f, r in seed_ranks.items()}
+
+                top = get_top_n(recommender.set_average(list(cls.features), seed_ranks)[0], catalog.votes[seed_rows], k)
+                top_ranks = np.stack([seed_ranks[f][0, top] for f in cls.features], axis=1)
+                orders = np.argsort(top_ranks, axis=1, kind='stable').astype(np.uint8)
+                neighbours[start + j] = seed_rows[top]
+                rank_sums[start + j] = top_ranks.sum(axis=1)
+                feature_orders[start + j] = (orders[:, 0] << 6) | (orders[:, 1] << 4) | (orders[:, 2] << 2) | orders[:, 3]
+
+        return cls(seeds.astype(np.uint32), neighbours, rank_sums, feature_orders, catalog.version)
+
+    def get_index(self, row: int) -> int | None:
+        """
+        Args
+        ----
+        row: int - catalog row of a seed
+
+        Returns
+        -------
+        int | None: row of the seed in the table, None if it was not built for it
+        """
+        i = int(np.searchsorted(self.seeds, row))
+        if i == len(self.seeds) or self.seeds[i] != row:
+            return None
+        return i
+
+    def get_features(self, order: int) -> list[str]:
+        """
+        Args
+        ----
+        order: int - see feature_orders
+
+        Returns
+        -------
+        list[str]: features ordered by rank
+        """
+        return [self.features[(order >> shift) & 3] for shift in (6, 4, 2, 0)]
+
+    def save(self, path: str) -> None:
+        """
+        Writes the table as `.npy` files and a `manifest.json` to a new directory.
+
+        Args
+        ----
+        path: str - directory to create
+        """
+        os.makedirs(path)
+        for name in ('seeds', 'neighbours', 'rank_sums', 'feature_orders'):
+            np.save(os.path.join(path, f'{name}.npy'), getattr(self, name))
+        with open(os.path.join(path, 'manifest.json'), 'w') as f:
+            json.dump({'format_version': self.format_version, 'version': self.version, 'k': self.k}, f)
+
+    @classmethod
+    def load(cls, path: str) -> 'NeighbourTable':
+        """
+        Args
+        ----
+        path: str - directory the table was saved to
+
+        Returns
+        -------
+        NeighbourTable: table backed by read-only memory maps
+
+        Raises
+        ------
+        ValueError: if the table was saved with another format version
+        """
+        with open(os.path.join(path, 'manifest.json')) as f:
+            manifest = json.load(f)
+        if manifest.get('format_version', 1) != cls.format_version:
+            raise ValueError(
+                f"neighbour table format version {manifest.get('format_version', 1)} is not supported, "
+                f"expected {cls.format_version}"
+            )
+        load = lambda name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r')
+        table = cls(load('seeds'), load('neighbours'), load('rank_sums'), load('feature_orders'), manifest['version'])
+        table.path = path
+        return table
+
+
+def export_neighbours(table: NeighbourTable, root: str) -> str:
+    """
+    Writes table to `root/<catalog version>`, replacing an older table of the same version.
+
+    Args
+    ----
+    table: NeighbourTable - table to export
+    root: str - directory holding the tables
+
+    Returns
+    -------
+    str: directory of the table
+    """
+    os.makedirs(root, exist_ok=True)
+    path = os.path.join(root, table.version)
+    tmp = tempfile.mkdtemp(prefix=f'.{table.version}-', dir=root)
+    try:
+        table.save(os.path.join(tmp, 'table'))
+        shutil.rmtree(path, ignore_errors=True)
+        os.rename(os.path.join(tmp, 'table'), path)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return path
+
+
+def load_neighbours(root: str, catalog: Catalog) -> NeighbourTable | None:
+    """
+    Args
+    ----
+    root: str - directory holding the tables (see export_neighbours)
+    catalog: Catalog - catalog the table has to be built from
+
+    Returns
+    -------
+    NeighbourTable | None: memory-mapped table of the catalog version, None if there is none or it
+    has to be built again for another format version
+    """
+    path = os.path.join(root, catalog.version)
+    if not os.path.isdir(path):
+        return None
+    try:
+        return NeighbourTable.load(path)
+    except ValueError:
+        return None
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+    import psycopg2
+    from config import get_postgres_dsn, get_snapshot_path, get_neighbours_path
+    from snapshot import load_snapshot
+
+    parser = argparse.ArgumentParser(description='Precompute the recommendations of default requests.')
+    parser.add_argument('root', nargs='?', default=get_neighbours_path(), help='defaults to NEIGHBOURS_PATH')
+    parser.add_argument('--k', type=int, default=100, help='number of recommendations per seed')
+    parser.add_argument('--seeds', type=int, help='only the seeds with the most votes, every title by default')
+    args = parser.parse_args()
+    if args.root is None:
+        raise ValueError('NEIGHBOURS_PATH is not set')
+
+    snapshot_path = get_snapshot_path()
+    catalog = load_snapshot(snapshot_path) if snapshot_path is not None else None
+    if catalog is None:
+        with psycopg2.connect(get_postgres_dsn()) as conn:
+            catalog = Catalog.from_sql(conn)
+
+    start = time.perf_counter()
+    seeds = np.asarray(catalog.by_votes[:args.seeds]) if args.seeds is not None else None
+    table = NeighbourTable.build(catalog, args.k, seeds)
+    print(
+        f"Neighbours exported: {export_neighbours(table, args.root)}"
+        f" ({len(table.seeds)} seeds, k={table.k}, {time.perf_counter() - start:.1f}s)"
+    )
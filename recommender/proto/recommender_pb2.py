@@ -24,7 +24,7 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x11recommender.proto\x12\x0brecommender\"\xf8\x01\n\x06\x46ilter\x12\x13\n\tmin_votes\x18\x01 \x01(\rH\x00\x12\x13\n\tmax_votes\x18\x02 \x01(\rH\x01\x12\x12\n\x08min_year\x18\x03 \x01(\rH\x02\x12\x12\n\x08max_year\x18\x04 \x01(\rH\x03\x12\x14\n\nmin_rating\x18\x05 \x01(\x02H\x04\x12\x14\n\nmax_rating\x18\x06 \x01(\x02H\x05\x42\x11\n\x0fmin_votes_oneofB\x11\n\x0fmax_votes_oneofB\x10\n\x0emin_year_oneofB\x10\n\x0emax_year_oneofB\x12\n\x10min_rating_oneofB\x12\n\x10max_rating_oneof\"G\n\x06Weight\x12\x0c\n\x04year\x18\x01 \x01(\r\x12\x0e\n\x06rating\x18\x02 \x01(\r\x12\x0e\n\x06genres\x18\x03 \x01(\r\x12\x0f\n\x07nconsts\x18\x04 \x01(\r\"o\n\x07Request\x12\x0f\n\x07tconsts\x18\x01 \x03(\t\x12\t\n\x01n\x18\x02 \x01(\r\x12#\n\x06\x66ilter\x18\x03 \x01(\x0b\x32\x13.recommender.Filter\x12#\n\x06weight\x18\x04 \x01(\x0b\x32\x13.recommender.Weight\"9\n\x08Response\x12-\n\x06movies\x18\x01 \x03(\x0b\x32\x1d.recommender.RecommendedMovie\"3\n\x10RecommendedMovie\x12\x0e\n\x06tconst\x18\x01 \x01(\t\x12\x0f\n\x07weights\x18\x02 \x03(\t2R\n\x0bRecommender\x12\x43\n\x12GetRecommendations\x12\x14.recommender.Request\x1a\x15.recommender.Response\"\x00\x42,Z*github.com/aykhans/movier/server/pkg/protob\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x11recommender.proto\x12\x0brecommender\"\xf8\x01\n\x06\x46ilter\x12\x13\n\tmin_votes\x18\x01 \x01(\rH\x00\x12\x13\n\tmax_votes\x18\x02 \x01(\rH\x01\x12\x12\n\x08min_year\x18\x03 \x01(\rH\x02\x12\x12\n\x08max_year\x18\x04 \x01(\rH\x03\x12\x14\n\nmin_rating\x18\x05 \x01(\x02H\x04\x12\x14\n\nmax_rating\x18\x06 \x01(\x02H\x05\x42\x11\n\x0fmin_votes_oneofB\x11\n\x0fmax_votes_oneofB\x10\n\x0emin_year_oneofB\x10\n\x0emax_year_oneofB\x12\n\x10min_rating_oneofB\x12\n\x10max_rating_oneof\"l\n\x06Weight\x12\x0c\n\x04year\x18\x01 \x01(\r\x12\x0e\n\x06rating\x18\x02 \x01(\r\x12\x0e\n\x06genres\x18\x03 \x01(\r\x12\x0f\n\x07nconsts\x18\x04 \x01(\r\x12#\n\x06\x66usion\x18\x05 \x01(\x0e\x32\x13.recommender.Fusion\"o\n\x07Request\x12\x0f\n\x07tconsts\x18\x01 \x03(\t\x12\t\n\x01n\x18\x02 \x01(\r\x12#\n\x06\x66ilter\x18\x03 \x01(\x0b\x32\x13.recommender.Filter\x12#\n\x06weight\x18\x04 \x01(\x0b\x32\x13.recommender.Weight\"9\n\x08Response\x12-\n\x06movies\x18\x01 \x03(\x0b\x32\x1d.recommender.RecommendedMovie\"3\n\x10RecommendedMovie\x12\x0e\n\x06tconst\x18\x01 \x01(\t\x12\x0f\n\x07weights\x18\x02 \x03(\t\"6\n\x0c\x42\x61tchRequest\x12&\n\x08requests\x18\x01 \x03(\x0b\x32\x14.recommender.Request\"f\n\rBatchResponse\x12\r\n\x05index\x18\x01 \x01(\r\x12\'\n\x08response\x18\x02 \x01(\x0b\x32\x15.recommender.Response\x12\x0c\n\x04\x63ode\x18\x03 \x01(\r\x12\x0f\n\x07\x64\x65tails\x18\x04 \x01(\t*+\n\x06\x46usion\x12\x0f\n\x0b\x46USION_RANK\x10\x00\x12\x10\n\x0c\x46USION_SCORE\x10\x01\x32\xa8\x01\n\x0bRecommender\x12\x43\n\x12GetRecommendations\x12\x14.recommender.Request\x1a\x15.recommender.Response\"\x00\x12T\n\x17GetRecommendationsBatch\x12\x19.recommender.BatchRequest\x1a\x1a.recommender.BatchResponse\"\x00\x30\x01\x42,Z*github.com/aykhans/movier/server/pkg/protob\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
@@ -32,16 +32,22 @@ _builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'recommender_pb2', _globals)
 if not _descriptor._USE_C_DESCRIPTORS:
   _globals['DESCRIPTOR']._loaded_options = None
   _globals['DESCRIPTOR']._serialized_options = b'Z*github.com/aykhans/movier/server/pkg/proto'
+  _globals['_FUSION']._serialized_start=780
+  _globals['_FUSION']._serialized_end=823
   _globals['_FILTER']._serialized_start=35
   _globals['_FILTER']._serialized_end=283
   _globals['_WEIGHT']._serialized_start=285
-  _globals['_WEIGHT']._serialized_end=356
-  _globals['_REQUEST']._serialized_start=358
-  _globals['_REQUEST']._serialized_end=469
-  _globals['_RESPONSE']._serialized_start=471
-  _globals['_RESPONSE']._serialized_end=528
-  _globals['_RECOMMENDEDMOVIE']._serialized_start=530
-  _globals['_RECOMMENDEDMOVIE']._serialized_end=581
-  _globals['_RECOMMENDER']._serialized_start=583
-  _globals['_RECOMMENDER']._serialized_end=665
+  _globals['_WEIGHT']._serialized_end=393
+  _globals['_REQUEST']._serialized_start=395
+  _globals['_REQUEST']._serialized_end=506
+  _globals['_RESPONSE']._serialized_start=508
+  _globals['_RESPONSE']._serialized_end=565
+  _globals['_RECOMMENDEDMOVIE']._serialized_start=567
+  _globals['_RECOMMENDEDMOVIE']._serialized_end=618
+  _globals['_BATCHREQUEST']._serialized_start=620
+  _globals['_BATCHREQUEST']._serialized_end=674
+  _globals['_BATCHRESPONSE']._serialized_start=676
+  _globals['_BATCHRESPONSE']._serialized_end=778
+  _globals['_RECOMMENDER']._serialized_start=826
+  _globals['_RECOMMENDER']._serialized_end=994
 # @@protoc_insertion_point(module_scope)
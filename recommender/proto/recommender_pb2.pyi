@@ -1,10 +1,18 @@
 from google.protobuf.internal import containers as _containers
+from google.protobuf.internal import enum_type_wrapper as _enum_type_wrapper
 from google.protobuf import descriptor as _descriptor
 from google.protobuf import message as _message
 from typing import ClassVar as _ClassVar, Iterable as _Iterable, Mapping as _Mapping, Optional as _Optional, Union as _Union
 
 DESCRIPTOR: _descriptor.FileDescriptor
 
+class Fusion(int, metaclass=_enum_type_wrapper.EnumTypeWrapper):
+    __slots__ = ()
+    FUSION_RANK: _ClassVar[Fusion]
+    FUSION_SCORE: _ClassVar[Fusion]
+FUSION_RANK: Fusion
+FUSION_SCORE: Fusion
+
 class Filter(_message.Message):
     __slots__ = ("min_votes", "max_votes", "min_year", "max_year", "min_rating", "max_rating")
     MIN_VOTES_FIELD_NUMBER: _ClassVar[int]
@@ -22,16 +30,18 @@ class Filter(_message.Message):
     def __init__(self, min_votes: _Optional[int] = ..., max_votes: _Optional[int] = ..., min_year: _Optional[int] = ..., max_year: _Optional[int] = ..., min_rating: _Optional[float] = ..., max_rating: _Optional[float] = ...) -> None: ...
 
 class Weight(_message.Message):
-    __slots__ = ("year", "rating", "genres", "nconsts")
+    __slots__ = ("year", "rating", "genres", "nconsts", "fusion")
     YEAR_FIELD_NUMBER: _ClassVar[int]
     RATING_FIELD_NUMBER: _ClassVar[int]
     GENRES_FIELD_NUMBER: _ClassVar[int]
     NCONSTS_FIELD_NUMBER: _ClassVar[int]
+    FUSION_FIELD_NUMBER: _ClassVar[int]
     year: int
     rating: int
     genres: int
     nconsts: int
-    def __init__(self, year: _Optional[int] = ..., rating: _Optional[int] = ..., genres: _Optional[int] = ..., nconsts: _Optional[int] = ...) -> None: ...
+    fusion: Fusion
+    def __init__(self, year: _Optional[int] = ..., rating: _Optional[int] = ..., genres: _Optional[int] = ..., nconsts: _Optional[int] = ..., fusion: _Optional[_Union[Fusion, str]] = ...) -> None: ...
 
 class Request(_message.Message):
     __slots__ = ("tconsts", "n", "filter", "weight")
@@ -58,3 +68,21 @@ class RecommendedMovie(_message.Message):
     tconst: str
     weights: _containers.RepeatedScalarFieldContainer[str]
     def __init__(self, tconst: _Optional[str] = ..., weights: _Optional[_Iterable[str]] = ...) -> None: ...
+
+class BatchRequest(_message.Message):
+    __slots__ = ("requests",)
+    REQUESTS_FIELD_NUMBER: _ClassVar[int]
+    requests: _containers.RepeatedCompositeFieldContainer[Request]
+    def __init__(self, requests: _Optional[_Iterable[_Union[Request, _Mapping]]] = ...) -> None: ...
+
+class BatchResponse(_message.Message):
+    __slots__ = ("index", "response", "code", "details")
+    INDEX_FIELD_NUMBER: _ClassVar[int]
+    RESPONSE_FIELD_NUMBER: _ClassVar[int]
+    CODE_FIELD_NUMBER: _ClassVar[int]
+    DETAILS_FIELD_NUMBER: _ClassVar[int]
+    index: int
+    response: Response
+    code: int
+    details: str
+    def __init__(self, index: _Optional[int] = ..., response: _Optional[_Union[Response, _Mapping]] = ..., code: _Optional[int] = ..., details: _Optional[str] = ...) -> None: ...
@@ -39,6 +39,11 @@ class RecommenderStub(object):
                 request_serializer=recommender__pb2.Request.SerializeToString,
                 response_deserializer=recommender__pb2.Response.FromString,
                 _registered_method=True)
+        self.GetRecommendationsBatch = channel.unary_stream(
+                '/recommender.Recommender/GetRecommendationsBatch',
+                request_serializer=recommender__pb2.BatchRequest.SerializeToString,
+                response_deserializer=recommender__pb2.BatchResponse.FromString,
+                _registered_method=True)
 
 
 class RecommenderServicer(object):
@@ -50,6 +55,13 @@ class RecommenderServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def GetRecommendationsBatch(self, request, context):
+        """Streams back one BatchResponse per request, in completion order.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_RecommenderServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -58,6 +70,11 @@ def add_RecommenderServicer_to_server(servicer, server):
                     request_deserializer=recommender__pb2.Request.FromString,
                     response_serializer=recommender__pb2.Response.SerializeToString,
             ),
+            'GetRecommendationsBatch': grpc.unary_stream_rpc_method_handler(
+                    servicer.GetRecommendationsBatch,
+                    request_deserializer=recommender__pb2.BatchRequest.FromString,
+                    response_serializer=recommender__pb2.BatchResponse.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'recommender.Recommender', rpc_method_handlers)
@@ -95,3 +112,30 @@ class Recommender(object):
             timeout,
             metadata,
             _registered_method=True)
+
+    @staticmethod
+    def GetRecommendationsBatch(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/recommender.Recommender/GetRecommendationsBatch',
+            recommender__pb2.BatchRequest.SerializeToString,
+            recommender__pb2.BatchResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
@@ -1,12 +1,221 @@
-from typing import Any
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, Callable, Iterator
+import os
+import threading
+import time
 import numpy as np
-from sklearn.feature_extraction.text import CountVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-import polars as pl
 from dataclasses import dataclass
+from catalog import Catalog, CountMatrix, ValueBuckets
 
+if TYPE_CHECKING:
+    from neighbours import NeighbourTable
 
-@dataclass
+
+class DeadlineExceededError(Exception):
+    pass
+
+
+class RequestCancelledError(Exception):
+    pass
+
+
+def get_ranks(keys: np.ndarray, by_votes: np.ndarray) -> np.ndarray:
+    """
+    Ranks elements by key (ascending) and then by number of votes (descending),
+    for every row of `keys` in one pass. Keys of up to 16 bit integers are ranked
+    with a linear time radix sort.
+
+    Args
+    ----
+    keys: np.ndarray - sort keys of the elements taken in `by_votes` order, one row per ranking
+    by_votes: np.ndarray - positions of the elements ordered by number of votes (descending)
+
+    Returns
+    -------
+    np.ndarray (uint32): rank of every element (in original positions) for every row of `keys`
+    """
+    order = np.argsort(keys, axis=1, kind='stable')
+    ranks_by_votes = np.empty(keys.shape, dtype=np.uint32)
+    np.put_along_axis(
+        ranks_by_votes, order,
+        np.broadcast_to(np.arange(keys.shape[1], dtype=np.uint32), keys.shape), axis=1
+    )
+
+    ranks = np.empty(keys.shape, dtype=np.uint32)
+    ranks[:, by_votes] = ranks_by_votes
+    return ranks
+
+
+def get_sharded_ranks(
+    get_keys: Callable[[np.ndarray], np.ndarray],
+    ordered_rows: np.ndarray,
+    by_votes: np.ndarray,
+    shards: int,
+    executor: ThreadPoolExecutor
+) -> np.ndarray:
+    """
+    Same ranks as get_ranks(get_keys(ordered_rows), by_votes), computed in `shards` contiguous
+    ranges of the rows in parallel. NumPy releases the GIL while sorting, so threads run on
+    separate cores.
+
+    Every shard computes the keys of its rows, sorts them and counts every key. The rank of an
+    element is the number of elements with a smaller key, plus those with the same key in earlier
+    shards, plus its position among the elements with its key in its own shard. So the ranks are
+    exactly those of one sort of all rows. Keys must be small non-negative integers.
+
+    Args
+    ----
+    get_keys: Callable[[np.ndarray], np.ndarray] - sort keys of catalog rows, one row per ranking
+    ordered_rows: np.ndarray - catalog rows to rank, in `by_votes` order
+    by_votes: np.ndarray - positions of the rows ordered by number of votes (descending)
+    shards: int - number of ranges of rows
+    executor: ThreadPoolExecutor - threads ranking the shards
+
+    Returns
+    -------
+    np.ndarray (uint32): see get_ranks
+    """
+    bounds = np.linspace(0, len(ordered_rows), shards + 1).astype(np.int64)
+
+    def sort_shard(shard: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        keys = get_keys(ordered_rows[bounds[shard]:bounds[shard + 1]])
+        order = np.argsort(keys, axis=1, kind='stable')
+        sorted_keys = np.take_along_axis(keys, order, axis=1).astype(np.int64)
+        counts = [np.bincount(row_keys) for row_keys in sorted_keys]
+        return order, sorted_keys, counts
+
+    runs = list(executor.map(sort_shard, range(shards)))
+    rankings = len(runs[0][1])
+    size = max(len(counts) for _, _, shard_counts in runs for counts in shard_counts)
+    counts = np.zeros((rankings, size, shards), dtype=np.int64)
+    for shard, (_, _, shard_counts) in enumerate(runs):
+        for i, key_counts in enumerate(shard_counts):
+            counts[i, :len(key_counts), shard] = key_counts
+    # First global rank of every key in every shard: all smaller keys, then the same key in earlier shards.
+    starts = (np.cumsum(counts.reshape(rankings, -1), axis=1) - counts.reshape(rankings, -1)).reshape(counts.shape)
+
+    ranks = np.empty((rankings, len(ordered_rows)), dtype=np.uint32)
+
+    def rank_shard(shard: int) -> None:
+        order, sorted_keys, _ = runs[shard]
+        positions = by_votes[bounds[shard] + order]
+        for i in range(rankings):
+            # The sorted elements of a key follow its first global rank, less its first position in the shard.
+            shard_counts = counts[i, :, shard]
+            offsets = starts[i, :, shard] - (np.cumsum(shard_counts) - shard_counts)
+            ranks[i, positions[i]] = offsets[sorted_keys[i]] + np.arange(len(order[i]))
+
+    for _ in executor.map(rank_shard, range(shards)):
+        pass
+    return ranks
+
+
+_shard_executor: ThreadPoolExecutor = None
+_shard_executor_pid: int = None
+_shard_executor_lock = threading.Lock()
+
+
+def get_shard_executor(workers: int) -> ThreadPoolExecutor:
+    """
+    Args
+    ----
+    workers: int - number of threads needed
+
+    Returns
+    -------
+    ThreadPoolExecutor: threads shared by all Recommenders of the process, created again in a
+    forked worker process, as threads do not survive the fork
+    """
+    global _shard_executor, _shard_executor_pid
+    with _shard_executor_lock:
+        if _shard_executor is None or _shard_executor_pid != os.getpid() or _shard_executor._max_workers < workers:
+            _shard_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='shard')
+            _shard_executor_pid = os.getpid()
+        return _shard_executor
+
+
+def exclude_ranks(ranks: np.ndarray, positions: np.ndarray) -> np.ndarray:
+    """
+    Args
+    ----
+    ranks: np.ndarray - ranks of elements, one ranking per row (see get_ranks)
+    positions: np.ndarray - positions of the elements to leave out
+
+    Returns
+    -------
+    np.ndarray (uint32): ranks of the remaining elements as if the left out ones had never been ranked
+    """
+    ranks = ranks.copy()
+    for position in positions:
+        ranks -= ranks > ranks[:, position:position + 1]
+    return np.delete(ranks, positions, axis=1)
+
+
+def get_top_n(scores: np.ndarray, votes: np.ndarray, n: int) -> np.ndarray:
+    """
+    Selects the n lowest scores without sorting the whole array.
+
+    Args
+    ----
+    scores: np.ndarray - score of every element (ascending is better)
+    votes: np.ndarray - number of votes of every element, used to break ties in scores (descending)
+    n: int - number of elements to select
+
+    Returns
+    -------
+    np.ndarray (int64): positions of the selected elements, sorted by score and then by votes (descending).
+    Remaining ties keep the input order.
+    """
+    if n <= 0 or len(scores) == 0:
+        return np.empty(0, dtype=np.int64)
+    if n < len(scores):
+        kth = np.partition(scores, n - 1)[n - 1]
+        candidates = np.flatnonzero(scores <= kth)
+    else:
+        candidates = np.arange(len(scores))
+
+    order = np.lexsort((-votes[candidates].astype(np.int64), scores[candidates]))
+    return candidates[order[:n]]
+
+
+def get_prefix(keys: np.ndarray, depth: int) -> np.ndarray:
+    """
+    Selects the first elements of a ranking without sorting the whole array.
+
+    Args
+    ----
+    keys: np.ndarray - sort keys of the elements taken in votes order (see get_ranks)
+    depth: int - number of elements to select
+
+    Returns
+    -------
+    np.ndarray (int64): positions of the `depth` best ranked elements in `keys`, in rank order
+    """
+    if depth >= len(keys):
+        return np.argsort(keys, kind='stable')
+    kth = np.partition(keys, depth - 1)[depth - 1]
+    candidates = np.flatnonzero(keys <= kth)
+    return candidates[np.argsort(keys[candidates], kind='stable')[:depth]]
+
+
+def get_decimal_ratings(ratings: np.ndarray) -> np.ndarray:
+    """
+    Args
+    ----
+    ratings: np.ndarray - float32 ratings
+
+    Returns
+    -------
+    np.ndarray (float64): the decimal value of every rating (7.1 rather than the float32 7.0999999),
+    which the distances of the float32 ratings widened to float64 are measured from, as Postgres
+    did. Measured from the float32 value, ratings on either side of it would tie.
+    """
+    return np.array([float(str(np.float32(rating))) for rating in ratings], dtype=np.float64)
+
+
+@dataclass(frozen=True)
 class Filter:
     min_votes: int = None
     max_votes: int = None
@@ -37,17 +246,26 @@ class Filter:
         if self.min_rating is not None and self.max_rating is not None and self.min_rating > self.max_rating:
             raise ValueError("min_rating should be less than or equal to max_rating")
 
-@dataclass
+# How the features of every row are combined: 'rank' averages the positions of the row in the
+# ranking of every feature, 'score' averages its normalized distances (see get_feature_distances).
+FUSIONS = ('rank', 'score')
+
+@dataclass(frozen=True)
 class Weight:
     year: int = 100
     rating: int = 100
     genres: int = 100
     nconsts: int = 100
+    fusion: str = 'rank'
 
     def __post_init__(self):
+        if self.fusion not in FUSIONS:
+            raise ValueError(f'Fusion must be one of {", ".join(FUSIONS)}, got {self.fusion}')
+
         total_sum = 0
         total_count = 0
-        for k, v in self.__dict__.items():
+        for k in ('year', 'rating', 'genres', 'nconsts'):
+            v = getattr(self, k)
             if v < 0:
                 raise ValueError(f'Weight for {k} must be greater than or equal to 0, got {v}')
             if v > 0:
@@ -59,383 +277,1079 @@ class Weight:
         if total_count*100 != total_sum:
             raise ValueError(f'Total sum of weights must be {total_count*100}, got {total_sum}')
 
+def get_filter_bounds(filter_: Filter) -> dict[str, tuple[int | float, int | float]]:
+    """
+    Args
+    ----
+    filter_: Filter - filter to get bounds of, 0 and None bounds are not applied
+
+    Returns
+    -------
+    dict[str, tuple[int | float, int | float]]: (min, max) of every filtered catalog column,
+    None for a side that is not bounded
+    """
+    bounds = {}
+    for column in ('votes', 'year', 'rating'):
+        min_ = getattr(filter_, f'min_{column}') or None
+        max_ = getattr(filter_, f'max_{column}') or None
+        if min_ is not None or max_ is not None:
+            bounds[column] = (min_, max_)
+    return bounds
+
+
+def get_filter_mask(catalog: Catalog, filter_: Filter) -> np.ndarray:
+    """
+    Args
+    ----
+    catalog: Catalog - catalog to filter
+    filter_: Filter - filter of the rows
+
+    Returns
+    -------
+    np.ndarray (bool): mask of the catalog rows with genres and nconsts matching the filter,
+    computed by comparing whole columns
+    """
+    mask = catalog.has_genres_and_nconsts.copy()
+    for column, (min_, max_) in get_filter_bounds(filter_).items():
+        if min_ is not None:
+            mask &= getattr(catalog, column) >= min_
+        if max_ is not None:
+            mask &= getattr(catalog, column) <= max_
+    return mask
+
+
+class FilterIndex:
+    """
+    Turns a Filter into a row mask with binary searches over columns sorted once per catalog.
+
+    Only the rows in the range of the most selective bounded column are compared with the
+    other bounds. Masks of the `max_masks` most recently used filters are memoized.
+    """
+
+    # Filters whose most selective column keeps more than 1/scan_ratio of the rows are
+    # evaluated by comparing whole columns.
+    scan_ratio = 8
+
+    def __init__(self, catalog: Catalog, max_masks: int = 128) -> None:
+        self.catalog = catalog
+        self.max_masks = max_masks
+        self.hits = 0
+        self.misses = 0
+        self.orders: dict[str, np.ndarray] = {}
+        self.values: dict[str, np.ndarray] = {}
+        for column in ('votes', 'year', 'rating'):
+            self.orders[column] = np.argsort(getattr(catalog, column), kind='stable')
+            self.values[column] = getattr(catalog, column)[self.orders[column]]
+        self._masks: OrderedDict[Filter, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_mask(self, filter_: Filter) -> np.ndarray:
+        """
+        Args
+        ----
+        filter_: Filter - filter of the rows
+
+        Returns
+        -------
+        np.ndarray (bool): read-only mask of the catalog rows with genres and nconsts matching the filter
+        """
+        with self._lock:
+            mask = self._masks.get(filter_)
+            if mask is not None:
+                self._masks.move_to_end(filter_)
+                self.hits += 1
+                return mask
+            self.misses += 1
+
+        mask = self.build_mask(filter_)
+        mask.flags.writeable = False
+        if self.max_masks > 0:
+            with self._lock:
+                self._masks[filter_] = mask
+                while len(self._masks) > self.max_masks:
+                    self._masks.popitem(last=False)
+        return mask
+
+    def build_mask(self, filter_: Filter) -> np.ndarray:
+        """
+        Args
+        ----
+        filter_: Filter - filter of the rows
+
+        Returns
+        -------
+        np.ndarray (bool): mask of the catalog rows with genres and nconsts matching the filter
+        """
+        bounds = get_filter_bounds(filter_)
+        if len(bounds) == 0:
+            return self.catalog.has_genres_and_nconsts.copy()
+
+        ranges = {column: self.search(column, min_, max_) for column, (min_, max_) in bounds.items()}
+        column = min(ranges, key=lambda column: ranges[column][1] - ranges[column][0])
+        start, end = ranges.pop(column)
+        if (end - start) * self.scan_ratio > len(self.catalog):
+            # Comparing whole columns is faster than gathering most of their rows.
+            return get_filter_mask(self.catalog, filter_)
+
+        rows = self.orders[column][start:end]
+        for column in ranges:
+            min_, max_ = bounds[column]
+            values = getattr(self.catalog, column)[rows]
+            if min_ is not None:
+                rows = rows[values >= min_]
+                values = values[values >= min_]
+            if max_ is not None:
+                rows = rows[values <= max_]
+
+        mask = np.zeros(len(self.catalog), dtype=bool)
+        mask[rows] = True
+        mask &= self.catalog.has_genres_and_nconsts
+        return mask
+
+    def search(self, column: str, min_: int | float, max_: int | float) -> tuple[int, int]:
+        """
+        Args
+        ----
+        column: str - name of the catalog column
+        min_: int | float - smallest value to include, None for no lower bound
+        max_: int | float - largest value to include, None for no upper bound
+
+        Returns
+        -------
+        tuple[int, int]: start and end of the values in range in the column sorted by value
+        """
+        values = self.values[column]
+
+        def position(bound: int | float, side: str) -> int:
+            if np.issubdtype(values.dtype, np.integer):
+                info = np.iinfo(values.dtype)
+                if bound > info.max:
+                    return len(values)
+                if bound < info.min:
+                    return 0
+            return int(np.searchsorted(values, values.dtype.type(bound), side))
+
+        start = position(min_, 'left') if min_ is not None else 0
+        end = position(max_, 'right') if max_ is not None else len(values)
+        return start, max(start, end)
+
+    def stats(self) -> dict[str, int]:
+        """
+        Returns
+        -------
+        dict[str, int]: memoized masks, hits and misses counters
+        """
+        with self._lock:
+            return {'masks': len(self._masks), 'hits': self.hits, 'misses': self.misses}
+
+
 class Recommender:
+    # Fractions of the rows get_threshold_responses reads every ranking to, before ranking all of them.
+    threshold_fractions = (1 / 64, 1 / 8)
+    # Fewest rows in a shard, smaller rankings are not worth the threads (see rank_rows).
+    min_shard_rows = 65536
+    # Bytes of the ranks (or distances) of one batched pass of get_recommendations_batch.
+    batch_bytes = 64 << 20
+
     def __init__(
         self,
+        catalog: Catalog,
         filter_: Filter = Filter(),
-        weight: Weight = Weight()
+        weight: Weight = Weight(),
+        filter_index: FilterIndex = None,
+        early_termination: bool = False,
+        neighbours: 'NeighbourTable' = None,
+        shards: int = 1,
+        deadline: float = None,
+        is_active: Callable[[], bool] = None
     ) -> None:
+        self.catalog = catalog
         self.filter = filter_
         self.weight = weight
-        self.sql_where_clause = ''
+        self.early_termination = early_termination
+        # Number of row ranges the year, rating and genres rankings are computed in parallel in.
+        self.shards = shards
+        # time.monotonic() after which, or once is_active returns False, no other stage is started (see timed).
+        self.deadline = deadline
+        self.is_active = is_active
+        # Precomputed recommendations, only used for requests with the default weight and filter.
+        self.neighbours = neighbours
+        if neighbours is not None and (
+            weight != Weight() or len(get_filter_bounds(filter_)) > 0 or neighbours.version != catalog.version
+        ):
+            self.neighbours = None
+        # Depth the rankings were read to by the last get_threshold_responses call.
+        self.depth = 0
+        # Seconds spent in every stage, see timed.
+        self.timings: dict[str, float] = {}
+        with self.timed('filter'):
+            if filter_index is not None:
+                self.filter_mask: np.ndarray = filter_index.get_mask(filter_)
+            else:
+                self.filter_mask = get_filter_mask(catalog, filter_)
 
-        self.sql_where_clause = self.add_sql_where_clause(self.sql_where_clause, f"genres != ''")
-        self.sql_where_clause = self.add_sql_where_clause(self.sql_where_clause, f"nconsts != ''")
+        self.features: list[str] = []
+        if weight.year > 0:
+            self.features.append('year')
+        if weight.rating > 0:
+            self.features.append('rating')
+        if weight.genres > 0:
+            self.features.append('genres')
+        if weight.nconsts > 0:
+            self.features.append('nconsts')
+
+    @contextmanager
+    def timed(self, stage: str) -> Iterator[None]:
+        """
+        Adds the time spent in the block to `timings[stage]`. The stages are lookup (of the given
+        tconsts), neighbours (see get_neighbour_responses), filter, order (by votes), year, rating,
+        genres and nconsts (ranking or sort keys), threshold (see get_threshold_responses), exclude
+        (see get_recommendations_batch) and fusion (averages, top n and building the responses).
 
-        if filter_.min_votes:
-            self.sql_where_clause = self.add_sql_where_clause(self.sql_where_clause, f'votes >= {filter_.min_votes}')
-        if filter_.max_votes:
-            self.sql_where_clause = self.add_sql_where_clause(self.sql_where_clause, f'votes <= {filter_.max_votes}')
-        if filter_.min_year:
-            self.sql_where_clause = self.add_sql_where_clause(self.sql_where_clause, f'year >= {filter_.min_year}')
-        if filter_.max_year:
-            self.sql_where_clause = self.add_sql_where_clause(self.sql_where_clause, f'year <= {filter_.max_year}')
-        if filter_.min_rating:
-            self.sql_where_clause = self.add_sql_where_clause(self.sql_where_clause, f'rating >= {filter_.min_rating}')
-        if filter_.max_rating:
-            self.sql_where_clause = self.add_sql_where_clause(self.sql_where_clause, f'rating <= {filter_.max_rating}')
+        A stage is not started once the deadline passed or the caller went away, so the
+        request is given up between stages instead of computed for nobody.
 
-    def add_sql_where_clause(self, old: str, new: str) -> None:
-        return f'WHERE {new}' if old == '' else f'{old} AND {new}'
+        Args
+        ----
+        stage: str - name of the stage
+
+        Raises
+        ------
+        DeadlineExceededError: if the deadline passed
+        RequestCancelledError: if is_active returns False
+        """
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            raise DeadlineExceededError(f"deadline exceeded before the {stage} stage")
+        if self.is_active is not None and not self.is_active():
+            raise RequestCancelledError(f"request cancelled before the {stage} stage")
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[stage] = self.timings.get(stage, 0.0) + time.perf_counter() - start
 
-    def get_ordered_year_from_sql(self, conn, reference_year: int) -> pl.DataFrame:
+    def get_filtered_rows(self, tconsts: list[int]) -> np.ndarray:
         """
         Args
         ----
-        conn: psycopg2 connection object
-        reference_year: int - year to sort by closest
+        tconsts: list[int] - list of tconsts to leave out of the result
 
         Returns
         -------
-        DataFrame:
-        First sorted by closest year, then by number of votes (descending).
-        | year_index (uint32) | tconst (str) |
-        | ---                 | ---          |
-        | 0                   | tt0000001    |
-        | 1                   | tt0000002    |
-        | 2                   | tt0000003    |
-        | ...                 | ...          |
-        """
-        return pl.read_database(
-            f"""
-                SELECT tconst
-                FROM imdb
-                {self.sql_where_clause}
-                ORDER BY ABS(year - {reference_year}), votes DESC
-            """,
-            conn, schema_overrides={'tconst': str}
-        ).with_row_index('year_index')
-
-    def get_ordered_rating_from_sql(self, conn, reference_rating: int) -> pl.DataFrame:
+        np.ndarray (int64): catalog rows matching the filter (ascending)
+        """
+        mask = self.filter_mask.copy()
+        for tconst in tconsts:
+            try:
+                mask[self.catalog.get_row_by_tconst(tconst)['row']] = False
+            except ValueError:
+                pass
+        return np.flatnonzero(mask)
+
+    def get_by_votes(self, rows: np.ndarray) -> np.ndarray:
         """
         Args
         ----
-        conn: psycopg2 connection object
-        reference_rating: int - rating to sort by closest
+        rows: np.ndarray - catalog rows (ascending)
 
         Returns
         -------
-        DataFrame:
-        First sorted by closest rating, then by number of votes (descending).
-        | rating_index (uint32) | tconst (str) |
-        | ---                   | ---          |
-        | 0                     | tt0000001    |
-        | 1                     | tt0000002    |
-        | 2                     | tt0000003    |
-        | ...                   | ...          |
-        """
-        return pl.read_database(
-            f"""
-                SELECT tconst
-                FROM imdb
-                {self.sql_where_clause}
-                ORDER BY ABS(rating - {reference_rating}), votes DESC
-            """,
-            conn, schema_overrides={'tconst': str}
-        ).with_row_index('rating_index')
-
-    def get_ordered_genres_from_df(self, df: pl.DataFrame, reference_genres: str) -> pl.DataFrame:
+        np.ndarray (int64): positions of `rows` ordered by number of votes (descending) and then by row,
+        taken from the catalog order in linear time
+        """
+        mask = np.zeros(len(self.catalog), dtype=bool)
+        mask[rows] = True
+        positions = np.cumsum(mask) - 1
+        return positions[self.catalog.by_votes[mask[self.catalog.by_votes]]]
+
+    def get_year_keys(self, rows: np.ndarray, reference_years: np.ndarray) -> np.ndarray:
         """
         Args
         ----
-        df: DataFrame
-        | tconst (str) | genres (str)   | votes (uint32) |
-        | ---          | ---            | ---            |
-        | tt0000001    | Drama, Romance | 123            |
-        | tt0000002    | Comedy, Drama  | 456            |
-        | tt0000003    | Action, Drama  | 789            |
-        | ...          | ...            | ...            |
-        reference_genres: str - genres to calculate cosine similarities
+        rows: np.ndarray - catalog rows to rank
+        reference_years: np.ndarray - years to sort by closest, one ranking per year
 
         Returns
         -------
-        DataFrame:
-        First sorted by cosine similarities genres (descending) and then by number of votes (descending).
-        | genres_index (uint32) | tconst (str) |
-        | ---                   | ---          |
-        | 0                     | tt0000001    |
-        | 1                     | tt0000002    |
-        | 2                     | tt0000003    |
-        | ...                   | ...          |
-        """
-        df = df.with_row_index('genres_index')
-
-        genres_cv = CountVectorizer(dtype=np.uint8, token_pattern=r"(?u)[\w'-]+")
-        genres_count_matrix = genres_cv.fit_transform(df['genres'])
-
-        genres_sims = cosine_similarity(genres_cv.transform([reference_genres]), genres_count_matrix)[0]
-
-        return pl.DataFrame(
-            {
-                'tconst': df['tconst'],
-                'cosine_similarity': genres_sims,
-                'votes': df['votes']
-            }, schema={'tconst': str, 'cosine_similarity': pl.Float32, 'votes': pl.UInt32}
-        ).\
-            sort(['cosine_similarity', 'votes'], descending=True).\
-                drop(['cosine_similarity', 'votes']).\
-                    with_row_index('genres_index')
-
-    def get_ordered_nconsts_from_df(self, df: pl.DataFrame, reference_nconsts: str) -> pl.DataFrame:
+        np.ndarray: sort key of every row in `rows` for every reference year (len(reference_years) x len(rows)),
+        the rank of the distance of its year bucket from the reference year
+        """
+        buckets = self.catalog.year_buckets
+        distance_ranks = buckets.get_distance_ranks(
+            np.abs(buckets.values.astype(np.int32) - reference_years.astype(np.int32)[:, None])
+        )
+        return distance_ranks[:, buckets.codes[rows]]
+
+    def get_rating_keys(self, rows: np.ndarray, reference_ratings: np.ndarray) -> np.ndarray:
         """
         Args
         ----
-        df: DataFrame
-        | tconst (str) | nconsts (str)        | votes (uint32) |
-        | ---          | ---                  | ---            |
-        | tt0000001    | nm0000001, nm0000002 | 123            |
-        | tt0000002    | nm0000001, nm0000003 | 456            |
-        | tt0000003    | nm0000004, nm0000002 | 789            |
-        | ...          | ...                  | ...            |
-        reference_nconsts: str - nconsts to calculate cosine similarities
+        rows: np.ndarray - catalog rows to rank
+        reference_ratings: np.ndarray - ratings to sort by closest, one ranking per rating
 
         Returns
         -------
-        df: DataFrame
-        First sorted by cosine similarities of nconsts (descending) and then by number of votes (descending).
-        | nconsts_index (uint32) | tconst (str) |
-        | ---                    | ---          |
-        | 0                      | tt0000001    |
-        | 1                      | tt0000002    |
-        | 2                      | tt0000003    |
-        | ...                    | ...          |
-        """
-        df = df.with_row_index('nconsts_index')
-
-        nconsts_cv = CountVectorizer(dtype=np.uint8, token_pattern=r"(?u)[\w'-]+")
-        nconsts_count_matrix = nconsts_cv.fit_transform(df['nconsts'])
-
-        nconsts_sims = cosine_similarity(nconsts_cv.transform([reference_nconsts]), nconsts_count_matrix)[0]
-
-        return  pl.DataFrame(
-            {
-                'tconst': df['tconst'],
-                'cosine_similarity': nconsts_sims,
-                'votes': df['votes']
-            }, schema={'tconst': str, 'cosine_similarity': pl.Float32, 'votes': pl.UInt32}
-        ).\
-            sort(['cosine_similarity', 'votes'], descending=True).\
-                drop(['cosine_similarity', 'votes']).\
-                    with_row_index('nconsts_index')
-
-    def get_main_df(self, conn) -> pl.DataFrame:
+        np.ndarray: sort key of every row in `rows` for every reference rating (len(reference_ratings) x len(rows)),
+        the rank of the distance of its rating bucket from the reference rating
+        """
+        buckets = self.catalog.rating_buckets
+        distance_ranks = buckets.get_distance_ranks(
+            np.abs(buckets.values.astype(np.float64) - get_decimal_ratings(reference_ratings)[:, None])
+        )
+        return distance_ranks[:, buckets.codes[rows]]
+
+    def get_genres_keys(self, rows: np.ndarray, reference_rows: np.ndarray) -> np.ndarray:
         """
         Args
         ----
-        conn: psycopg2 connection object
+        rows: np.ndarray - catalog rows to rank
+        reference_rows: np.ndarray - catalog rows of the movies to calculate cosine similarities of genres with
 
         Returns
         -------
-        DataFrame:
-        | tconst (str) | genres (str)   | nconsts (str)        | votes (uint32) |
-        | ---          | ---            | ---                  | ---            |
-        | tt0000001    | Drama, Romance | nm0000001, nm0000002 | 123            |
-        | tt0000002    | Comedy, Drama  | nm0000001, nm0000003 | 456            |
-        | tt0000003    | Action, Drama  | nm0000004, nm0000002 | 789            |
-        | ...          | ...            | ...                  | ...            |
-        """
-        return pl.read_database(
-            f"""
-                SELECT tconst, genres, nconsts, votes
-                FROM imdb
-                {self.sql_where_clause}
-            """, conn, schema_overrides={'tconst': str, 'genres': str, 'nconsts': str, 'votes': pl.UInt32}
-        )
+        np.ndarray (uint16): sort key of every row in `rows` for every reference row (len(reference_rows) x len(rows)),
+        the rank of its cosine similarity of genres (descending)
+        """
+        masks = self.catalog.genres[rows]
+        sizes = np.bitwise_count(masks)
+        counts = np.arange(33)
+
+        keys = np.empty((len(reference_rows), len(rows)), dtype=np.uint16)
+        for i, reference_mask in enumerate(self.catalog.genres[reference_rows]):
+            # Similarity of every possible (shared genres, genres) pair, computed like CountMatrix.cosine_similarity.
+            norms = np.sqrt(float(np.bitwise_count(reference_mask))) * np.sqrt(counts.astype(np.float64))
+            sims = np.zeros((len(counts), len(counts)), dtype=np.float64)
+            np.divide(counts[:, None].astype(np.float64), norms, out=sims, where=norms > 0)
 
-    def get_row_by_tconst(self, conn, tconst: str) -> dict[str, Any]:
+            _, ranks = np.unique(-sims.astype(np.float32), return_inverse=True)
+            keys[i] = ranks.reshape(sims.shape).astype(np.uint16)[np.bitwise_count(masks & reference_mask), sizes]
+        return keys
+
+    def rank_rows(
+        self,
+        get_keys: Callable[[np.ndarray], np.ndarray],
+        rows: np.ndarray,
+        by_votes: np.ndarray
+    ) -> np.ndarray:
         """
         Args
         ----
-        conn: psycopg2 connection object
-        tconst: str - tconst to get row from database
+        get_keys: Callable[[np.ndarray], np.ndarray] - sort keys of catalog rows (small non-negative integers)
+        rows: np.ndarray - catalog rows to rank
+        by_votes: np.ndarray - positions of `rows` ordered by number of votes (descending)
 
         Returns
         -------
-        dict: row from database
-        {
-            'tconst': str,
-            'year': int,
-            'genres': str,
-            'nconsts': str,
-            'rating': float,
-            'votes': int
-        }
+        np.ndarray (uint32): see get_ranks, computed in up to `shards` shards (see get_sharded_ranks)
+        """
+        shards = min(self.shards, len(rows) // self.min_shard_rows)
+        if shards <= 1:
+            return get_ranks(get_keys(rows[by_votes]), by_votes)
+        return get_sharded_ranks(get_keys, rows[by_votes], by_votes, shards, get_shard_executor(self.shards))
 
-        Raises
-        ------
-        ValueError: if tconst is not found in database
-        """
-        with conn.cursor() as cursor:
-            cursor.execute(
-                f"""
-                    SELECT tconst, year, genres, nconsts, rating, votes
-                    FROM imdb
-                    WHERE tconst = '{tconst}'
-                """
-            )
-            row = cursor.fetchone()
-            if row is None:
-                raise ValueError(f"tconst '{tconst}' not found")
-            return {cursor.description[i][0]: value for i, value in enumerate(row)}
-
-    def set_average(self, column_name: str, features: list[str], merged_df: pl.DataFrame) -> pl.DataFrame:
+    def get_ordered_year(self, rows: np.ndarray, by_votes: np.ndarray, reference_years: np.ndarray) -> np.ndarray:
+        """
+        Args
+        ----
+        rows: np.ndarray - catalog rows to rank
+        by_votes: np.ndarray - positions of `rows` ordered by number of votes (descending)
+        reference_years: np.ndarray - years to sort by closest, one ranking per year
+
+        Returns
+        -------
+        np.ndarray (uint32): rank of every row in `rows` for every reference year (len(reference_years) x len(rows)),
+        first sorted by closest year, then by number of votes (descending).
+        """
+        return self.rank_rows(lambda shard: self.get_year_keys(shard, reference_years), rows, by_votes)
+
+    def get_ordered_rating(self, rows: np.ndarray, by_votes: np.ndarray, reference_ratings: np.ndarray) -> np.ndarray:
+        """
+        Args
+        ----
+        rows: np.ndarray - catalog rows to rank
+        by_votes: np.ndarray - positions of `rows` ordered by number of votes (descending)
+        reference_ratings: np.ndarray - ratings to sort by closest, one ranking per rating
+
+        Returns
+        -------
+        np.ndarray (uint32): rank of every row in `rows` for every reference rating (len(reference_ratings) x len(rows)),
+        first sorted by closest rating, then by number of votes (descending).
+        """
+        return self.rank_rows(lambda shard: self.get_rating_keys(shard, reference_ratings), rows, by_votes)
+
+    def get_similarity_ranks(
+        self,
+        counts: CountMatrix,
+        rows: np.ndarray,
+        by_votes: np.ndarray,
+        reference_rows: np.ndarray
+    ) -> np.ndarray:
+        """
+        Ranks the rows sharing a token with a reference row by their cosine similarity, found from
+        the posting lists of its tokens, and all other rows after them in votes order. Only if most
+        rows share a token with the reference row are all of them sorted.
+
+        Args
+        ----
+        counts: CountMatrix - token counts of the catalog rows
+        rows: np.ndarray - catalog rows to rank (ascending)
+        by_votes: np.ndarray - positions of `rows` ordered by number of votes (descending)
+        reference_rows: np.ndarray - catalog rows of the movies to calculate cosine similarities with
+
+        Returns
+        -------
+        np.ndarray (uint32): rank of every row in `rows` for every reference row (len(reference_rows) x len(rows)),
+        first sorted by cosine similarities (descending) and then by number of votes (descending).
+        """
+        votes_order = np.empty(len(rows), dtype=np.int64)
+        votes_order[by_votes] = np.arange(len(rows))
+        row_positions = np.full(len(counts.norms), -1, dtype=np.int64)
+        row_positions[rows] = np.arange(len(rows))
+
+        ranks = np.empty((len(reference_rows), len(rows)), dtype=np.uint32)
+        ranks_by_votes = np.empty(len(rows), dtype=np.uint32)
+        for i, reference_row in enumerate(reference_rows):
+            similar, sims = counts.get_similar(reference_row)
+            positions = row_positions[similar]
+            keep = (positions >= 0) & (sims > 0)
+            if np.count_nonzero(keep) * counts.dense_ratio > len(rows):
+                # Most rows are similar, a sort of all of them is cheaper.
+                keys = np.zeros(len(rows), dtype=np.float32)
+                keys[positions[keep]] = -sims[keep]
+                ranks[i] = get_ranks(keys[by_votes][None], by_votes)[0]
+                continue
+
+            similar_by_votes = votes_order[positions[keep]]
+            ranked = similar_by_votes[np.lexsort((similar_by_votes, -sims[keep]))]
+
+            is_similar = np.zeros(len(rows), dtype=bool)
+            is_similar[ranked] = True
+            ranks_by_votes[ranked] = np.arange(len(ranked))
+            ranks_by_votes[~is_similar] = np.arange(len(ranked), len(rows))
+            ranks[i, by_votes] = ranks_by_votes
+        return ranks
+
+    def get_ordered_genres(self, rows: np.ndarray, by_votes: np.ndarray, reference_rows: np.ndarray) -> np.ndarray:
+        """
+        Args
+        ----
+        rows: np.ndarray - catalog rows to rank
+        by_votes: np.ndarray - positions of `rows` ordered by number of votes (descending)
+        reference_rows: np.ndarray - catalog rows of the movies to calculate cosine similarities of genres with
+
+        Returns
+        -------
+        np.ndarray (uint32): rank of every row in `rows` for every reference row (len(reference_rows) x len(rows)),
+        first sorted by cosine similarities of genres (descending) and then by number of votes (descending).
+        """
+        return self.rank_rows(lambda shard: self.get_genres_keys(shard, reference_rows), rows, by_votes)
+
+    def get_ordered_nconsts(self, rows: np.ndarray, by_votes: np.ndarray, reference_rows: np.ndarray) -> np.ndarray:
+        """
+        Args
+        ----
+        rows: np.ndarray - catalog rows to rank
+        by_votes: np.ndarray - positions of `rows` ordered by number of votes (descending)
+        reference_rows: np.ndarray - catalog rows of the movies to calculate cosine similarities of nconsts with
+
+        Returns
+        -------
+        np.ndarray (uint32): rank of every row in `rows` for every reference row (len(reference_rows) x len(rows)),
+        first sorted by cosine similarities of nconsts (descending) and then by number of votes (descending).
+        """
+        return self.get_similarity_ranks(self.catalog.nconsts, rows, by_votes, reference_rows)
+
+    def set_average(self, features: list[str], ranks: dict[str, np.ndarray]) -> np.ndarray:
         """
         Args
         ----
-        column_name: str - name of the column to store the average
         features: list[str] - list of features to calculate the average
-        merged_df: DataFrame - merged DataFrame of all features
+        ranks: dict[str, np.ndarray] - rank arrays of all features, aligned on the same rows
 
         Returns
         -------
-        DataFrame: Same DataFrame with the argument column_name added to it with the average of all features
+        np.ndarray (float64): weighted average of the ranks of all features
         """
-        average = merged_df[f'{features[0]}_index'] * self.weight.__getattribute__(features[0])
+        average = ranks[features[0]].astype(np.int64) * self.weight.__getattribute__(features[0])
         for feature in features[1:]:
-            average += merged_df[f'{feature}_index'] * self.weight.__getattribute__(feature)
+            average += ranks[feature].astype(np.int64) * self.weight.__getattribute__(feature)
 
-        return merged_df.with_columns(**{column_name: (average / (len(features) * 100))})
+        return average / (len(features) * 100)
 
-    def get_single_recommendation(self, conn, tconst: str, features: list[str]) -> pl.DataFrame:
+    def get_feature_ranks(
+        self,
+        rows: np.ndarray,
+        reference_rows: list[dict[str, Any]],
+        features: list[str],
+        by_votes: np.ndarray = None
+    ) -> dict[str, np.ndarray]:
         """
+        Ranks `rows` against every reference movie at once.
+
         Args
         ----
-        conn: psycopg2 connection object
-        tconst: str - tconst to get recommendations
-        features: list[str] - list of features to calculate the average
+        rows: np.ndarray - catalog rows to rank
+        reference_rows: list[dict[str, Any]] - catalog rows of the reference movies (see Catalog.get_row_by_tconst)
+        features: list[str] - list of features to rank by
+        by_votes: np.ndarray - positions of `rows` ordered by number of votes (descending), computed if None
 
         Returns
         -------
-        DataFrame: DataFrame with the average of all features
+        dict[str, np.ndarray]: rank of every row in `rows` for every reference movie
+        (len(reference_rows) x len(rows)) for each feature
+        """
+        if by_votes is None:
+            with self.timed('order'):
+                by_votes = self.get_by_votes(rows)
+        references = np.array([reference_row['row'] for reference_row in reference_rows])
 
-        Raises
-        ------
-        ValueError: if no recommendations found
+        ranks: dict[str, np.ndarray] = {}
+        if 'year' in features:
+            with self.timed('year'):
+                ranks['year'] = self.get_ordered_year(rows, by_votes, self.catalog.year[references])
+        if 'rating' in features:
+            with self.timed('rating'):
+                ranks['rating'] = self.get_ordered_rating(rows, by_votes, self.catalog.rating[references])
+        if 'genres' in features:
+            with self.timed('genres'):
+                ranks['genres'] = self.get_ordered_genres(rows, by_votes, references)
+        if 'nconsts' in features:
+            with self.timed('nconsts'):
+                ranks['nconsts'] = self.get_ordered_nconsts(rows, by_votes, references)
+
+        return ranks
+
+    def get_feature_keys(
+        self,
+        rows: np.ndarray,
+        by_votes: np.ndarray,
+        reference_rows: list[dict[str, Any]],
+        features: list[str]
+    ) -> dict[str, np.ndarray]:
         """
-        reference_row = self.get_row_by_tconst(conn, tconst)
-        trained: dict[str, pl.DataFrame] = {}
+        Args
+        ----
+        rows: np.ndarray - catalog rows to rank
+        by_votes: np.ndarray - positions of `rows` ordered by number of votes (descending)
+        reference_rows: list[dict[str, Any]] - catalog rows of the reference movies (see Catalog.get_row_by_tconst)
+        features: list[str] - list of features to rank by
+
+        Returns
+        -------
+        dict[str, np.ndarray]: sort key of every row in `rows` taken in `by_votes` order for every
+        reference movie (len(reference_rows) x len(rows)) for each feature, see get_ranks
+        """
+        references = np.array([reference_row['row'] for reference_row in reference_rows])
+        ordered_rows = rows[by_votes]
 
+        keys: dict[str, np.ndarray] = {}
         if 'year' in features:
-            df = self.get_ordered_year_from_sql(conn, reference_year=reference_row['year'])
-            if len(df) > 0:
-                trained['year'] = df
+            with self.timed('year'):
+                keys['year'] = self.get_year_keys(ordered_rows, self.catalog.year[references])
         if 'rating' in features:
-            df = self.get_ordered_rating_from_sql(conn, reference_rating=reference_row['rating'])
-            if len(df) > 0:
-                trained['rating'] = df
-        if 'genres' in features or 'nconsts' in features:
-            main_df = self.get_main_df(conn)
-            if len(main_df) > 0:
-                if 'genres' in features:
-                    trained['genres'] = self.get_ordered_genres_from_df(
-                                            pl.DataFrame(
-                                                {
-                                                    'tconst': main_df['tconst'],
-                                                    'genres': main_df['genres'],
-                                                    'votes': main_df['votes']
-                                                }
-                                            ), reference_genres=reference_row['genres']
-                                        )
-                if 'nconsts' in features:
-                    trained['nconsts'] = self.get_ordered_nconsts_from_df(
-                                            pl.DataFrame(
-                                                {
-                                                    'tconst': main_df['tconst'],
-                                                    'nconsts': main_df['nconsts'],
-                                                    'votes': main_df['votes']
-                                                }
-                                            ), reference_nconsts=reference_row['nconsts']
-                                        )
-
-        if len(trained) == 0:
-            raise ValueError("No recommendations found, try changing the filter or weight")
-        if len(features) > 1:
-            merged = pl.concat(trained.values(), how='align')
-            return self.set_average(
-                    "average", features=features, merged_df=merged
-                )
-        else:
-            trained_df = trained[features[0]]
-            return trained_df.with_columns(
-                    average=trained_df[f'{features[0]}_index']
+            with self.timed('rating'):
+                keys['rating'] = self.get_rating_keys(ordered_rows, self.catalog.rating[references])
+        if 'genres' in features:
+            with self.timed('genres'):
+                keys['genres'] = self.get_genres_keys(ordered_rows, references)
+        if 'nconsts' in features:
+            with self.timed('nconsts'):
+                keys['nconsts'] = -self.catalog.nconsts.cosine_similarity(ordered_rows, references)
+
+        return keys
+
+    def get_feature_distances(
+        self,
+        rows: np.ndarray,
+        reference_rows: list[dict[str, Any]],
+        features: list[str]
+    ) -> dict[str, np.ndarray]:
+        """
+        Distances of `rows` from every reference movie for score fusion, computed without sorting.
+        The year and rating gaps are divided by the range of the known values of the column in the
+        catalog. A year or rating of 0 is missing (the ETL default), so it is at distance 1 from any
+        value. Genres and nconsts distances are 1 - cosine similarity, so every distance is between
+        0 and 1.
+
+        Args
+        ----
+        rows: np.ndarray - catalog rows to score
+        reference_rows: list[dict[str, Any]] - catalog rows of the reference movies (see Catalog.get_row_by_tconst)
+        features: list[str] - list of features to score by
+
+        Returns
+        -------
+        dict[str, np.ndarray]: distance (float64) of every row in `rows` from every reference movie
+        (len(reference_rows) x len(rows)) for each feature
+        """
+        references = np.array([reference_row['row'] for reference_row in reference_rows])
+
+        def get_gaps(buckets: ValueBuckets, reference_values: np.ndarray) -> np.ndarray:
+            values = buckets.values.astype(np.float64)
+            known = values[values > 0]
+            span = known[-1] - known[0] if len(known) > 1 else 0.0
+            gaps = np.abs(values - reference_values[:, None]) / (span if span > 0 else 1.0)
+            gaps[:, values <= 0] = 1.0
+            gaps[reference_values <= 0] = 1.0
+            return gaps[:, buckets.codes[rows]]
+
+        distances: dict[str, np.ndarray] = {}
+        if 'year' in features:
+            with self.timed('year'):
+                distances['year'] = get_gaps(self.catalog.year_buckets, self.catalog.year[references].astype(np.float64))
+        if 'rating' in features:
+            with self.timed('rating'):
+                distances['rating'] = get_gaps(
+                    self.catalog.rating_buckets, get_decimal_ratings(self.catalog.rating[references])
                 )
+        if 'genres' in features:
+            with self.timed('genres'):
+                masks = self.catalog.genres[rows]
+                sizes = np.bitwise_count(masks)
+                counts = np.arange(33, dtype=np.float64)
+                distances['genres'] = np.empty((len(references), len(rows)), dtype=np.float64)
+                for i, reference_mask in enumerate(self.catalog.genres[references]):
+                    # Similarity of every possible (shared genres, genres) pair, as in get_genres_keys.
+                    norms = np.sqrt(float(np.bitwise_count(reference_mask))) * np.sqrt(counts)
+                    sims = np.zeros((len(counts), len(counts)), dtype=np.float64)
+                    np.divide(counts[:, None], norms, out=sims, where=norms > 0)
+                    distances['genres'][i] = 1 - sims[np.bitwise_count(masks & reference_mask), sizes]
+        if 'nconsts' in features:
+            with self.timed('nconsts'):
+                distances['nconsts'] = 1 - self.catalog.nconsts.cosine_similarity(rows, references).astype(np.float64)
+
+        return distances
+
+    def get_score_responses(
+        self,
+        rows: np.ndarray,
+        tconsts: list[int],
+        distances: dict[str, np.ndarray],
+        n: int
+    ) -> dict[int, list[str | int]]:
+        """
+        Like get_responses, with the weighted average of the distances of every row in place of
+        its average rank. The n best rows are selected with a partition (see get_top_n), so no
+        ranking is sorted.
+
+        Args
+        ----
+        rows: np.ndarray - catalog rows that were scored
+        tconsts: list[int] - list of tconsts the rows were scored against
+        distances: dict[str, np.ndarray] - see get_feature_distances
+        n: int - number of recommendations to get
+
+        Returns
+        -------
+        dict[int, list[str | int]]: see get_recommendations, ordered by distance instead of rank
+        """
+        with self.timed('fusion'):
+            scores = distances[self.features[0]] * self.weight.__getattribute__(self.features[0])
+            for feature in self.features[1:]:
+                scores = scores + distances[feature] * self.weight.__getattribute__(feature)
+            scores /= len(self.features) * 100
+
+            responses: dict[int, list[str | int]] = dict()
+            if len(tconsts) == 1:
+                for i in get_top_n(scores[0], self.catalog.votes[rows], n):
+                    row = {f: float(distances[f][0, i]) / self.weight.__getattribute__(f) for f in self.features}
+                    weights: list[str | int] = [column for column, _ in sorted(row.items(), key=lambda item: item[1])]
+                    responses[int(self.catalog.tconst[rows[i]])] = weights
+            else:
+                for i in get_top_n(self.get_total_average(scores), self.catalog.votes[rows], n):
+                    row = {tconst: scores[j, i] for j, tconst in enumerate(tconsts)}
+                    weights: list[str | int] = [tconst for tconst, _ in sorted(row.items(), key=lambda item: item[1])]
+                    responses[int(self.catalog.tconst[rows[i]])] = weights
+
+            return responses
 
-    def get_recommendations(self, conn, tconsts: list[str], n: int = 5) -> dict[str, list[str]]:
+    def get_total_average(self, averages: np.ndarray) -> np.ndarray:
         """
         Args
         ----
-        conn: psycopg2 connection object
-        tconsts: list[str] - list of tconsts to get recommendations
+        averages: np.ndarray - weighted average rank for every reference movie (rows), see set_average
+
+        Returns
+        -------
+        np.ndarray (float64): average of `averages` over all reference movies
+        """
+        all_average = averages[0].copy()
+        for average in averages[1:]:
+            all_average += average
+        all_average /= len(averages)
+        return all_average
+
+    def get_responses(
+        self,
+        rows: np.ndarray,
+        tconsts: list[int],
+        ranks: dict[str, np.ndarray],
+        n: int
+    ) -> dict[int, list[str | int]]:
+        """
+        Args
+        ----
+        rows: np.ndarray - catalog rows that were ranked
+        tconsts: list[int] - list of tconsts the rows were ranked against
+        ranks: dict[str, np.ndarray] - see get_feature_ranks
+        n: int - number of recommendations to get
+
+        Returns
+        -------
+        dict[int, list[str | int]]: see get_recommendations
+        """
+        with self.timed('fusion'):
+            averages = self.set_average(self.features, ranks)
+
+            responses: dict[int, list[str | int]] = dict()
+            if len(tconsts) == 1:
+                for i in get_top_n(averages[0], self.catalog.votes[rows], n):
+                    row = {f: int(ranks[f][0, i]) / self.weight.__getattribute__(f) for f in self.features}
+                    weights: list[str | int] = [column for column, _ in sorted(row.items(), key=lambda item: item[1])]
+                    responses[int(self.catalog.tconst[rows[i]])] = weights
+            else:
+                for i in get_top_n(self.get_total_average(averages), self.catalog.votes[rows], n):
+                    row = {tconst: averages[j, i] for j, tconst in enumerate(tconsts)}
+                    weights: list[str | int] = [tconst for tconst, _ in sorted(row.items(), key=lambda item: item[1])]
+                    responses[int(self.catalog.tconst[rows[i]])] = weights
+
+            return responses
+
+    def get_recommendations(self, tconsts: list[int], n: int = 5) -> dict[int, list[str | int]]:
+        """
+        Args
+        ----
+        tconsts: list[int] - list of tconsts to get recommendations
         n: int - number of recommendations to get
         
         Returns
         -------
-        list[dict[str, list[str]]]: list of dictionaries with tconst (ascending)
-        as key and list of weights of columns as value (ascending)
+        dict[int, list[str | int]]: tconst of every recommended movie as key and, as value,
+        its features ordered by rank if one tconst is given, or the given tconsts ordered by
+        average rank otherwise (ascending). With score fusion (see Weight.fusion) distances
+        take the place of ranks.
+
+        Raises
+        ------
+        ValueError: if no tconsts are given, a tconst is not found or no recommendations found
+        DeadlineExceededError | RequestCancelledError: see timed
         """
-        self.sql_where_clause = self.add_sql_where_clause(
-            self.sql_where_clause,
-            f"tconst NOT IN ({', '.join(f"'{tconst}'" for tconst in tconsts)})"
-        )
+        if len(tconsts) == 0:
+            raise ValueError("no tconsts given")
+        with self.timed('lookup'):
+            reference_rows = [self.catalog.get_row_by_tconst(tconst) for tconst in tconsts]
+        if self.neighbours is not None:
+            with self.timed('neighbours'):
+                responses = self.get_neighbour_responses(tconsts, reference_rows, n)
+            if responses is not None:
+                return responses
+        with self.timed('filter'):
+            rows = self.get_filtered_rows(tconsts)
+        if len(rows) == 0:
+            raise ValueError("No recommendations found, try changing the filter or weight")
+
+        if self.weight.fusion == 'score':
+            distances = self.get_feature_distances(rows, reference_rows, self.features)
+            return self.get_score_responses(rows, tconsts, distances, n)
+        if self.early_termination:
+            if self.can_stop_early(len(rows), len(tconsts), n):
+                return self.get_threshold_responses(rows, tconsts, reference_rows, n)
+            self.depth = len(rows)
 
-        features: list[str] = []
-        if self.weight.year > 0:
-            features.append('year')
-        if self.weight.rating > 0:
-            features.append('rating')
-        if self.weight.genres > 0:
-            features.append('genres')
-        if self.weight.nconsts > 0:
-            features.append('nconsts')
+        ranks = self.get_feature_ranks(rows, reference_rows, self.features)
+        return self.get_responses(rows, tconsts, ranks, n)
 
+    def get_neighbour_responses(
+        self,
+        tconsts: list[int],
+        reference_rows: list[dict[str, Any]],
+        n: int
+    ) -> dict[int, list[str | int]] | None:
+        """
+        Gets the same recommendations as get_responses from the precomputed recommendations of
+        every seed (see NeighbourTable) instead of ranking every row.
+
+        One seed takes the first n of its list. The list of every seed of a request with more seeds
+        was ranked leaving out only its own seed, so the ranks of its rows are lowered by the number
+        of other seeds ranked before them, compared by their sort keys (see get_feature_keys). Rows in
+        every list have an exact average, other rows have one of at least the last row of every list
+        they are missing from, as in get_threshold_responses.
+
+        Args
+        ----
+        tconsts: list[int] - list of tconsts to get recommendations
+        reference_rows: list[dict[str, Any]] - catalog rows of the tconsts (see Catalog.get_row_by_tconst)
+        n: int - number of recommendations to get
+
+        Returns
+        -------
+        dict[int, list[str | int]] | None: see get_recommendations, None if a seed has no list, the
+        lists are shorter than n or they do not determine the n best rows
+        """
+        table = self.neighbours
+        indexes = [table.get_index(reference_row['row']) for reference_row in reference_rows]
+        if None in indexes or n <= 0 or n > table.k:
+            return None
         if len(tconsts) == 1:
-            merged_df = self.get_single_recommendation(conn, tconsts[0], features).sort('average')[:n]
-
-            responses: dict[str, list[str]] = dict()
-            for row in merged_df.rows(named=True):
-                row.pop('average')
-                t: str = row.pop('tconst')
-                for f in features:
-                    row[f] = row[f"{f}_index"] / self.weight.__getattribute__(f)
-                    row.pop(f"{f}_index")
-                weights: list[str] = [column for column, _ in sorted(row.items(), key=lambda item: item[1])]
-                responses[t] = weights
+            return {
+                int(self.catalog.tconst[row]): table.get_features(int(order))
+                for row, order in zip(table.neighbours[indexes[0], :n], table.feature_orders[indexes[0], :n])
+            }
 
-            return responses
-        else:
-            trained_dfs: dict[str, pl.DataFrame] = {}
-            for tconst in tconsts:
-                df = self.get_single_recommendation(conn, tconst, features)
-                trained_dfs[tconst] = pl.DataFrame({
-                    'tconst': df['tconst'],
-                    f"{tconst}_average": df['average']
-                })
-
-            merged_df: pl.DataFrame = pl.concat(trained_dfs.values(), how='align')
-
-            all_average = merged_df[f"{tconsts[0]}_average"]
-            for tconst in tconsts[1:]:
-                all_average += merged_df[f"{tconst}_average"]
-            merged_df = merged_df.with_columns(all_average=all_average / len(tconsts)).sort('all_average')[:n]
-
-            responses: dict[str, list[str]] = dict()
-            for row in merged_df.rows(named=True):
-                row.pop('all_average')
-                curretn_tconst: str = row.pop('tconst')
-                for tconst in tconsts:
-                    row[tconst] = row[f"{tconst}_average"]
-                    row.pop(f"{tconst}_average")
-                weights: list[str] = [column for column, _ in sorted(row.items(), key=lambda item: item[1])]
-                responses[curretn_tconst] = weights
+        seeds = np.array([reference_row['row'] for reference_row in reference_rows])
+        lists = np.asarray(table.neighbours[indexes], dtype=np.int64)
+        sums = np.asarray(table.rank_sums[indexes], dtype=np.int64)
+        # Only the seeds that pass the filter are in the rankings of the other seeds.
+        ranked_seeds = np.unique(seeds[self.catalog.has_genres_and_nconsts[seeds]])
+        candidates = np.setdiff1d(lists, seeds)
 
-            return responses
+        in_list = np.zeros((len(seeds), len(candidates)), dtype=bool)
+        positions = []
+        for j in range(len(seeds)):
+            keep = ~np.isin(lists[j], seeds)
+            positions.append((keep, np.searchsorted(candidates, lists[j, keep])))
+            in_list[j, positions[j][1]] = True
+        complete = in_list.all(axis=0)
+        # Lists of unrelated seeds rarely share n rows, leave them to the rankings early.
+        if np.count_nonzero(complete) < n:
+            return None
+
+        pool = np.concatenate((candidates, ranked_seeds))
+        keys = self.get_feature_keys(pool, np.arange(len(pool)), reference_rows, self.features)
+        # Position of every pool row in votes order, which breaks ties in keys.
+        order = np.empty(len(pool), dtype=np.int64)
+        order[np.lexsort((pool, -self.catalog.votes[pool].astype(np.int64)))] = np.arange(len(pool))
+
+        rank_sums = np.zeros((len(seeds), len(candidates)), dtype=np.int64)
+        bounds = np.empty(len(seeds), dtype=np.int64)
+        for j, seed in enumerate(seeds):
+            keep, seed_positions = positions[j]
+            rank_sums[j, seed_positions] = sums[j, keep]
+
+            others = len(candidates) + np.flatnonzero(ranked_seeds != seed)
+            for f in self.features:
+                key, other_key = keys[f][j, :len(candidates)], keys[f][j, others, None]
+                rank_sums[j] -= np.count_nonzero(
+                    (other_key < key) | ((other_key == key) & (order[others, None] < order[:len(candidates)])), axis=0
+                )
+            # Every rank of a row missing from the list is lowered by at most the number of other seeds.
+            bounds[j] = sums[j, -1] - len(self.features) * len(others)
+
+        rank_sums = np.where(in_list, rank_sums, bounds[:, None])
+        averages = rank_sums * 100 / (len(self.features) * 100)
+        totals = self.get_total_average(averages)
+        exact = np.flatnonzero(complete)
+        top = exact[get_top_n(totals[exact], self.catalog.votes[candidates[exact]], n)]
+        if len(top) < n:
+            return None
+        threshold = self.get_total_average(bounds[:, None] * 100 / (len(self.features) * 100))[0]
+        if not (threshold > totals[top[-1]] and np.all(totals[~complete] > totals[top[-1]])):
+            return None
+
+        responses: dict[int, list[str | int]] = dict()
+        for i in top:
+            row = {tconst: averages[j, i] for j, tconst in enumerate(tconsts)}
+            weights: list[str | int] = [tconst for tconst, _ in sorted(row.items(), key=lambda item: item[1])]
+            responses[int(self.catalog.tconst[candidates[i]])] = weights
+        return responses
+
+    def can_stop_early(self, rows: int, seeds: int, n: int) -> bool:
+        """
+        Whether get_threshold_responses can stop before ranking every row.
+
+        It stops only with n rows seen in every ranking (one per seed and feature) within the
+        deepest prefix, and reading prefixes that do not get there costs more than ranking every
+        row. Taking the rankings as independent, rows * (depth / rows) ** rankings rows are
+        expected in all of them, so requests of several seeds are ranked in full unless that
+        reaches n. Requests of one seed always read prefixes.
+
+        Args
+        ----
+        rows: int - number of rows to rank
+        seeds: int - number of reference movies
+        n: int - number of recommendations to get
+
+        Returns
+        -------
+        bool: True to read prefixes (see get_threshold_responses), False to rank every row
+        """
+        if seeds == 1:
+            return True
+        depth = min(rows, max(4 * n, int(rows * max(self.threshold_fractions))))
+        return rows * (depth / rows) ** (seeds * len(self.features)) >= n
+
+    def get_threshold_responses(
+        self,
+        rows: np.ndarray,
+        tconsts: list[int],
+        reference_rows: list[dict[str, Any]],
+        n: int
+    ) -> dict[int, list[str | int]]:
+        """
+        Gets the same recommendations as get_responses without ranking every row in every feature.
+
+        Every ranking (one per reference movie and feature) is read in prefixes of growing depth
+        (see threshold_fractions). Rows seen in every prefix have an exact average, other rows
+        have a rank of at least the depth in every ranking they are missing from. Reading stops
+        once the n best exact averages are better than the average of a row ranked at the depth
+        everywhere and than the lowest possible average of every partially seen row, ties going
+        to the row with more votes. Otherwise every row is ranked after the deepest prefix.
+
+        Args
+        ----
+        rows: np.ndarray - catalog rows to rank
+        tconsts: list[int] - list of tconsts the rows are ranked against
+        reference_rows: list[dict[str, Any]] - catalog rows of the reference movies (see Catalog.get_row_by_tconst)
+        n: int - number of recommendations to get
+
+        Returns
+        -------
+        dict[int, list[str | int]]: see get_recommendations
+        """
+        with self.timed('order'):
+            by_votes = self.get_by_votes(rows)
+        keys = self.get_feature_keys(rows, by_votes, reference_rows, self.features)
+        with self.timed('threshold'):
+            unseen = {f: np.zeros((len(tconsts), 1), dtype=np.int64) for f in self.features}
+
+            for fraction in self.threshold_fractions:
+                depth = min(len(rows), max(4 * n, int(len(rows) * fraction)))
+                prefixes = {f: [get_prefix(k, depth) for k in keys[f]] for f in self.features}
+                # Positions in votes order of every row seen in any prefix, so ties in averages keep votes order.
+                is_seen = np.zeros(len(rows), dtype=bool)
+                for f in self.features:
+                    for prefix in prefixes[f]:
+                        is_seen[prefix] = True
+                seen = np.flatnonzero(is_seen)
+
+                ranks: dict[str, np.ndarray] = {}
+                complete = np.ones(len(seen), dtype=bool)
+                lookup = np.empty(len(rows), dtype=np.int64)
+                for f in self.features:
+                    ranks[f] = np.empty((len(tconsts), len(seen)), dtype=np.int64)
+                    for j, prefix in enumerate(prefixes[f]):
+                        lookup[seen] = depth
+                        lookup[prefix] = np.arange(depth)
+                        ranks[f][j] = lookup[seen]
+                        complete &= ranks[f][j] < depth
+
+                scores = self.get_total_average(self.set_average(self.features, ranks))
+                exact = np.flatnonzero(complete)
+                top = exact[np.argsort(scores[exact], kind='stable')[:n]]
+                if len(top) == n:
+                    for f in self.features:
+                        unseen[f][:] = depth
+                    threshold = self.get_total_average(self.set_average(self.features, unseen))[0]
+                    worst_score, worst = scores[top[-1]], seen[top[-1]]
+                    partial = ~complete
+                    if threshold > worst_score and np.all(
+                        (scores[partial] > worst_score) | ((scores[partial] == worst_score) & (seen[partial] > worst))
+                    ):
+                        self.depth = depth
+                        top = top[np.argsort(by_votes[seen[top]])]
+                        rows, ranks = rows[by_votes[seen[top]]], {f: r[:, top] for f, r in ranks.items()}
+                        break
+            else:
+                # Reading deeper would cost more than ranking every row.
+                self.depth = len(rows)
+                ranks = {f: get_ranks(k, by_votes) for f, k in keys.items()}
+
+        return self.get_responses(rows, tconsts, ranks, n)
+
+    def get_recommendations_batch(
+        self,
+        requests: list[tuple[list[int], int]],
+        max_seeds: int | None = None
+    ) -> Iterator[tuple[int, dict[int, list[str | int]] | ValueError]]:
+        """
+        Gets recommendations for many requests sharing this filter and weight.
+
+        The filter is applied and rows are ordered by votes once for all requests, and the
+        seeds of up to `max_seeds` requests are ranked together in one batched pass, as many
+        as fit the ranks of every feature over the filtered rows in `batch_bytes`. The ranks
+        of each request are then adjusted as if its own tconsts had been left out of the rows,
+        so every result is identical to get_recommendations. Requests answered from the
+        neighbour table (see get_neighbour_responses) are not ranked.
+
+        Args
+        ----
+        requests: list[tuple[list[int], int]] - tconsts and n of every request
+        max_seeds: int | None - maximum number of tconsts ranked in one pass, None to derive it from batch_bytes
+
+        Yields
+        ------
+        tuple[int, dict[int, list[str | int]] | ValueError]: index of the request in `requests` and its
+        recommendations (see get_recommendations), or the ValueError get_recommendations would raise
+
+        Raises
+        ------
+        DeadlineExceededError | RequestCancelledError: see timed, the requests not yielded yet are given up
+        """
+        with self.timed('filter'):
+            rows = self.get_filtered_rows([])
+        with self.timed('order'):
+            by_votes = self.get_by_votes(rows)
+
+        pending: list[tuple[int, list[int], int, list[dict[str, Any]]]] = []
+        errors: list[tuple[int, ValueError]] = []
+        with self.timed('lookup'):
+            for i, (tconsts, n) in enumerate(requests):
+                try:
+                    if len(tconsts) == 0:
+                        raise ValueError("no tconsts given")
+                    pending.append((i, tconsts, n, [self.catalog.get_row_by_tconst(tconst) for tconst in tconsts]))
+                except ValueError as e:
+                    errors.append((i, e))
+        yield from errors
+
+        if self.neighbours is not None:
+            ranked = []
+            for request in pending:
+                with self.timed('neighbours'):
+                    responses = self.get_neighbour_responses(request[1], request[3], request[2])
+                if responses is not None:
+                    yield request[0], responses
+                else:
+                    ranked.append(request)
+            pending = ranked
+
+        if max_seeds is None:
+            # Distances are float64, ranks uint32.
+            seed_bytes = len(rows) * max(len(self.features), 1) * (8 if self.weight.fusion == 'score' else 4)
+            max_seeds = max(self.batch_bytes // max(seed_bytes, 1), 1)
+
+        start = 0
+        while start < len(pending):
+            end, seeds = start + 1, len(pending[start][3])
+            while end < len(pending) and seeds + len(pending[end][3]) <= max_seeds:
+                seeds += len(pending[end][3])
+                end += 1
+            chunk, start = pending[start:end], end
+
+            chunk_reference_rows = [reference_row for *_, reference_rows in chunk for reference_row in reference_rows]
+            if self.weight.fusion == 'score':
+                # Distances do not depend on the other rows, so no exclusion has to be corrected for.
+                ranks = self.get_feature_distances(rows, chunk_reference_rows, self.features)
+            else:
+                ranks = self.get_feature_ranks(rows, chunk_reference_rows, self.features, by_votes)
+
+            offset = 0
+            for i, tconsts, n, reference_rows in chunk:
+                seed_ranks = {f: r[offset:offset + len(reference_rows)] for f, r in ranks.items()}
+                offset += len(reference_rows)
+
+                excluded = np.flatnonzero(np.isin(rows, [reference_row['row'] for reference_row in reference_rows]))
+                if len(rows) == len(excluded):
+                    yield i, ValueError("No recommendations found, try changing the filter or weight")
+                    continue
+
+                with self.timed('exclude'):
+                    request_rows = np.delete(rows, excluded)
+                    if self.weight.fusion == 'score':
+                        request_distances = {f: np.delete(d, excluded, axis=1) for f, d in seed_ranks.items()}
+                    else:
+                        request_ranks = {f: exclude_ranks(r, excluded) for f, r in seed_ranks.items()}
+                if self.weight.fusion == 'score':
+                    yield i, self.get_score_responses(request_rows, tconsts, request_distances, n)
+                else:
+                    yield i, self.get_responses(request_rows, tconsts, request_ranks, n)
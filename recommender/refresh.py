@@ -0,0 +1,173 @@
+from typing import Callable
+import select
+import threading
+import time
+
+import numpy as np
+import psycopg2
+
+from catalog import Catalog, parse_tconst
+from db import ConnectionPool, read_copy
+
+
+# Channel the triggers of `imdb` notify (see the imdb_changes migration).
+CHANNEL = 'imdb_changes'
+
+
+class CatalogRefresher:
+    """
+    Keeps a catalog in step with the `imdb` table from a background thread.
+
+    Triggers log the tconst of every changed row of `imdb` to `imdb_changes` and notify
+    the `imdb_changes` channel. Once no notification arrived for `delay` seconds, and at
+    least every `interval` seconds, the rows changed by transactions from the catalog's
+    xmin on are read and applied to it (see Catalog.apply_changes). The whole table is read
+    again instead if it was truncated or more than `max_delta_ratio` of the rows changed.
+
+    The new catalog is built off the request path and handed to `on_refresh`, which
+    switches to it and returns the catalog to apply later changes to (e.g. the new catalog
+    reopened from a snapshot). Rows changed by a transaction still running when the changes were read
+    are read again the next time, so no change is missed.
+
+    At startup and after every refresh the changes below the xmin of the catalog handed to
+    `on_refresh` last are pruned, as that catalog (or its snapshot) holds them already. The
+    bound is recorded in `imdb_changes_pruned`, and a catalog read before it (e.g. of another
+    recommender) reads the whole table again.
+    """
+
+    # Share of the rows changed above which the whole table is read again.
+    max_delta_ratio = 0.25
+
+    def __init__(
+        self,
+        dsn: str,
+        pool: ConnectionPool,
+        catalog: Catalog,
+        on_refresh: Callable[[Catalog], Catalog],
+        delay: float = 5.0,
+        interval: float = 60.0
+    ) -> None:
+        self.dsn = dsn
+        self.pool = pool
+        self.catalog = catalog
+        # xmin of the catalog handed to on_refresh, later refreshes without changes only move self.catalog.xmin.
+        self._loaded_xmin = catalog.xmin
+        self.on_refresh = on_refresh
+        self.delay = delay
+        self.interval = interval
+        self.refreshes = 0
+        self.full_reloads = 0
+        self.failures = 0
+        self._stop = threading.Event()
+        self._thread: threading.Thread = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name='catalog-refresher', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def refresh(self) -> Catalog | None:
+        """
+        Reads the changes of `imdb` since the catalog was read and builds the new catalog.
+
+        Returns
+        -------
+        Catalog | None: the new catalog returned by on_refresh, None if no row changed
+        """
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                # The changes, the rows and the new xmin have to come from the same database snapshot.
+                cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+                cursor.execute('SELECT pg_snapshot_xmin(pg_current_snapshot())::TEXT::BIGINT')
+                xmin = cursor.fetchone()[0]
+                cursor.execute('SELECT xid FROM imdb_changes_pruned')
+                pruned_xid = cursor.fetchone()[0]
+                max_changes = int(self.max_delta_ratio * len(self.catalog))
+                cursor.execute(
+                    'SELECT DISTINCT tconst FROM imdb_changes WHERE xid >= %s LIMIT %s',
+                    (self.catalog.xmin, max_changes + 1)
+                )
+                tconsts = [tconst for tconst, in cursor.fetchall()]
+
+            full_reload = pruned_xid > self.catalog.xmin or None in tconsts or len(tconsts) > max_changes
+            if not full_reload and len(tconsts) == 0:
+                return None
+            if full_reload:
+                conn.rollback()
+                catalog = Catalog.from_sql(conn)
+                self.full_reloads += 1
+            else:
+                df = read_copy(
+                    conn,
+                    f"SELECT {', '.join(Catalog.columns)} FROM imdb WHERE tconst = ANY(%(tconsts)s)",
+                    Catalog.schema, {'tconsts': tconsts}
+                )
+                catalog = self.catalog.apply_changes(
+                    df, np.array([parse_tconst(tconst) for tconst in tconsts], dtype=np.uint32), xmin
+                )
+
+        if catalog.version == self.catalog.version:
+            self.catalog.xmin = catalog.xmin
+            return None
+        self.catalog = self.on_refresh(catalog)
+        self._loaded_xmin = self.catalog.xmin
+        self.refreshes += 1
+        return self.catalog
+
+    def stats(self) -> dict[str, int]:
+        """
+        Returns
+        -------
+        dict[str, int]: refreshes, full_reloads and failures counters
+        """
+        return {'refreshes': self.refreshes, 'full_reloads': self.full_reloads, 'failures': self.failures}
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            listener = None
+            try:
+                listener = psycopg2.connect(self.dsn)
+                listener.autocommit = True
+                with listener.cursor() as cursor:
+                    cursor.execute(f'LISTEN {CHANNEL}')
+
+                # Catch up with the changes made while not listening.
+                self.refresh()
+                self._prune()
+                while not self._stop.is_set():
+                    self._wait(listener)
+                    if not self._stop.is_set():
+                        self.refresh()
+                        self._prune()
+            except Exception as e:
+                self.failures += 1
+                print(f"Catalog refresh failed: {e}")
+                self._stop.wait(self.delay)
+            finally:
+                if listener is not None:
+                    listener.close()
+
+    def _wait(self, listener: 'psycopg2.extensions.connection') -> None:
+        # Waits up to `interval` seconds, or until no notification arrived for `delay` seconds after one did.
+        # A steady stream of notifications does not postpone the refresh beyond the interval.
+        interval_deadline = deadline = time.monotonic() + self.interval
+        while not self._stop.is_set():
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                return
+            # Wake up at least every second to notice stop.
+            if select.select([listener], [], [], min(timeout, 1.0))[0]:
+                listener.poll()
+                if listener.notifies:
+                    listener.notifies.clear()
+                    deadline = min(interval_deadline, time.monotonic() + self.delay)
+
+    def _prune(self) -> None:
+        with self.pool.connection() as conn, conn.cursor() as cursor:
+            cursor.execute('UPDATE imdb_changes_pruned SET xid = GREATEST(xid, %s)', (self._loaded_xmin,))
+            cursor.execute('DELETE FROM imdb_changes WHERE xid < %s', (self._loaded_xmin,))
+            conn.commit()
@@ -0,0 +1,99 @@
+import os
+import shutil
+import tempfile
+
+from catalog import Catalog
+
+
+# File in the snapshot root holding the name of the directory of the current snapshot.
+CURRENT = 'CURRENT'
+
+
+def export_snapshot(catalog: Catalog, root: str) -> str:
+    """
+    Writes catalog to `root/<version>` and makes it the current snapshot.
+
+    The snapshot is written to a temporary directory and renamed into place, and the
+    `CURRENT` pointer is replaced atomically, so a reader never sees a partial snapshot.
+
+    Args
+    ----
+    catalog: Catalog - catalog to export
+    root: str - directory holding the snapshots
+
+    Returns
+    -------
+    str: directory of the snapshot
+    """
+    os.makedirs(root, exist_ok=True)
+    path = os.path.join(root, catalog.version)
+    if not os.path.isdir(path):
+        tmp = tempfile.mkdtemp(prefix=f'.{catalog.version}-', dir=root)
+        try:
+            catalog.save(os.path.join(tmp, 'catalog'))
+            os.rename(os.path.join(tmp, 'catalog'), path)
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    fd, tmp = tempfile.mkstemp(prefix=f'.{CURRENT}-', dir=root)
+    with os.fdopen(fd, 'w') as f:
+        f.write(catalog.version)
+    os.replace(tmp, os.path.join(root, CURRENT))
+    return path
+
+
+def load_snapshot(root: str) -> Catalog | None:
+    """
+    Args
+    ----
+    root: str - directory holding the snapshots (see export_snapshot)
+
+    Returns
+    -------
+    Catalog | None: memory-mapped current snapshot, None if there is no snapshot yet
+    """
+    try:
+        with open(os.path.join(root, CURRENT)) as f:
+            version = f.read().strip()
+    except FileNotFoundError:
+        return None
+    return Catalog.load(os.path.join(root, version))
+
+
+def prune_snapshots(root: str, keep: int = 2) -> None:
+    """
+    Deletes all but the `keep` most recently written snapshots, never the current one.
+    Processes that still map a deleted snapshot keep reading it until they unmap it.
+
+    Args
+    ----
+    root: str - directory holding the snapshots (see export_snapshot)
+    keep: int - number of snapshots to keep
+    """
+    try:
+        with open(os.path.join(root, CURRENT)) as f:
+            current = f.read().strip()
+    except FileNotFoundError:
+        return
+
+    paths = [
+        entry.path for entry in os.scandir(root)
+        if entry.is_dir() and not entry.name.startswith('.') and entry.name != current
+    ]
+    paths.sort(key=os.path.getmtime, reverse=True)
+    for path in paths[max(keep - 1, 0):]:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    from sys import argv
+    import psycopg2
+    from config import get_postgres_dsn, get_snapshot_path
+
+    root = argv[1] if len(argv) > 1 else get_snapshot_path()
+    if root is None:
+        raise ValueError('SNAPSHOT_PATH is not set')
+
+    with psycopg2.connect(get_postgres_dsn()) as conn:
+        catalog = Catalog.from_sql(conn)
+    print(f"Snapshot exported: {export_snapshot(catalog, root)} ({len(catalog)} titles)")
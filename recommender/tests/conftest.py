@@ -0,0 +1,30 @@
+from sys import path
+import os
+path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import numpy as np
+import pytest
+
+from benchmarks.generate import generate
+from catalog import Catalog
+
+
+@pytest.fixture(scope='session')
+def df():
+    return generate(3000, seed=1, missing=0.05)
+
+
+@pytest.fixture(scope='session')
+def catalog(df):
+    return Catalog.from_df(df)
+
+
+@pytest.fixture(scope='session')
+def seeds(catalog):
+    """tconsts of 40 catalog rows, some of them without genres or nconsts."""
+    rng = np.random.default_rng(2)
+    rows = np.concatenate([
+        rng.choice(np.flatnonzero(catalog.has_genres_and_nconsts), 36, replace=False),
+        np.flatnonzero(~catalog.has_genres_and_nconsts)[:4]
+    ])
+    return [int(tconst) for tconst in catalog.tconst[rows]]
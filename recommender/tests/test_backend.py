@@ -0,0 +1,48 @@
+import os
+import signal
+
+import pytest
+
+from backend import ProcessBackend, WorkerPoolError
+from recommend import Filter, FilterIndex, Weight
+
+
+@pytest.fixture
+def backend(catalog):
+    backend = ProcessBackend(catalog, FilterIndex(catalog), workers=2)
+    yield backend
+    backend.close()
+
+
+def kill_workers(backend: ProcessBackend) -> None:
+    for pid in list(backend._executor._processes):
+        os.kill(pid, signal.SIGKILL)
+
+
+def test_broken_pool_is_replaced(backend, seeds):
+    expected = backend.get_recommendations([seeds[0]], Filter(), Weight(), 5)
+    broken = backend._executor
+    kill_workers(backend)
+    assert backend.get_recommendations([seeds[0]], Filter(), Weight(), 5) == expected
+    assert backend._executor is not broken
+
+
+def test_broken_pool_is_replaced_in_batch(backend, seeds, monkeypatch):
+    monkeypatch.setattr(ProcessBackend, 'batch_chunk_size', 3)
+    requests = [([seed], 5) for seed in seeds[:10]]
+    expected = dict(backend.get_recommendations_batch(Filter(), Weight(), requests))
+    broken = backend._executor
+    kill_workers(backend)
+    results = list(backend.get_recommendations_batch(Filter(), Weight(), requests))
+    assert sorted(i for i, _ in results) == list(range(len(requests)))
+    assert {i: str(result) for i, result in results} == {i: str(result) for i, result in expected.items()}
+    assert backend._executor is not broken
+
+
+def test_pool_broken_again_is_unavailable(backend, seeds, monkeypatch):
+    monkeypatch.setattr(ProcessBackend, '_replace_executor', lambda self, broken: None)
+    kill_workers(backend)
+    with pytest.raises(WorkerPoolError):
+        backend.get_recommendations([seeds[0]], Filter(), Weight(), 5)
+    with pytest.raises(WorkerPoolError):
+        list(backend.get_recommendations_batch(Filter(), Weight(), [([seeds[0]], 5)]))
@@ -0,0 +1,135 @@
+import threading
+import time
+
+import pytest
+
+import cache
+from cache import ResultCache, SingleFlight, get_size
+from recommend import DeadlineExceededError, RequestCancelledError
+
+
+def test_evicts_least_recently_used_by_bytes():
+    size = get_size('a') + get_size([1, 2])
+    results = ResultCache(max_bytes=3 * size, ttl=60.0)
+    results.get('a', 1)
+    for key in 'abc':
+        results.put(key, 1, [1, 2])
+    results.get('a', 1)
+    results.put('d', 1, [1, 2])
+
+    assert results.get('b', 1) is None
+    assert [results.get(key, 1) for key in 'acd'] == [[1, 2]] * 3
+    assert results.stats()['evictions'] == 1
+    assert results.stats()['bytes'] == 3 * size
+
+    results.put('e', 1, list(range(1000)))
+    assert results.get('e', 1) is None
+
+
+def test_expires_after_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(cache.time, 'monotonic', lambda: now[0])
+    results = ResultCache(max_bytes=1024, ttl=10.0)
+    results.get('a', 1)
+    results.put('a', 1, 'value')
+
+    now[0] += 10.0
+    assert results.get('a', 1) == 'value'
+    now[0] += 0.1
+    assert results.get('a', 1) is None
+    assert results.stats() == {
+        'entries': 0, 'bytes': 0, 'hits': 1, 'misses': 2, 'evictions': 1, 'invalidations': 0
+    }
+
+
+def test_invalidates_on_version_change():
+    results = ResultCache(max_bytes=1024, ttl=60.0)
+    results.get('a', 1)
+    results.put('a', 1, 'value')
+
+    assert results.get('a', 2) is None
+    assert results.stats()['invalidations'] == 1
+    assert results.stats()['entries'] == 0
+    # Computed from the replaced catalog.
+    results.put('a', 1, 'value')
+    assert results.get('a', 2) is None
+    results.put('a', 2, 'new value')
+    assert results.get('a', 2) == 'new value'
+
+
+def run_coalesced(flights: SingleFlight, fn, waiters: int, **kwargs) -> list:
+    """Calls flights.do with fn from 1 + waiters threads, fn blocks until all of them are waiting for it."""
+    release = threading.Event()
+    outcomes = [None] * (1 + waiters)
+
+    def leader():
+        release.wait(10)
+        return fn()
+
+    def call(i: int) -> None:
+        try:
+            outcomes[i] = flights.do('key', leader, **kwargs)
+        except Exception as e:
+            outcomes[i] = e
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(1 + waiters)]
+    for thread in threads:
+        thread.start()
+    while flights.stats()['coalesced'] < waiters and all(thread.is_alive() for thread in threads):
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+    return outcomes
+
+
+def test_waiters_share_result():
+    flights = SingleFlight()
+    calls = []
+
+    assert run_coalesced(flights, lambda: calls.append(1) or 'value', 3) == ['value'] * 4
+    assert len(calls) == 1
+    assert flights.stats() == {'calls': 1, 'coalesced': 3, 'in_flight': 0}
+
+
+def test_waiters_share_error():
+    flights = SingleFlight()
+
+    def fail():
+        raise ValueError('tt0000001 not found')
+
+    outcomes = run_coalesced(flights, fail, 3, retry=(DeadlineExceededError,))
+    assert all(isinstance(outcome, ValueError) for outcome in outcomes)
+    assert flights.stats()['calls'] == 1
+
+
+@pytest.mark.parametrize('error', [DeadlineExceededError, RequestCancelledError])
+def test_waiters_retry_when_leader_gives_up(error):
+    flights = SingleFlight()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        if len(calls) == 1:
+            raise error('given up by its caller')
+        return 'value'
+
+    outcomes = run_coalesced(flights, compute, 3, retry=(DeadlineExceededError, RequestCancelledError))
+    assert sum(isinstance(outcome, error) for outcome in outcomes) == 1
+    assert outcomes.count('value') == 3
+    assert 2 <= flights.stats()['calls'] <= 4
+
+
+def test_waiter_gives_up_at_deadline():
+    flights = SingleFlight()
+    release = threading.Event()
+    thread = threading.Thread(target=flights.do, args=('key', lambda: release.wait(10)))
+    thread.start()
+    while flights.stats()['in_flight'] == 0:
+        time.sleep(0.01)
+    try:
+        with pytest.raises(TimeoutError):
+            flights.do('key', lambda: 'value', deadline=time.monotonic() + 0.05)
+    finally:
+        release.set()
+        thread.join()
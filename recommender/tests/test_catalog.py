@@ -0,0 +1,37 @@
+import numpy as np
+import polars as pl
+
+from catalog import Catalog, parse_tconst
+
+
+def assert_same_catalog(catalog: Catalog, expected: Catalog) -> None:
+    for column in ('tconst', 'year', 'rating', 'votes', 'has_genres_and_nconsts', 'by_votes', 'genres',
+                   'genre_vocabulary', 'row_hashes'):
+        assert np.array_equal(getattr(catalog, column), getattr(expected, column)), column
+    for buckets in ('year_buckets', 'rating_buckets'):
+        assert np.array_equal(getattr(catalog, buckets).values, getattr(expected, buckets).values)
+        assert np.array_equal(getattr(catalog, buckets).codes, getattr(expected, buckets).codes)
+    assert np.array_equal(catalog.nconsts.vocabulary, expected.nconsts.vocabulary)
+    assert (catalog.nconsts.matrix != expected.nconsts.matrix).nnz == 0
+    assert catalog.version == expected.version
+
+
+def test_apply_changes_matches_from_df(df):
+    rng = np.random.default_rng(3)
+    catalog = Catalog.from_df(df)
+    for _ in range(5):
+        deleted = df.sample(20, seed=int(rng.integers(1 << 31)))
+        updated = df.sample(30, seed=int(rng.integers(1 << 31))).with_columns(
+            votes=pl.col('votes') + 1,
+            genres=pl.lit('drama,new-genre'),
+            nconsts=pl.col('nconsts').str.replace(r'^nm\d+', 'nm9999999')
+        )
+        inserted = df.head(10).with_columns(
+            tconst=pl.format('tt{}', (pl.int_range(10) + 9_000_000 + rng.integers(1000) * 10).cast(pl.String))
+        )
+        changed = pl.concat([updated, inserted]).unique('tconst', keep='last')
+
+        df = pl.concat([df.filter(~pl.col('tconst').is_in(pl.concat([deleted['tconst'], changed['tconst']]))), changed])
+        tconsts = np.array([parse_tconst(tconst) for tconst in pl.concat([deleted['tconst'], changed['tconst']])])
+        catalog = catalog.apply_changes(changed, tconsts)
+        assert_same_catalog(catalog, Catalog.from_df(df))
@@ -0,0 +1,188 @@
+from contextlib import contextmanager
+import struct
+import threading
+import time
+
+import numpy as np
+import polars as pl
+import psycopg2
+import psycopg2.extensions
+import pytest
+
+from db import BinaryCopyDecoder, ConnectionPool, PoolTimeoutError, get_string_series
+
+SCHEMA = {'tconst': pl.String, 'year': pl.Int16, 'genres': pl.String, 'rating': pl.Float32, 'votes': pl.UInt32}
+
+
+def encode_copy(df: pl.DataFrame) -> bytes:
+    """Encodes the rows of df like `COPY ... TO STDOUT (FORMAT binary)` of SCHEMA columns."""
+    data = bytearray(BinaryCopyDecoder.signature + struct.pack('>ii', 0, 0))
+    for tconst, year, genres, rating, votes in df.iter_rows():
+        data += struct.pack('>h', len(SCHEMA))
+        for value, format_ in ((tconst, None), (year, '>h'), (genres, None), (rating, '>f'), (votes, '>i')):
+            if value is None:
+                data += struct.pack('>i', -1)
+            elif format_ is None:
+                encoded = value.encode()
+                data += struct.pack('>i', len(encoded)) + encoded
+            else:
+                data += struct.pack('>i', struct.calcsize(format_)) + struct.pack(format_, value)
+    return bytes(data + struct.pack('>h', -1))
+
+
+@pytest.fixture(scope='module')
+def rows():
+    rng = np.random.default_rng(4)
+    size = 400
+    # Text holding the field count, a whole row header or nothing at all must not be taken for a row start.
+    texts = ['', 'drama', '\x00\x05', '\x00\x05\x00\x00\x00\x02\x00\x05', 'é☃\x00\x05x' * 3, None]
+    return pl.DataFrame({
+        'tconst': [f'tt{i:07d}' if i % 9 else texts[i % len(texts)] for i in range(size)],
+        'year': rng.integers(-5, 2026, size).astype(np.int16),
+        'genres': [texts[i] for i in rng.integers(0, len(texts), size)],
+        'rating': rng.random(size).astype(np.float32) * 10,
+        'votes': rng.integers(0, 2**31, size).astype(np.uint32)
+    }, schema=SCHEMA)
+
+
+def reject_buffers(*args, **kwargs):
+    raise TypeError("unexpected buffers")
+
+
+@pytest.fixture(params=['buffers', 'missing', 'rejected'])
+def string_constructor(request, monkeypatch):
+    """How get_string_series finds the polars buffer constructor."""
+    if request.param == 'missing':
+        monkeypatch.delattr(pl.Series, '_from_buffers')
+    elif request.param == 'rejected':
+        monkeypatch.setattr(pl.Series, '_from_buffers', reject_buffers)
+    return request.param
+
+
+@pytest.mark.parametrize('validity', [None, [True, False, True, True]])
+def test_get_string_series(string_constructor, validity):
+    strings = ['drama', '', 'é☃', '\x00\x05']
+    encoded = [string.encode() for string in strings]
+    series = get_string_series(
+        'genres',
+        np.frombuffer(b''.join(encoded), dtype=np.uint8),
+        np.concatenate(([0], np.cumsum([len(value) for value in encoded]))),
+        None if validity is None else np.array(validity)
+    )
+    expected = strings if validity is None else [s if valid else None for s, valid in zip(strings, validity)]
+    assert series.equals(pl.Series('genres', expected, dtype=pl.String))
+    assert series.name == 'genres'
+
+
+@pytest.mark.parametrize('max_write', [1, 3, 17, 256, 1 << 20])
+def test_decoder_reassembles_split_writes(rows, max_write, string_constructor):
+    data = encode_copy(rows)
+    rng = np.random.default_rng(max_write)
+    decoder = BinaryCopyDecoder(SCHEMA)
+    pos = 0
+    while pos < len(data):
+        size = int(rng.integers(1, max_write + 1))
+        decoder.write(data[pos:pos + size])
+        pos += size
+    assert decoder.result().equals(rows)
+
+
+def test_decoder_rejects_truncated_data(rows):
+    decoder = BinaryCopyDecoder(SCHEMA)
+    decoder.write(encode_copy(rows)[:-2])
+    with pytest.raises(ValueError):
+        decoder.result()
+
+
+def test_decoder_reads_no_rows():
+    decoder = BinaryCopyDecoder(SCHEMA)
+    decoder.write(encode_copy(pl.DataFrame(schema=SCHEMA)))
+    assert decoder.result().equals(pl.DataFrame(schema=SCHEMA))
+
+
+class Connection:
+    """The part of a psycopg2 connection used by ConnectionPool, failing `SELECT 1` once `broken`."""
+
+    class Info:
+        transaction_status = psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+    def __init__(self, id_: int) -> None:
+        self.id = id_
+        self.broken = False
+        self.closed = 0
+        self.info = self.Info()
+
+    @contextmanager
+    def cursor(self):
+        yield self
+
+    def execute(self, query: str) -> None:
+        if self.broken:
+            raise psycopg2.OperationalError('server closed the connection unexpectedly')
+
+    def rollback(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = 1
+
+
+@pytest.fixture
+def connections(monkeypatch):
+    """Every connection opened by a ConnectionPool, in order."""
+    connections = []
+
+    def connect(*args, **kwargs):
+        connections.append(Connection(len(connections)))
+        return connections[-1]
+
+    monkeypatch.setattr(psycopg2, 'connect', connect)
+    return connections
+
+
+def test_pool_times_out_when_exhausted(connections):
+    pool = ConnectionPool('', 1, 1, timeout=0.05)
+    with pool.connection():
+        assert pool.stats()['saturation'] == 1.0
+        with pytest.raises(PoolTimeoutError):
+            with pool.connection():
+                pass
+        stats = pool.stats()
+        assert (stats['in_use'], stats['waits'], stats['timeouts'], stats['checkouts']) == (1, 1, 1, 1)
+    assert pool.stats()['in_use'] == 0
+    with pool.connection() as conn:
+        assert conn is connections[0]
+
+
+def test_pool_waits_for_a_connection(connections):
+    pool = ConnectionPool('', 0, 1, timeout=5.0)
+    checked_out = threading.Event()
+
+    def hold():
+        with pool.connection():
+            checked_out.set()
+            time.sleep(0.05)
+
+    thread = threading.Thread(target=hold)
+    thread.start()
+    checked_out.wait(5)
+    with pool.connection():
+        pass
+    thread.join()
+
+    stats = pool.stats()
+    assert (stats['checkouts'], stats['waits'], stats['timeouts'], stats['in_use']) == (2, 1, 0, 0)
+    assert 0 < stats['max_wait_seconds'] <= stats['wait_seconds']
+    assert stats['max_size'] == 1 and stats['saturation'] == 0.0
+
+
+def test_pool_replaces_closed_connection(connections):
+    pool = ConnectionPool('', 1, 2, timeout=1.0)
+    connections[0].broken = True
+    with pool.connection() as conn:
+        assert conn is connections[1]
+    assert connections[0].closed
+    assert pool.stats()['replaced'] == 1
+    with pool.connection() as conn:
+        assert conn is connections[1]
+    assert pool.stats()['replaced'] == 1
@@ -0,0 +1,187 @@
+from sys import path
+import os
+path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'proto'))
+for name, value in (
+    ('POSTGRES_USER', 'postgres'), ('POSTGRES_PASSWORD', ''), ('POSTGRES_HOST', 'localhost'),
+    ('POSTGRES_PORT', '5432'), ('POSTGRES_DB', 'postgres')
+):
+    os.environ.setdefault(name, value)
+
+from concurrent import futures
+import threading
+import time
+
+import grpc
+import pytest
+
+from backend import LocalBackend
+from cache import ResultCache
+from catalog import format_tconst
+from main import RecommenderServicer, _get_response
+from proto import recommender_pb2, recommender_pb2_grpc
+from recommend import Filter, FilterIndex, Weight
+
+# What grpc reports as the time remaining of a call without a deadline.
+NO_DEADLINE = 9.2e18
+
+
+class Context:
+    """The part of grpc.ServicerContext used by RecommenderServicer."""
+
+    def __init__(self, time_remaining: float = None, active: bool = True) -> None:
+        self._code = None
+        self.details = None
+        self._time_remaining = time_remaining
+        self.active = active
+
+    def code(self):
+        return self._code
+
+    def set_code(self, code) -> None:
+        self._code = code
+
+    def set_details(self, details: str) -> None:
+        self.details = details
+
+    def time_remaining(self) -> float | None:
+        return self._time_remaining
+
+    def is_active(self) -> bool:
+        return self.active
+
+    def invocation_metadata(self):
+        return ()
+
+    def set_trailing_metadata(self, metadata) -> None:
+        self.trailing_metadata = metadata
+
+
+class BlockingBackend(LocalBackend):
+    """Computes a request only once `release` is set."""
+
+    def __init__(self, catalog) -> None:
+        super().__init__(catalog, FilterIndex(catalog))
+        self.release = threading.Event()
+        self.calls = 0
+
+    def get_recommendations(self, *args, **kwargs):
+        self.calls += 1
+        self.release.wait(10)
+        return super().get_recommendations(*args, **kwargs)
+
+
+@pytest.fixture
+def backend(catalog):
+    return BlockingBackend(catalog)
+
+
+@pytest.fixture
+def servicer(backend):
+    return RecommenderServicer(backend, ResultCache(max_bytes=1024 * 1024, ttl=60.0))
+
+
+@pytest.fixture
+def request_(seeds):
+    return recommender_pb2.Request(
+        tconsts=[format_tconst(seeds[0])],
+        n=5,
+        weight=recommender_pb2.Weight(year=100, rating=100, genres=100, nconsts=100)
+    )
+
+
+def test_coalesced_without_deadline(servicer, backend, request_):
+    contexts = [Context(time_remaining=NO_DEADLINE) for _ in range(4)]
+    responses = [None] * len(contexts)
+
+    def call(i: int) -> None:
+        responses[i] = servicer.GetRecommendations(request_, contexts[i])
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(len(contexts))]
+    for thread in threads:
+        thread.start()
+    while servicer.flights.stats()['coalesced'] < len(contexts) - 1 and all(thread.is_alive() for thread in threads):
+        time.sleep(0.01)
+    backend.release.set()
+    for thread in threads:
+        thread.join()
+
+    assert [context.code() for context in contexts] == [None] * len(contexts)
+    assert backend.calls == 1
+    assert len(responses[0].movies) == request_.n
+    assert all(response == responses[0] for response in responses)
+
+
+@pytest.mark.parametrize('kwargs, code', [
+    ({'time_remaining': -1.0}, grpc.StatusCode.DEADLINE_EXCEEDED),
+    ({'active': False}, grpc.StatusCode.CANCELLED)
+])
+def test_given_up(servicer, backend, request_, kwargs, code):
+    backend.release.set()
+    context = Context(**kwargs)
+    assert servicer.GetRecommendations(request_, context) == recommender_pb2.Response()
+    assert context.code() == code
+    assert f'recommender_rpc_errors_total{{method="GetRecommendations",code="{code.name}"}} 1' in (
+        servicer.metrics.render()
+    )
+
+
+@pytest.mark.parametrize('kwargs, code', [
+    ({'time_remaining': -1.0}, grpc.StatusCode.DEADLINE_EXCEEDED),
+    ({'active': False}, grpc.StatusCode.CANCELLED)
+])
+def test_batch_given_up(servicer, backend, request_, kwargs, code):
+    backend.release.set()
+    context = Context(**kwargs)
+    batch = recommender_pb2.BatchRequest(requests=[request_, request_])
+    responses = list(servicer.GetRecommendationsBatch(batch, context))
+    assert sorted(response.index for response in responses) == [0, 1]
+    assert all(response.code == code.value[0] for response in responses)
+
+
+def test_overloaded(servicer, backend, request_):
+    # Configured like serve(), with room for a single call.
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=2), maximum_concurrent_rpcs=1)
+    recommender_pb2_grpc.add_RecommenderServicer_to_server(servicer, server)
+    port = server.add_insecure_port('localhost:0')
+    server.start()
+    try:
+        with grpc.insecure_channel(f'localhost:{port}') as channel:
+            stub = recommender_pb2_grpc.RecommenderStub(channel)
+            running = stub.GetRecommendations.future(request_, timeout=10)
+            while backend.calls == 0 and not running.done():
+                time.sleep(0.01)
+            with pytest.raises(grpc.RpcError) as e:
+                stub.GetRecommendations(request_, timeout=10)
+            assert e.value.code() == grpc.StatusCode.RESOURCE_EXHAUSTED
+
+            backend.release.set()
+            assert len(running.result().movies) == request_.n
+    finally:
+        backend.release.set()
+        server.stop(None)
+
+
+def test_cache_key_ignores_only_order(servicer, backend, seeds):
+    backend.release.set()
+    weight = recommender_pb2.Weight(year=100, rating=100, genres=100, nconsts=100)
+
+    def get(tconsts: list[int]) -> recommender_pb2.Response:
+        context = Context()
+        response = servicer.GetRecommendations(
+            recommender_pb2.Request(tconsts=[format_tconst(tconst) for tconst in tconsts], n=5, weight=weight), context
+        )
+        assert context.code() is None
+        return response
+
+    a, b = seeds[:2]
+    assert get([a, b]) == get([b, a])
+    assert backend.calls == 1
+    # A repeated tconst counts twice, so it is computed and cached on its own.
+    repeated = get([a, a, b])
+    assert backend.calls == 2
+    expected = backend.get_recommendations(
+        [a, a, b], Filter(), Weight(year=100, rating=100, genres=100, nconsts=100), 5
+    )
+    assert repeated == _get_response(expected)
+    assert repeated == get([a, b, a])
+    assert backend.calls == 3
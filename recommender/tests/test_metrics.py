@@ -0,0 +1,72 @@
+import re
+
+from metrics import Metrics, format_timings
+
+SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{([a-z_]+="[^"]*"(,[a-z_]+="[^"]*")*)\})? (\S+)$')
+TYPES = {'counter': ('',), 'gauge': ('',), 'histogram': ('_bucket', '_sum', '_count')}
+
+
+def parse(text: str) -> tuple[dict[str, str], dict[tuple[str, str], float]]:
+    """Checks text is in the Prometheus text format and returns the type of every metric and its samples."""
+    assert text.endswith('\n')
+    types, samples = {}, {}
+    for line in text.splitlines():
+        if line.startswith('# HELP '):
+            continue
+        if line.startswith('# TYPE '):
+            _, _, name, type_ = line.split(' ')
+            assert name not in types, name
+            types[name] = type_
+            continue
+
+        match = SAMPLE.match(line)
+        assert match is not None, line
+        name, labels, value = match.group(1), match.group(3) or '', float(match.group(5))
+        # A sample belongs to the metric of the latest TYPE line and has one of the suffixes of its type.
+        metric = list(types)[-1]
+        assert name in [metric + suffix for suffix in TYPES[types[metric]]], line
+        if types[metric] == 'counter':
+            assert metric.endswith('_total')
+        samples[(name, labels)] = value
+    return types, samples
+
+
+def test_render():
+    metrics = Metrics()
+    for seconds in (0.0002, 0.003, 0.003, 20.0):
+        with metrics.track('GetRecommendations'):
+            pass
+        metrics.observe_stages({'filter': seconds})
+    metrics.count_error('GetRecommendations', 'NOT_FOUND')
+    metrics.add_collector('cache', lambda: {'entries': 3, 'hits': 10, 'misses': 2}, counters=('hits', 'misses'))
+
+    types, samples = parse(metrics.render())
+    assert types == {
+        'recommender_rpc_seconds': 'histogram',
+        'recommender_stage_seconds': 'histogram',
+        'recommender_rpc_requests_total': 'counter',
+        'recommender_rpc_in_flight': 'gauge',
+        'recommender_rpc_errors_total': 'counter',
+        'recommender_cache_entries': 'gauge',
+        'recommender_cache_hits_total': 'counter',
+        'recommender_cache_misses_total': 'counter'
+    }
+    assert samples[('recommender_rpc_requests_total', 'method="GetRecommendations"')] == 4
+    assert samples[('recommender_rpc_in_flight', 'method="GetRecommendations"')] == 0
+    assert samples[('recommender_rpc_errors_total', 'method="GetRecommendations",code="NOT_FOUND"')] == 1
+    assert samples[('recommender_cache_entries', '')] == 3
+    assert samples[('recommender_cache_hits_total', '')] == 10
+    assert samples[('recommender_cache_misses_total', '')] == 2
+
+    # Buckets are cumulative and the last one counts every observation.
+    buckets = [value for (name, labels), value in samples.items() if name == 'recommender_stage_seconds_bucket']
+    assert buckets == sorted(buckets)
+    assert buckets[Metrics.buckets.index(0.0005)] == 1
+    assert buckets[Metrics.buckets.index(0.005)] == 3
+    assert samples[('recommender_stage_seconds_bucket', 'stage="filter",le="+Inf"')] == 4
+    assert samples[('recommender_stage_seconds_count', 'stage="filter"')] == 4
+    assert samples[('recommender_stage_seconds_sum', 'stage="filter"')] == sum((0.0002, 0.003, 0.003, 20.0))
+
+
+def test_format_timings():
+    assert format_timings({'parse': 0.000012, 'backend': 0.00421}) == 'parse=0.012,backend=4.210'
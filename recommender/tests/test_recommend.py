@@ -0,0 +1,164 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import polars as pl
+import pytest
+
+from benchmarks.generate import generate
+from catalog import Catalog
+from neighbours import NeighbourTable
+from recommend import Filter, FilterIndex, Recommender, Weight, get_filter_mask, get_ranks, get_sharded_ranks
+
+WEIGHTS = [Weight(), Weight(100, 0, 0, 0), Weight(0, 100, 0, 0), Weight(30, 70, 150, 150), Weight(0, 0, 120, 80)]
+
+
+def get_requests(seeds: list[int], count: int, seed: int = 0) -> list[tuple[list[int], int]]:
+    rng = np.random.default_rng(seed)
+    requests = []
+    for _ in range(count):
+        tconsts = [int(tconst) for tconst in rng.choice(seeds, rng.choice([1, 1, 2, 3]))]
+        requests.append((tconsts, int(rng.choice([1, 5, 20]))))
+    return requests
+
+
+def recommend(recommender: Recommender, tconsts: list[int], n: int) -> dict | str:
+    try:
+        return recommender.get_recommendations(tconsts, n)
+    except ValueError as e:
+        return str(e)
+
+
+def test_get_ranks_matches_stable_sort():
+    rng = np.random.default_rng(0)
+    for size in (1, 2, 17, 500):
+        keys = rng.integers(0, 6, (3, size))
+        by_votes = rng.permutation(size)
+        ranks = get_ranks(keys, by_votes)
+        for row_keys, row_ranks in zip(keys, ranks):
+            # Element at votes position i has key row_keys[i], ties keep votes order.
+            order = sorted(range(size), key=lambda i: (row_keys[i], i))
+            expected = np.empty(size, dtype=np.uint32)
+            expected[by_votes[order]] = np.arange(size)
+            assert np.array_equal(row_ranks, expected)
+
+
+def test_sharded_ranks_match_unsharded():
+    rng = np.random.default_rng(1)
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        for size, shards in ((10, 3), (1000, 4), (1001, 7)):
+            table = rng.integers(0, 40, (2, 2 * size))
+            rows = rng.choice(2 * size, size, replace=False)
+            by_votes = rng.permutation(size)
+            get_keys = lambda shard_rows: table[:, shard_rows]
+            assert np.array_equal(
+                get_sharded_ranks(get_keys, rows[by_votes], by_votes, shards, executor),
+                get_ranks(get_keys(rows[by_votes]), by_votes)
+            )
+
+
+def test_no_tconsts_is_not_found(catalog, seeds):
+    with pytest.raises(ValueError, match="no tconsts given"):
+        Recommender(catalog).get_recommendations([], 5)
+    responses = dict(Recommender(catalog).get_recommendations_batch([([], 5), ([seeds[0]], 5)]))
+    assert str(responses[0]) == "no tconsts given"
+    assert len(responses[1]) == 5
+
+
+def test_rating_ranks_match_decimal_distances():
+    # Every rating from 0.0 to 10.0 five times, ranked like ORDER BY ABS(rating - <decimal>), votes DESC.
+    steps = [round(0.1 * i, 1) for i in range(101)]
+    df = generate(5 * len(steps), seed=5).with_columns(rating=pl.Series(np.repeat(steps, 5)).cast(pl.Float32))
+    catalog = Catalog.from_df(df)
+    recommender = Recommender(catalog)
+    rows = np.arange(len(catalog))
+    by_votes = recommender.get_by_votes(rows)
+    ranks = recommender.get_ordered_rating(rows, by_votes, np.array(steps, dtype=np.float32))
+    for step, step_ranks in zip(steps, ranks):
+        distances = np.abs(catalog.rating.astype(np.float64) - step)
+        expected = np.empty(len(rows), dtype=np.uint32)
+        expected[np.lexsort((rows, -catalog.votes.astype(np.int64), distances))] = rows
+        assert np.array_equal(step_ranks, expected), step
+
+
+def test_score_distances_leave_out_missing_values(catalog):
+    recommender = Recommender(catalog, weight=Weight(100, 100, 100, 100, 'score'))
+    rows = np.arange(len(catalog))
+    references = [np.flatnonzero(catalog.year > 0)[0], np.flatnonzero(catalog.year == 0)[0],
+                  np.flatnonzero(catalog.rating > 0)[0], np.flatnonzero(catalog.rating == 0)[0]]
+    distances = recommender.get_feature_distances(rows, [{'row': row} for row in references], ['year', 'rating'])
+    for column in ('year', 'rating'):
+        values = getattr(catalog, column).astype(np.float64)
+        known = values > 0
+        span = values[known].max() - values[known].min()
+        for reference, row_distances in zip(references, distances[column]):
+            reference_value = float(str(values[reference].astype(np.float32)))
+            if reference_value > 0:
+                assert np.allclose(row_distances[known], np.abs(values[known] - reference_value) / span)
+                assert np.all(row_distances[~known] == 1)
+            else:
+                assert np.all(row_distances == 1)
+
+
+def test_filter_index_matches_filter_mask(catalog):
+    rng = np.random.default_rng(5)
+    index = FilterIndex(catalog, max_masks=8)
+    filters = [Filter(), Filter(min_votes=10, min_year=1990), Filter(max_rating=0.1), Filter(min_year=3000)]
+    for _ in range(200):
+        # Bounds taken from the catalog, so both sides of a bound are equal to some values.
+        bounds = {}
+        for column in ('votes', 'year', 'rating'):
+            low, high = sorted(rng.choice(getattr(catalog, column), 2).tolist())
+            if rng.random() < 0.5:
+                bounds[f'min_{column}'] = low
+            if rng.random() < 0.5:
+                bounds[f'max_{column}'] = high if rng.random() < 0.5 else low
+        filters.append(Filter(**bounds))
+
+    for filter_ in filters + filters[-8:]:
+        mask = index.get_mask(filter_)
+        assert np.array_equal(mask, get_filter_mask(catalog, filter_)), filter_
+        assert not mask.flags.writeable
+    assert index.hits >= 8
+
+
+@pytest.mark.parametrize('weight', WEIGHTS)
+def test_sharded_recommender_matches_unsharded(catalog, seeds, weight, monkeypatch):
+    monkeypatch.setattr(Recommender, 'min_shard_rows', 100)
+    for tconsts, n in get_requests(seeds, 20):
+        assert recommend(Recommender(catalog, weight=weight, shards=4), tconsts, n) == \
+            recommend(Recommender(catalog, weight=weight), tconsts, n)
+
+
+@pytest.mark.parametrize('weight', WEIGHTS)
+@pytest.mark.parametrize('filter_', [Filter(), Filter(min_votes=10, min_year=1990)])
+@pytest.mark.parametrize('always', [False, True])
+def test_early_termination_matches_full(catalog, seeds, weight, filter_, always, monkeypatch):
+    if always:
+        # Read prefixes for requests of several seeds too.
+        monkeypatch.setattr(Recommender, 'can_stop_early', lambda self, rows, seeds, n: True)
+    for tconsts, n in get_requests(seeds, 30):
+        assert recommend(Recommender(catalog, filter_, weight, early_termination=True), tconsts, n) == \
+            recommend(Recommender(catalog, filter_, weight), tconsts, n)
+
+
+def test_neighbour_table_matches_full(catalog, seeds):
+    rows = [catalog.get_row_by_tconst(tconst)['row'] for tconst in seeds]
+    table = NeighbourTable.build(catalog, 50, np.array(rows))
+    requests = get_requests(seeds, 60) + [([seeds[0], seeds[0]], 5), ([seeds[1]], 51)]
+    for tconsts, n in requests:
+        assert recommend(Recommender(catalog, neighbours=table), tconsts, n) == \
+            recommend(Recommender(catalog), tconsts, n)
+
+
+@pytest.mark.parametrize('weight', [Weight(), Weight(30, 70, 150, 150, 'score')])
+@pytest.mark.parametrize('max_seeds', [5, None])
+def test_batch_matches_single(catalog, seeds, weight, max_seeds, monkeypatch):
+    # Room for the ranks of a few seeds over all rows, so the requests are split into several passes.
+    monkeypatch.setattr(Recommender, 'batch_bytes', 3 * len(catalog) * 4 * 8)
+    requests = get_requests(seeds, 40)
+    responses = dict(Recommender(catalog, weight=weight).get_recommendations_batch(requests, max_seeds=max_seeds))
+    assert sorted(responses) == list(range(len(requests)))
+    for i, (tconsts, n) in enumerate(requests):
+        response = responses[i]
+        assert (str(response) if isinstance(response, ValueError) else response) == \
+            recommend(Recommender(catalog, weight=weight), tconsts, n)
@@ -0,0 +1,41 @@
+import socket
+import threading
+import time
+
+from refresh import CatalogRefresher
+
+
+class Listener:
+    """A LISTEN connection with a notification for every byte written to `writer`."""
+
+    def __init__(self) -> None:
+        self.reader, self.writer = socket.socketpair()
+        self.notifies = []
+
+    def fileno(self) -> int:
+        return self.reader.fileno()
+
+    def poll(self) -> None:
+        self.notifies.extend(self.reader.recv(4096))
+
+
+def test_wait_ends_at_interval_despite_notifications(catalog):
+    refresher = CatalogRefresher(None, None, catalog, lambda catalog: catalog, delay=0.2, interval=0.5)
+    listener = Listener()
+    stop = threading.Event()
+
+    def notify() -> None:
+        while not stop.wait(0.05):
+            listener.writer.send(b'\x00')
+
+    thread = threading.Thread(target=notify)
+    thread.start()
+    try:
+        start = time.monotonic()
+        refresher._wait(listener)
+        elapsed = time.monotonic() - start
+    finally:
+        stop.set()
+        thread.join()
+
+    assert 0.5 <= elapsed < 1.0
@@ -0,0 +1,49 @@
+import os
+
+import numpy as np
+import pytest
+
+from benchmarks.generate import generate
+from catalog import Catalog
+from recommend import Filter, Recommender, Weight
+from snapshot import export_snapshot, load_snapshot, prune_snapshots
+from test_catalog import assert_same_catalog
+from test_recommend import WEIGHTS, get_requests, recommend
+
+
+def test_round_trip(catalog, seeds, tmp_path):
+    assert load_snapshot(str(tmp_path)) is None
+    path = export_snapshot(catalog, str(tmp_path))
+    loaded = load_snapshot(str(tmp_path))
+
+    assert path == os.path.join(str(tmp_path), catalog.version)
+    assert_same_catalog(loaded, catalog)
+    assert isinstance(loaded.tconst, np.memmap)
+    assert not loaded.tconst.flags.writeable
+    for weight in WEIGHTS + [Weight(fusion='score')]:
+        for filter_ in (Filter(), Filter(min_votes=10, min_year=1990)):
+            for tconsts, n in get_requests(seeds, 10):
+                assert recommend(Recommender(loaded, filter_, weight), tconsts, n) == \
+                    recommend(Recommender(catalog, filter_, weight), tconsts, n)
+
+
+def test_prune_keeps_current(tmp_path):
+    root = str(tmp_path)
+    catalogs = [Catalog.from_df(generate(200, seed=seed)) for seed in range(4)]
+    for i, catalog in enumerate(catalogs):
+        path = export_snapshot(catalog, root)
+        os.utime(path, (i, i))
+    # An older snapshot made current again.
+    export_snapshot(catalogs[0], root)
+
+    prune_snapshots(root, keep=2)
+    assert sorted(os.listdir(root)) == sorted(['CURRENT', catalogs[0].version, catalogs[3].version])
+    assert load_snapshot(root).version == catalogs[0].version
+
+
+@pytest.mark.parametrize('keep', [0, 1])
+def test_prune_never_deletes_current(catalog, tmp_path, keep):
+    export_snapshot(Catalog.from_df(generate(200, seed=1)), str(tmp_path))
+    export_snapshot(catalog, str(tmp_path))
+    prune_snapshots(str(tmp_path), keep=keep)
+    assert sorted(os.listdir(tmp_path)) == sorted(['CURRENT', catalog.version])
@@ -19,7 +19,8 @@ import (
 const _ = grpc.SupportPackageIsVersion9
 
 const (
-	Recommender_GetRecommendations_FullMethodName = "/recommender.Recommender/GetRecommendations"
+	Recommender_GetRecommendations_FullMethodName      = "/recommender.Recommender/GetRecommendations"
+	Recommender_GetRecommendationsBatch_FullMethodName = "/recommender.Recommender/GetRecommendationsBatch"
 )
 
 // RecommenderClient is the client API for Recommender service.
@@ -27,6 +28,8 @@ const (
 // For semantics around ctx use and closing/ending streaming RPCs, please refer to https://pkg.go.dev/google.golang.org/grpc/?tab=doc#ClientConn.NewStream.
 type RecommenderClient interface {
 	GetRecommendations(ctx context.Context, in *Request, opts ...grpc.CallOption) (*Response, error)
+	// Streams back one BatchResponse per request, in completion order.
+	GetRecommendationsBatch(ctx context.Context, in *BatchRequest, opts ...grpc.CallOption) (grpc.ServerStreamingClient[BatchResponse], error)
 }
 
 type recommenderClient struct {
@@ -47,11 +50,32 @@ func (c *recommenderClient) GetRecommendations(ctx context.Context, in *Request,
 	return out, nil
 }
 
+func (c *recommenderClient) GetRecommendationsBatch(ctx context.Context, in *BatchRequest, opts ...grpc.CallOption) (grpc.ServerStreamingClient[BatchResponse], error) {
+	cOpts := append([]grpc.CallOption{grpc.StaticMethod()}, opts...)
+	stream, err := c.cc.NewStream(ctx, &Recommender_ServiceDesc.Streams[0], Recommender_GetRecommendationsBatch_FullMethodName, cOpts...)
+	if err != nil {
+		return nil, err
+	}
+	x := &grpc.GenericClientStream[BatchRequest, BatchResponse]{ClientStream: stream}
+	if err := x.ClientStream.SendMsg(in); err != nil {
+		return nil, err
+	}
+	if err := x.ClientStream.CloseSend(); err != nil {
+		return nil, err
+	}
+	return x, nil
+}
+
+// This type alias is provided for backwards compatibility with existing code that references the prior non-generic stream type by name.
+type Recommender_GetRecommendationsBatchClient = grpc.ServerStreamingClient[BatchResponse]
+
 // RecommenderServer is the server API for Recommender service.
 // All implementations must embed UnimplementedRecommenderServer
 // for forward compatibility.
 type RecommenderServer interface {
 	GetRecommendations(context.Context, *Request) (*Response, error)
+	// Streams back one BatchResponse per request, in completion order.
+	GetRecommendationsBatch(*BatchRequest, grpc.ServerStreamingServer[BatchResponse]) error
 	mustEmbedUnimplementedRecommenderServer()
 }
 
@@ -65,6 +89,9 @@ type UnimplementedRecommenderServer struct{}
 func (UnimplementedRecommenderServer) GetRecommendations(context.Context, *Request) (*Response, error) {
 	return nil, status.Errorf(codes.Unimplemented, "method GetRecommendations not implemented")
 }
+func (UnimplementedRecommenderServer) GetRecommendationsBatch(*BatchRequest, grpc.ServerStreamingServer[BatchResponse]) error {
+	return status.Errorf(codes.Unimplemented, "method GetRecommendationsBatch not implemented")
+}
 func (UnimplementedRecommenderServer) mustEmbedUnimplementedRecommenderServer() {}
 func (UnimplementedRecommenderServer) testEmbeddedByValue()                     {}
 
@@ -104,6 +131,17 @@ func _Recommender_GetRecommendations_Handler(srv interface{}, ctx context.Contex
 	return interceptor(ctx, in, info, handler)
 }
 
+func _Recommender_GetRecommendationsBatch_Handler(srv interface{}, stream grpc.ServerStream) error {
+	m := new(BatchRequest)
+	if err := stream.RecvMsg(m); err != nil {
+		return err
+	}
+	return srv.(RecommenderServer).GetRecommendationsBatch(m, &grpc.GenericServerStream[BatchRequest, BatchResponse]{ServerStream: stream})
+}
+
+// This type alias is provided for backwards compatibility with existing code that references the prior non-generic stream type by name.
+type Recommender_GetRecommendationsBatchServer = grpc.ServerStreamingServer[BatchResponse]
+
 // Recommender_ServiceDesc is the grpc.ServiceDesc for Recommender service.
 // It's only intended for direct use with grpc.RegisterService,
 // and not to be introspected or modified (even as a copy)
@@ -116,6 +154,12 @@ var Recommender_ServiceDesc = grpc.ServiceDesc{
 			Handler:    _Recommender_GetRecommendations_Handler,
 		},
 	},
-	Streams:  []grpc.StreamDesc{},
+	Streams: []grpc.StreamDesc{
+		{
+			StreamName:    "GetRecommendationsBatch",
+			Handler:       _Recommender_GetRecommendationsBatch_Handler,
+			ServerStreams: true,
+		},
+	},
 	Metadata: "recommender.proto",
 }
@@ -0,0 +1,10 @@
+DROP TRIGGER IF EXISTS imdb_inserts ON imdb;
+DROP TRIGGER IF EXISTS imdb_updates ON imdb;
+DROP TRIGGER IF EXISTS imdb_deletes ON imdb;
+DROP TRIGGER IF EXISTS imdb_truncate ON imdb;
+DROP FUNCTION IF EXISTS imdb_log_inserts;
+DROP FUNCTION IF EXISTS imdb_log_updates;
+DROP FUNCTION IF EXISTS imdb_log_deletes;
+DROP FUNCTION IF EXISTS imdb_log_truncate;
+DROP TABLE IF EXISTS imdb_changes_pruned;
+DROP TABLE IF EXISTS imdb_changes;
@@ -0,0 +1,65 @@
+CREATE TABLE IF NOT EXISTS imdb_changes (
+    id BIGSERIAL PRIMARY KEY,
+    -- NULL when the whole table was truncated.
+    tconst VARCHAR(12),
+    xid BIGINT NOT NULL DEFAULT pg_current_xact_id()::TEXT::BIGINT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS imdb_changes_xid_idx ON imdb_changes (xid);
+
+-- Changes of transactions below xid were pruned, a catalog read before it has to read imdb again in full.
+CREATE TABLE IF NOT EXISTS imdb_changes_pruned (
+    xid BIGINT NOT NULL
+);
+INSERT INTO imdb_changes_pruned (xid) SELECT 0 WHERE NOT EXISTS (SELECT FROM imdb_changes_pruned);
+
+CREATE OR REPLACE FUNCTION imdb_log_inserts() RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO imdb_changes (tconst) SELECT tconst FROM new_rows;
+    PERFORM pg_notify('imdb_changes', '');
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION imdb_log_updates() RETURNS TRIGGER AS $$
+BEGIN
+    -- Set operations instead of joins: the plan is cached for the session, and a join planned
+    -- for the empty transition tables of an earlier statement turns into nested loops.
+    INSERT INTO imdb_changes (tconst)
+    SELECT tconst FROM (SELECT * FROM new_rows EXCEPT SELECT * FROM old_rows) AS changed
+    UNION
+    SELECT tconst FROM (SELECT * FROM old_rows EXCEPT SELECT * FROM new_rows) AS changed;
+    IF FOUND THEN
+        PERFORM pg_notify('imdb_changes', '');
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION imdb_log_deletes() RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO imdb_changes (tconst) SELECT tconst FROM old_rows;
+    PERFORM pg_notify('imdb_changes', '');
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION imdb_log_truncate() RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO imdb_changes (tconst) VALUES (NULL);
+    PERFORM pg_notify('imdb_changes', '');
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER imdb_inserts AFTER INSERT ON imdb
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION imdb_log_inserts();
+CREATE OR REPLACE TRIGGER imdb_updates AFTER UPDATE ON imdb
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION imdb_log_updates();
+CREATE OR REPLACE TRIGGER imdb_deletes AFTER DELETE ON imdb
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION imdb_log_deletes();
+CREATE OR REPLACE TRIGGER imdb_truncate AFTER TRUNCATE ON imdb
+    FOR EACH STATEMENT EXECUTE FUNCTION imdb_log_truncate();
@@ -19,15 +19,26 @@ func NewIMDbRepository(db *pgxpool.Pool) *IMDbRepository {
 	}
 }
 
+// Rows written by one statement. The imdb_changes triggers run once per statement,
+// so statements of many rows log the changes of a whole batch at once.
+const rowsPerStatement = 10000
+
 func (repo *IMDbRepository) InsertMultipleBasics(basics []dto.Basic) error {
 	batch := &pgx.Batch{}
-	for _, basic := range basics {
+	for start := 0; start < len(basics); start += rowsPerStatement {
+		chunk := basics[start:min(start+rowsPerStatement, len(basics))]
+		tconsts := make([]string, len(chunk))
+		years := make([]int16, len(chunk))
+		genres := make([]string, len(chunk))
+		for i, basic := range chunk {
+			tconsts[i], years[i], genres[i] = basic.Tconst, int16(basic.StartYear), basic.Genres
+		}
 		batch.Queue(
-			`INSERT INTO imdb (tconst, year, genres) 
-			VALUES ($1, $2, $3)
-			ON CONFLICT (tconst) DO UPDATE 
+			`INSERT INTO imdb (tconst, year, genres)
+			SELECT * FROM unnest($1::text[], $2::int2[], $3::text[])
+			ON CONFLICT (tconst) DO UPDATE
 			SET year = EXCLUDED.year, genres = EXCLUDED.genres`,
-			basic.Tconst, basic.StartYear, basic.Genres,
+			tconsts, years, genres,
 		)
 	}
 
@@ -64,10 +75,18 @@ func (repo *IMDbRepository) GetAllTconsts() ([]string, error) {
 
 func (repo *IMDbRepository) UpdateMultiplePrincipals(principals []dto.Principal) error {
 	batch := &pgx.Batch{}
-	for _, principal := range principals {
+	for start := 0; start < len(principals); start += rowsPerStatement {
+		chunk := principals[start:min(start+rowsPerStatement, len(principals))]
+		tconsts := make([]string, len(chunk))
+		nconsts := make([]string, len(chunk))
+		for i, principal := range chunk {
+			tconsts[i], nconsts[i] = principal.Tconst, principal.Nconsts
+		}
 		batch.Queue(
-			`UPDATE imdb SET nconsts = $1 WHERE tconst = $2`,
-			principal.Nconsts, principal.Tconst,
+			`UPDATE imdb SET nconsts = principals.nconsts
+			FROM unnest($1::text[], $2::text[]) AS principals (tconst, nconsts)
+			WHERE imdb.tconst = principals.tconst`,
+			tconsts, nconsts,
 		)
 	}
 
@@ -80,10 +99,19 @@ func (repo *IMDbRepository) UpdateMultiplePrincipals(principals []dto.Principal)
 
 func (repo *IMDbRepository) UpdateMultipleRatings(ratings []dto.Ratings) error {
 	batch := &pgx.Batch{}
-	for _, rating := range ratings {
+	for start := 0; start < len(ratings); start += rowsPerStatement {
+		chunk := ratings[start:min(start+rowsPerStatement, len(ratings))]
+		tconsts := make([]string, len(chunk))
+		values := make([]float64, len(chunk))
+		votes := make([]int64, len(chunk))
+		for i, rating := range chunk {
+			tconsts[i], values[i], votes[i] = rating.Tconst, rating.Rating, int64(rating.Votes)
+		}
 		batch.Queue(
-			`UPDATE imdb SET rating = $1, votes = $2 WHERE tconst = $3`,
-			rating.Rating, rating.Votes, rating.Tconst,
+			`UPDATE imdb SET rating = ratings.rating, votes = ratings.votes
+			FROM unnest($1::text[], $2::float8[], $3::int8[]) AS ratings (tconst, rating, votes)
+			WHERE imdb.tconst = ratings.tconst`,
+			tconsts, values, votes,
 		)
 	}
 